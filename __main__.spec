@@ -6,7 +6,7 @@ block_cipher = None
 
 a = Analysis(
     ['src\\whatubinup2\\__main__.py'],
-    pathex=['tmp'],
+    pathex=['tmp', 'src'],
     binaries=[],
     datas=[],
     hiddenimports=[],
@@ -30,7 +30,7 @@ exe = EXE(
     debug=False,
     bootloader_ignore_signals=False,
     strip=False,
-    upx=True,
+    upx=False,
     console=True,
     disable_windowed_traceback=False,
     argv_emulation=False,
@@ -44,7 +44,7 @@ coll = COLLECT(
     a.zipfiles,
     a.datas,
     strip=False,
-    upx=True,
+    upx=False,
     upx_exclude=[],
     name='__main__',
 )
@@ -0,0 +1,322 @@
+""" Script to benchmark config, report and main-loop hot paths without a display
+
+PySimpleGUI is replaced by a stand-in module whose windows answer read()
+from a scripted list of events, so the app code runs unchanged but nothing
+is drawn. Results are printed as json for comparing between versions.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import types
+from datetime import date, timedelta
+
+parser = argparse.ArgumentParser(description=__doc__)
+parser.add_argument(
+    "--src",
+    default="src",
+    help="Directory containing the whatubinup2 package to measure (e.g. a "
+    "git worktree of an older release, for a before/after comparison)",
+)
+parser.add_argument("--runs", type=int, default=5, help="Timed runs per benchmark")
+parser.add_argument(
+    "--days",
+    default="10,1000,10000",
+    help="Comma separated report history sizes for the Report benchmarks",
+)
+parser.add_argument("--bins", type=int, default=300, help="Bins for Settings")
+parser.add_argument(
+    "--loop-events", type=int, default=200, help="Log clicks for the main loop"
+)
+parser.add_argument(
+    "--backend", choices=("json", "sqlite"), default="json", help="report_backend"
+)
+parser.add_argument("--output", help="Also write the results to this file")
+args = parser.parse_args()
+
+# settings reads ~ on import, so point it at a throwaway home first
+os.environ["HOME"] = tempfile.mkdtemp(prefix="wubu2-hot-")
+os.environ["USERPROFILE"] = os.environ["HOME"]
+sys.path.insert(0, os.path.abspath(args.src))
+
+# Scripted (event, values) pairs handed out by FakeWindow.read()
+scripted_events = []
+# perf_counter() at every FakeWindow.read(), for timing loop iterations
+read_times = []
+
+
+class FakeElement:  # pylint: disable=too-few-public-methods
+    """Class standing in for any PySimpleGUI element"""
+
+    def __init__(self, *element_args, **kwargs):
+        self.args = element_args
+        self.kwargs = kwargs
+        self.value = None
+
+    def update(self, value=None, **kwargs):  # pylint: disable=unused-argument
+        """Function to record an update like a real element"""
+        self.value = value
+
+
+class FakeWindow:
+    """Class standing in for sg.Window, read() pops scripted events"""
+
+    def __init__(self, title, layout, **kwargs):  # pylint: disable=unused-argument
+        self.title = title
+        self.elements = {}
+        self._collect(layout)
+
+    def _collect(self, layout):
+        """Function to index keyed elements, walking nested layouts"""
+        if isinstance(layout, (list, tuple)):
+            for item in layout:
+                self._collect(item)
+        elif isinstance(layout, FakeElement):
+            if "key" in layout.kwargs:
+                self.elements[layout.kwargs["key"]] = layout
+            for item in layout.args:
+                self._collect(item)
+
+    def __getitem__(self, key):
+        return self.elements.setdefault(key, FakeElement(key=key))
+
+    def read(self, timeout=None):  # pylint: disable=unused-argument
+        """Function to hand out the next scripted event, closed when empty"""
+        read_times.append(time.perf_counter())
+        if scripted_events:
+            return scripted_events.pop(0)
+        return None, None
+
+    def write_event_value(self, key, value):
+        """Function to drop events posted by background threads"""
+
+    def close(self):
+        """Function to close the window"""
+
+
+fake_gui = types.ModuleType("PySimpleGUI")
+fake_gui.LOOK_AND_FEEL_TABLE = {}
+fake_gui.WIN_CLOSED = None
+fake_gui.theme = lambda name: None
+fake_gui.Popup = fake_gui.PopupNoButtons = lambda *args, **kwargs: None
+fake_gui.Window = FakeWindow
+fake_gui.pin = lambda element, **kwargs: element
+for element_name in (
+    "Text",
+    "T",
+    "Button",
+    "InputText",
+    "Tab",
+    "TabGroup",
+    "Frame",
+    "Column",
+):
+    setattr(fake_gui, element_name, FakeElement)
+sys.modules["PySimpleGUI"] = fake_gui
+
+# pylint: disable=wrong-import-position
+from whatubinup2 import __main__ as app  # noqa: E402
+from whatubinup2 import settings  # noqa: E402
+
+
+def write_config(bin_count):
+    """Function to write an unlicensed config with bin_count bins"""
+    config_data = json.loads(json.dumps(settings.default_config))
+    config_data["email_address"] = "unlicensed"
+    config_data["api_server"] = "http://127.0.0.1:9"
+    config_data["report_backend"] = args.backend
+    config_data["reminder_minutes"]["value"] = 600
+    config_data["time_bins"] = [
+        {
+            "name": "bin" + str(number),
+            "nice_name": "Bin " + str(number),
+            "description": "Benchmark bin " + str(number),
+        }
+        for number in range(bin_count)
+    ]
+    os.makedirs(settings.config_dir, exist_ok=True)
+    with open(settings.config_dir + "all.json", "w", encoding="UTF-8") as config_file:
+        config_file.write(json.dumps(config_data))
+    settings.config_store.invalidate()
+
+
+def reset_reports(day_count, bin_count=5):
+    """Function to replace the report history with day_count synthetic days"""
+    for name in ("reports", "journal", "cache"):
+        path = settings.home_dir + name
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path, topdown=False):
+                for file_name in files:
+                    os.remove(os.path.join(root, file_name))
+                for dir_name in dirs:
+                    os.rmdir(os.path.join(root, dir_name))
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(settings.home_dir + "reports.db" + suffix):
+            os.remove(settings.home_dir + "reports.db" + suffix)
+    os.makedirs(settings.reports_dir, exist_ok=True)
+    today = date.today()
+    for offset in range(1, day_count + 1):
+        day = (today - timedelta(days=offset)).strftime("%y-%m-%d")
+        with open(
+            settings.reports_dir + day + ".json", "w", encoding="UTF-8"
+        ) as report:
+            report.write(
+                json.dumps(
+                    {
+                        "bin" + str(number): (offset + number) % 9
+                        for number in range(bin_count)
+                    }
+                )
+            )
+    # pylint: disable-next=too-many-function-args
+    store_cache = settings.get_report_store.cache_info()
+    if args.backend == "sqlite" and store_cache.currsize:
+        settings.get_report_store().close()
+    settings.get_report_store.cache_clear()
+    settings.get_rollups.cache_clear()
+
+
+def measure(function, setup=None, runs=None):
+    """Function to time function() over several runs, setup() is untimed"""
+    timings = []
+    for _ in range(runs or args.runs):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - start) * 1000)
+    return summarise(timings)
+
+
+def summarise(timings):
+    """Function to reduce millisecond timings to comparable figures"""
+    return {
+        "runs": len(timings),
+        "min_ms": round(min(timings), 3),
+        "median_ms": round(statistics.median(timings), 3),
+        "max_ms": round(max(timings), 3),
+    }
+
+
+def bin_event(action, bin_number):
+    """Function to get the event for clicking a bin's button
+
+    Bins are searched for by system name and then clicked in the first slot.
+    Older sources used the button text as the event.
+    """
+    if not hasattr(app, "LOG_KEY"):
+        return [(action + " Bin " + str(bin_number), {})]
+    key = {"Log": app.LOG_KEY, "Edit": app.EDIT_KEY, "Delete": app.DELETE_KEY}[action]
+    query = "bin" + str(bin_number)
+    return [
+        (app.BIN_SEARCH_KEY, {app.BIN_SEARCH_KEY: query}),
+        ((key, 0), {app.BIN_SEARCH_KEY: query}),
+    ]
+
+
+def script(*events):
+    """Function to queue (event, values) pairs for the next windows"""
+    scripted_events[:] = list(events)
+
+
+def bench_config_and_report():
+    """Function to time get_config and get_report"""
+    write_config(5)
+    reset_reports(10)
+    app.get_report()
+    return {
+        "get_config_cached": measure(app.get_config, runs=args.runs * 100),
+        "get_config_changed": measure(
+            app.get_config, setup=settings.config_store.invalidate
+        ),
+        "get_report": measure(app.get_report, runs=args.runs * 100),
+    }
+
+
+def bench_main_loop():
+    """Function to time main() loop iterations handling Log clicks"""
+    write_config(5)
+    reset_reports(10)
+    # Search once, then every click is on the first slot
+    clicks = bin_event("Log", 1)
+    script(*(clicks + clicks[-1:] * (args.loop_events - 1) + [("Exit", {})]))
+    read_times.clear()
+    app.main()
+    # read() is called once per iteration, the gaps are the iteration times
+    gaps = [
+        (later - earlier) * 1000
+        for earlier, later in zip(read_times[:-1], read_times[1:])
+    ]
+    return {"main_loop_log_iteration": summarise(gaps)}
+
+
+def bench_reports():
+    """Function to time show_report over growing report histories"""
+    report_results = {}
+    write_config(5)
+    for day_count in [int(count) for count in args.days.split(",")]:
+        reset_reports(day_count)
+        script()
+        start = time.perf_counter()
+        app.show_report()
+        first_ms = (time.perf_counter() - start) * 1000
+        report_results["show_report_" + str(day_count) + "_days"] = {
+            "first_open_ms": round(first_ms, 3),
+            "reopen": measure(lambda: (script(), app.show_report())),
+        }
+    return report_results
+
+
+def bench_settings():
+    """Function to time the settings bin operations with many bins"""
+    last = str(args.bins - 1)
+    edit_values = ["Bin " + last, "bin" + last, "Edited"]
+    add_values = ["Bin new", "binnew", "Added"]
+    return {
+        "settings_open_"
+        + str(args.bins)
+        + "_bins": measure(
+            lambda: (script(), app.show_settings()),
+            setup=lambda: write_config(args.bins),
+        ),
+        "settings_edit_bin": measure(
+            lambda: (
+                script(*bin_event("Edit", last), ("Save", edit_values)),
+                app.show_settings(),
+            ),
+            setup=lambda: write_config(args.bins),
+        ),
+        "settings_delete_bin": measure(
+            lambda: (script(*bin_event("Delete", last)), app.show_settings()),
+            setup=lambda: write_config(args.bins),
+        ),
+        "settings_add_bin": measure(
+            lambda: (
+                script(("Add bin", {}), ("Save", add_values)),
+                app.show_settings(),
+            ),
+            setup=lambda: write_config(args.bins),
+        ),
+    }
+
+
+app.init_app()
+app.load_gui()
+results = {
+    "src": args.src,
+    "python": platform.python_version(),
+    "backend": args.backend,
+    "benchmarks": {},
+}
+for bench in (bench_config_and_report, bench_reports, bench_settings, bench_main_loop):
+    results["benchmarks"].update(bench())
+
+output = json.dumps(results, indent=2)
+print(output)
+if args.output:
+    with open(args.output, "w", encoding="UTF-8") as output_file:
+        output_file.write(output + "\n")
@@ -0,0 +1,101 @@
+""" Script to benchmark import time and time to first window of the client """
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+parser = argparse.ArgumentParser(description=__doc__)
+parser.add_argument("--src", default="src", help="Directory holding the package")
+parser.add_argument("--runs", type=int, default=5, help="Runs, best is reported")
+parser.add_argument(
+    "--max-import-ms",
+    type=float,
+    help="Exit non-zero if importing whatubinup2.__main__ takes longer",
+)
+parser.add_argument(
+    "--skip-window", action="store_true", help="Skip the window test (no display)"
+)
+args = parser.parse_args()
+
+# Keep the benchmark away from the real ~/whatubinup2
+env = dict(
+    os.environ,
+    HOME=tempfile.mkdtemp(prefix="wubu2-bench-"),
+    PYTHONPATH=os.path.abspath(args.src),
+)
+
+
+def import_times(module):
+    """Function to get -X importtime cumulative microseconds per module"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import " + module],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        times[name.strip()] = (int(self_us), int(cumulative_us))
+    return times
+
+
+def best_import(module):
+    """Function to get the fastest of several import runs"""
+    runs = [import_times(module) for _ in range(args.runs)]
+    return min(runs, key=lambda times: times[module][1])
+
+
+WINDOW_SCRIPT = """
+from whatubinup2 import __main__ as app
+app.init_app()
+window = app.build_main_window(app.get_config())
+print("ready", flush=True)
+window.close()
+"""
+
+
+def first_window_ms():
+    """Function to time process start until the main window is finalized"""
+    best = None
+    for _ in range(args.runs):
+        start = time.perf_counter()
+        with subprocess.Popen(
+            [sys.executable, "-c", WINDOW_SCRIPT],
+            env=env,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+        ) as client:
+            if client.stdout.readline().strip() != "ready":
+                return None
+            elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return round(best, 1)
+
+
+results = {"src": args.src, "import_ms": {}, "slowest_imports_ms": {}}
+for module_name in ("whatubinup2.cli", "whatubinup2.__main__"):
+    module_times = best_import(module_name)
+    results["import_ms"][module_name] = round(module_times[module_name][1] / 1000, 1)
+    if module_name == "whatubinup2.__main__":
+        slowest = sorted(module_times.items(), key=lambda item: -item[1][0])[:10]
+        results["slowest_imports_ms"] = {
+            name: round(self_us / 1000, 1) for name, (self_us, _) in slowest
+        }
+if not args.skip_window:
+    results["first_window_ms"] = first_window_ms()
+
+print(json.dumps(results, indent=2))
+if (
+    args.max_import_ms is not None
+    and results["import_ms"]["whatubinup2.__main__"] > args.max_import_ms
+):
+    print("Import time over budget of " + str(args.max_import_ms) + "ms")
+    sys.exit(1)
@@ -0,0 +1,80 @@
+""" Script to measure CPU time used by an idle client (POSIX only) """
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+parser = argparse.ArgumentParser(description=__doc__)
+parser.add_argument(
+    "--src",
+    default="src",
+    help="Directory containing the whatubinup2 package to measure (e.g. a "
+    "git worktree of an older release, for a before/after comparison)",
+)
+parser.add_argument(
+    "--seconds", type=float, default=60, help="How long to leave the client idle"
+)
+args = parser.parse_args()
+
+# Run against a throwaway home dir with an unlicensed config so no popups
+# or network calls get in the way of the measurement
+home = tempfile.mkdtemp(prefix="wubu2-idle-")
+os.makedirs(home + "/whatubinup2/config")
+with open(home + "/whatubinup2/config/all.json", "w", encoding="UTF-8") as f:
+    json.dump(
+        {
+            "total_hours": {"description": "", "value": 8},
+            "reminder_minutes": {"description": "", "value": 60},
+            "email_address": "unlicensed",
+            "license_level": "free",
+            "license_code": "",
+            "license_validated": "",
+            "api_server": "http://127.0.0.1:9",
+            "historic_reports_to_show": 7,
+            "time_bins": [
+                {"name": "default", "nice_name": "Default", "description": ""}
+            ],
+        },
+        f,
+    )
+
+env = dict(os.environ, HOME=home, PYTHONPATH=os.path.abspath(args.src))
+# pylint: disable-next=consider-using-with
+client_errors = tempfile.TemporaryFile(mode="w+", encoding="UTF-8")
+client = subprocess.Popen(  # pylint: disable=consider-using-with
+    [sys.executable, "-m", "whatubinup2"],
+    env=env,
+    stdout=subprocess.DEVNULL,
+    stderr=client_errors,
+)
+start = time.monotonic()
+time.sleep(args.seconds)
+wall = time.monotonic() - start
+if client.poll() is not None:
+    # A client that exited (e.g. no display to open a window on) was not idle,
+    # so its CPU time says nothing about the idle loop
+    client_errors.seek(0)
+    sys.exit(
+        "Client exited with "
+        + str(client.returncode)
+        + " before the end of the measurement:\n"
+        + client_errors.read()[-2000:]
+    )
+client.send_signal(signal.SIGTERM)
+_, _, usage = os.wait4(client.pid, 0)
+cpu = usage.ru_utime + usage.ru_stime
+
+print(
+    json.dumps(
+        {
+            "src": args.src,
+            "wall_seconds": round(wall, 2),
+            "cpu_seconds": round(cpu, 3),
+            "cpu_percent": round(100 * cpu / wall, 2),
+        }
+    )
+)
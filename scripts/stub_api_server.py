@@ -0,0 +1,188 @@
+""" Local stand-in api_server for testing Cloud config sync
+
+Implements /api/config/sync and /api/config/upload with per-key revisions
+(see src/whatubinup2/config_sync.py), /api/reports/sync with per-device
+counters (see src/whatubinup2/report_sync.py) and an /api/auth/validate
+that accepts any license as paid. Set "api_server" in config to the printed
+address. State is kept in memory per id.
+"""
+import argparse
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+parser = argparse.ArgumentParser(description=__doc__)
+parser.add_argument("--port", type=int, default=8765, help="Port on 127.0.0.1")
+parser.add_argument(
+    "--legacy",
+    action="store_true",
+    help="Behave like an api_server without revisions (full config every time)",
+)
+args = parser.parse_args()
+
+lock = threading.Lock()
+# id: {"revision": int, "config": {}, "key_revisions": {}, "removed": {},
+#      "reports": {day: {bin: {device: {"p": added, "n": removed}}}}, "report_seq": int,
+#      "report_days": {day: seq}}
+accounts = {}
+
+
+def get_account(account_id):
+    """Function to get or create the stored config for an id"""
+    return accounts.setdefault(
+        account_id,
+        {
+            "revision": 0,
+            "config": {},
+            "key_revisions": {},
+            "removed": {},
+            "reports": {},
+            "report_seq": 0,
+            "report_days": {},
+        },
+    )
+
+
+def set_key(account, key, value, remove=False):
+    """Function to change a key under a new revision"""
+    account["revision"] += 1
+    if remove:
+        account["config"].pop(key, None)
+        account["removed"][key] = account["revision"]
+    else:
+        account["config"][key] = value
+        account["removed"].pop(key, None)
+    account["key_revisions"][key] = account["revision"]
+
+
+def config_sync(request):
+    """Function to answer a sync, only keys changed since the client revision"""
+    account = get_account(request["id"])
+    if args.legacy:
+        return {"status": "ok", "details": account["config"]}
+    since = request.get("revision")
+    if since == account["revision"]:
+        return {"status": "ok", "not_modified": True, "revision": since}
+    if not isinstance(since, int) or since > account["revision"]:
+        since = 0
+    return {
+        "status": "ok",
+        "revision": account["revision"],
+        "details": {
+            key: value
+            for key, value in account["config"].items()
+            if account["key_revisions"][key] > since
+        },
+        "removed": [key for key, rev in account["removed"].items() if rev > since],
+        "key_revisions": account["key_revisions"],
+    }
+
+
+def config_upload(request):
+    """Function to store an upload, refusing keys changed since their base"""
+    account = get_account(request["id"])
+    if "config" in request:
+        for key, value in request["config"].items():
+            if account["config"].get(key) != value:
+                set_key(account, key, value)
+        if args.legacy:
+            return {"status": "ok", "details": "Config uploaded"}
+        return {"status": "ok", "revision": account["revision"]}
+    base_key_revisions = request.get("base_key_revisions", {})
+    rejected = {}
+    accepted = []
+    for key in list(request.get("changes", {})) + request.get("removed", []):
+        if account["key_revisions"].get(key, 0) > base_key_revisions.get(key, 0):
+            rejected[key] = account["config"].get(key)
+            continue
+        set_key(
+            account,
+            key,
+            request.get("changes", {}).get(key),
+            remove=key not in request.get("changes", {}),
+        )
+        accepted.append(key)
+    return {
+        "status": "ok",
+        "revision": account["revision"],
+        "key_revisions": {
+            key: account["key_revisions"][key] for key in accepted + list(rejected)
+        },
+        "rejected": rejected,
+    }
+
+
+def pn_counter(counter):
+    """Function to read a {"p", "n"} counter, plain counts are from older clients"""
+    if isinstance(counter, dict):
+        return {"p": counter.get("p", 0), "n": counter.get("n", 0)}
+    return {"p": counter, "n": 0}
+
+
+def reports_sync(request):
+    """Function to merge uploaded counters by max and return newer days"""
+    account = get_account(request["id"])
+    for day, bins in request.get("counters", {}).items():
+        for bin_name, devices in bins.items():
+            for device, counter in devices.items():
+                known = account["reports"].setdefault(day, {}).setdefault(bin_name, {})
+                current = pn_counter(known.get(device, 0))
+                counter = pn_counter(counter)
+                merged = {
+                    "p": max(current["p"], counter["p"]),
+                    "n": max(current["n"], counter["n"]),
+                }
+                if device not in known or merged != current:
+                    known[device] = merged
+                    account["report_seq"] += 1
+                    account["report_days"][day] = account["report_seq"]
+    since = request.get("since") or 0
+    return {
+        "status": "ok",
+        "cursor": account["report_seq"],
+        "counters": {
+            day: account["reports"][day]
+            for day, seq in account["report_days"].items()
+            if seq > since
+        },
+    }
+
+
+def auth_validate(request):  # pylint: disable=unused-argument
+    """Function to accept any license"""
+    return {"status": "ok", "details": {"license_status": "paid"}}
+
+
+ROUTES = {
+    "/api/config/sync": config_sync,
+    "/api/config/upload": config_upload,
+    "/api/reports/sync": reports_sync,
+    "/api/auth/validate": auth_validate,
+}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Class routing json posts to the stub endpoints"""
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        """Function to answer a POST request"""
+        if self.path not in ROUTES:
+            self.send_error(404)
+            return
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        with lock:
+            response = json.dumps(ROUTES[self.path](json.loads(body))).encode("utf-8")
+        print(self.path, "received", len(body), "bytes, sent", len(response), "bytes")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(response)))
+        self.end_headers()
+        self.wfile.write(response)
+
+    def log_message(self, format, *message_args):  # pylint: disable=redefined-builtin
+        """Function to silence the default access log"""
+
+
+server = ThreadingHTTPServer(("127.0.0.1", args.port), StubHandler)
+print("Stub api_server on http://127.0.0.1:" + str(args.port), flush=True)
+server.serve_forever()
@@ -2,60 +2,118 @@
 """ Simple UI for Time logging """
 import json
 import logging
+import multiprocessing
 import os
 import os.path
+import sys
 import threading
 import time
-import webbrowser
-from datetime import date, datetime
-from os.path import exists, expanduser
+from datetime import datetime
+from os.path import exists
 
-import PySimpleGUI as sg
-import requests
+if not __package__:
+    # Launched as a script (python3 src/whatubinup2/__main__.py or the
+    # PyInstaller build), make the package importable by name
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-home_dir = expanduser("~") + "/whatubinup2/"
-reports_dir = home_dir + "reports/"
-config_dir = home_dir + "config/"
-logs_dir = home_dir + "logs/"
+# pylint: disable=wrong-import-position
+from whatubinup2 import metrics
+from whatubinup2.api_client import ApiClient, ApiError
+from whatubinup2.bin_registry import (
+    BIN_DESCRIPTION_KEY,
+    BIN_NAME_KEY,
+    BIN_NEXT_KEY,
+    BIN_PAGE_KEY,
+    BIN_PREVIOUS_KEY,
+    BIN_ROW_KEY,
+    BIN_SEARCH_KEY,
+    DELETE_KEY,
+    EDIT_KEY,
+    LOG_KEY,
+    BinPager,
+)
+from whatubinup2.cli import main as cli_main
+from whatubinup2.config_sync import pull_config, push_config
+from whatubinup2.day_state import DayState, post_on_change
+from whatubinup2.ipc import IpcServer, ipc_address
+from whatubinup2.logging_setup import prune_logs, setup_logging
+from whatubinup2.outbox import ConfigOutbox
+from whatubinup2.report_sync import ReportSync
+from whatubinup2.scheduler import Scheduler, seconds_until_midnight
+from whatubinup2.settings import (
+    config_store,
+    current_date,
+    default_config,
+    get_bin_registry,
+    get_config,
+    get_device_id,
+    get_remote_counters,
+    get_report_store,
+    get_report_view,
+    get_rollups,
+    get_sync_state,
+    home_dir,
+    logs_dir,
+    reports_dir,
+)
 
 WEBSITE_LINK = "https://teamjtharrison.github.io/whatubinup2"
 AUTHOR_LINK = "https://readme.tjth.co"
 
-today = date.today()
-today_date = today.strftime("%y-%m-%d")
+today_date = current_date()
 font = ("Open Sans", 15)
 big_font = ("Open Sans", 25)
 
-sg.LOOK_AND_FEEL_TABLE["WUBU2"] = {
-    "BACKGROUND": "#96C5F7",
-    "TEXT": "#F2F4FF",
-    "INPUT": "#A9D3FF",
-    "TEXT_INPUT": "#F2F4FF",
-    "SCROLL": "#99CC99",
-    "BUTTON": ("#A9D3FF", "#FFFFFF"),
-    "PROGRESS": ("# D1826B", "# CC8019"),
-    "BORDER": 0,
-    "SLIDER_DEPTH": 1,
-    "PROGRESS_DEPTH": 0,
-}
-sg.theme("wubu2")
-
-# Check for home dir
-if not exists(home_dir):
-    os.mkdir(home_dir)
-
-# Check for logs dir
-if not exists(logs_dir):
-    os.mkdir(logs_dir)
-
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s [%(levelname)s] %(message)s",
-    handlers=[
-        logging.FileHandler(logs_dir + "application_" + today_date + ".log"),
-        logging.StreamHandler(),
-    ],
-)
+NOTIFY_EVENT = "-NOTIFY-"
+LICENSE_EVENT = "-LICENSE-CHECK-"
+ROLLOVER_EVENT = "-DATE-ROLLOVER-"
+# Longest the date_rollover job sleeps before checking the date again
+ROLLOVER_CHECK_SECONDS = 60
+IPC_EVENT = "-IPC-LOGGED-"
+REPORT_SYNC_EVENT = "-REPORT-SYNC-"
+DAY_STATE_EVENT = "-DAY-STATE-"
+LICENSE_CHECK_SECONDS = 300
+# Longest license_grace_hours may allow the app to run without a validation
+MAX_GRACE_HOURS = 72
+
+# PySimpleGUI, imported by load_gui() when the first window is about to open
+sg = None  # pylint: disable=invalid-name
+
+
+def load_gui():
+    """Function to import PySimpleGUI and register the app theme"""
+    global sg  # pylint: disable=global-statement,invalid-name
+    if sg is None:
+        import PySimpleGUI  # pylint: disable=import-outside-toplevel
+
+        PySimpleGUI.LOOK_AND_FEEL_TABLE["WUBU2"] = {
+            "BACKGROUND": "#96C5F7",
+            "TEXT": "#F2F4FF",
+            "INPUT": "#A9D3FF",
+            "TEXT_INPUT": "#F2F4FF",
+            "SCROLL": "#99CC99",
+            "BUTTON": ("#A9D3FF", "#FFFFFF"),
+            "PROGRESS": ("# D1826B", "# CC8019"),
+            "BORDER": 0,
+            "SLIDER_DEPTH": 1,
+            "PROGRESS_DEPTH": 0,
+        }
+        PySimpleGUI.theme("wubu2")
+        sg = PySimpleGUI
+    return sg
+
+
+def init_app():
+    """Function to create the app directories and set up logging"""
+    # Check for home dir
+    if not exists(home_dir):
+        os.mkdir(home_dir)
+
+    # Check for logs dir
+    if not exists(logs_dir):
+        os.mkdir(logs_dir)
+
+    setup_logging(logs_dir)
 
 
 def check_for_dir(full_dir):
@@ -66,53 +124,134 @@ def check_for_dir(full_dir):
         logging.info("%s dir created", full_dir)
 
 
-default_config = json.dumps(
-    {
-        "total_hours": {
-            "description": "Total number of hours in working day",
-            "value": 8,
-        },
-        "reminder_minutes": {
-            "description": "After how many minutes would you like a reminder",
-            "value": 10,
-        },
-        "email_address": "",
-        "license_level": "free",
-        "license_code": "",
-        "license_validated": "",
-        "api_server": "https://api-wubu2.tjth.co",
-        "historic_reports_to_show": 7,
-        "time_bins": [
-            {
-                "name": "default",
-                "nice_name": "Default",
-                "description": "Default time bin",
-            }
-        ],
-    }
-)
+def upload_config(config_data):
+    """Function to upload config to the Cloud, raises so the outbox retries"""
+    push_config(api_client, config_store, get_sync_state(), config_data)
 
 
-def get_config():
-    """Function to get configuration from local config"""
-    check_for_dir(config_dir)
-    try:
-        with open(config_dir + "all.json", encoding="utf-8") as config:
-            config = json.load(config)
-    except FileNotFoundError:
-        logging.info("all.json config missing, generating from skeleton")
-        with open(config_dir + "all.json", "w", encoding="UTF-8") as config_file:
-            config_file.write(default_config)
-            config_file.close()
-        logging.info("Default config applied!")
-        config = default_config
-    return json.dumps(config)
+api_client = ApiClient()
+config_outbox = ConfigOutbox(home_dir + "outbox/config.json", upload_config)
+
+
+def queue_cloud_upload(config_data):
+    """Function to queue a background config upload if paid"""
+    if config_data["license_level"] == "paid":
+        config_outbox.enqueue(config_data)
+
+
+def sync_report_counters(payload):
+    """Function to exchange report counters with the Cloud, raises on failure"""
+    current_config = get_config()
+    post_url = api_client.post(
+        current_config["api_server"],
+        "/api/reports/sync",
+        dict(
+            payload,
+            id=current_config["email_address"],
+            license=current_config["license_code"],
+        ),
+    )
+    if post_url.status_code >= 500:
+        raise ApiError("Report sync returned " + str(post_url.status_code))
+    response = json.loads(post_url.text)
+    if response.get("status") != "ok":
+        raise ApiError("Report sync refused: " + str(response.get("details")))
+    return response
+
+
+def start_report_sync(main_window):
+    """Function to start Cloud report sync if paid and enabled, else None"""
+    current_config = get_config()
+    if current_config["license_level"] != "paid" or not current_config.get(
+        "report_sync", False
+    ):
+        return None
+    report_sync = ReportSync(
+        home_dir + "cache/report_sync.json",
+        get_device_id(),
+        get_report_store(),
+        get_remote_counters(),
+        sync_report_counters,
+        lambda days: main_window.write_event_value(REPORT_SYNC_EVENT, days),
+    )
+    report_sync.start()
+    return report_sync
+
+
+def bin_paging_row():
+    """Function to build the search box and page buttons above a bin list"""
+    return [
+        sg.InputText(
+            "",
+            key=BIN_SEARCH_KEY,
+            enable_events=True,
+            size=(15, 1),
+            font=font,
+            tooltip="Search bins by name or description",
+        ),
+        sg.Button("<", key=BIN_PREVIOUS_KEY, font=font, tooltip="Previous bins"),
+        sg.Text("", key=BIN_PAGE_KEY, font=font),
+        sg.Button(">", key=BIN_NEXT_KEY, font=font, tooltip="Next bins"),
+    ]
+
+
+def handle_paging_event(pager, event, values):
+    """Function to apply a search or page event, returns False for other events"""
+    if event == BIN_SEARCH_KEY:
+        pager.search(values[BIN_SEARCH_KEY])
+    elif event == BIN_PREVIOUS_KEY:
+        pager.move(-1)
+    elif event == BIN_NEXT_KEY:
+        pager.move(1)
+    else:
+        return False
+    pager.refresh()
+    return True
+
+
+def show_main_bin_page(main_window, pager):
+    """Function to fill the main window's Log slots from the pager"""
+    for slot in range(pager.page_size):
+        time_bin = pager.bin_at(slot)
+        if time_bin is None:
+            main_window[(LOG_KEY, slot)].update(visible=False)
+        else:
+            main_window[(LOG_KEY, slot)].update(
+                text="Log " + time_bin["nice_name"], visible=True
+            )
+    main_window[BIN_PAGE_KEY].update(pager.page_label())
+
+
+def show_settings_bin_page(settings_window, pager):
+    """Function to fill the settings window's bin rows from the pager"""
+    for slot in range(pager.page_size):
+        time_bin = pager.bin_at(slot)
+        settings_window[(BIN_ROW_KEY, slot)].update(visible=time_bin is not None)
+        if time_bin is None:
+            continue
+        settings_window[(BIN_NAME_KEY, slot)].update("System Name: " + time_bin["name"])
+        settings_window[(BIN_DESCRIPTION_KEY, slot)].update(
+            "Description: " + time_bin["description"]
+        )
+        settings_window[(EDIT_KEY, slot)].update(text="Edit " + time_bin["nice_name"])
+        settings_window[(DELETE_KEY, slot)].update(
+            text="Delete " + time_bin["nice_name"]
+        )
+    settings_window[BIN_PAGE_KEY].update(pager.page_label())
 
 
 def show_settings():
-    """Popup modal with current settings"""
-    config = json.loads(get_config())
+    """Popup modal with current settings
+
+    Returns {old system name: new system name} for bins renamed, so today's
+    report can follow them.
+    """
+    config = get_config()
+    renamed_bins = {}
+    settings_pager = BinPager(get_bin_registry(), int(config.get("bin_page_size", 10)))
+    settings_pager.refresh()
     while True:
+        open_started = time.perf_counter()
         settings_layout = [
             [sg.Text("Settings", font=big_font)],
             [
@@ -172,22 +311,36 @@ def show_settings():
                 )
             ],
             [sg.Text("Bins", font=big_font)],
+            bin_paging_row(),
             [
                 [
-                    sg.Text("System Name: " + time_bin["name"], font=font),
-                    sg.Text("Description: " + time_bin["description"], font=font),
-                    sg.Button(
-                        "Edit " + time_bin["nice_name"],
-                        font=font,
-                        tooltip="Edit bin settings for " + time_bin["nice_name"],
-                    ),
-                    sg.Button(
-                        "Delete " + time_bin["nice_name"],
-                        font=font,
-                        tooltip="Delete bin " + time_bin["nice_name"],
-                    ),
+                    sg.pin(
+                        sg.Column(
+                            [
+                                [
+                                    sg.Text("", key=(BIN_NAME_KEY, slot), font=font),
+                                    sg.Text(
+                                        "", key=(BIN_DESCRIPTION_KEY, slot), font=font
+                                    ),
+                                    sg.Button(
+                                        "",
+                                        key=(EDIT_KEY, slot),
+                                        font=font,
+                                        tooltip="Edit bin settings",
+                                    ),
+                                    sg.Button(
+                                        "",
+                                        key=(DELETE_KEY, slot),
+                                        font=font,
+                                        tooltip="Delete bin",
+                                    ),
+                                ]
+                            ],
+                            key=(BIN_ROW_KEY, slot),
+                        )
+                    )
                 ]
-                for time_bin in config["time_bins"]
+                for slot in range(settings_pager.page_size)
             ],
             [
                 sg.Button("Add bin", font=font),
@@ -197,43 +350,49 @@ def show_settings():
         settings_window = sg.Window(
             "WUBU2 Settings", settings_layout, use_default_focus=False, finalize=True
         )
+        show_settings_bin_page(settings_window, settings_pager)
+        metrics.observe(
+            "wubu2_window_open",
+            time.perf_counter() - open_started,
+            {"window": "settings"},
+            "Time to build and show a window",
+        )
         logging.info("Settings opened")
         event, setting_values = settings_window.read()
+        while handle_paging_event(settings_pager, event, setting_values):
+            show_settings_bin_page(settings_window, settings_pager)
+            event, setting_values = settings_window.read()
         if event == sg.WIN_CLOSED:
             settings_window.close()
             break
         else:
             if event == "Request License":
-                url = config["api_server"] + "/api/auth/create"
-
-                post_url = requests.post(url, json={"id": config["email_address"]})
-
                 try:
+                    post_url = api_client.post(
+                        config["api_server"],
+                        "/api/auth/create",
+                        {"id": config["email_address"]},
+                    )
                     response = json.loads(post_url.text)
                     status = response["status"]
                     details = response["details"]
                 except json.JSONDecodeError:
                     status = "fail"
                     details = "Invalid response from api"
+                except ApiError as error_message:
+                    status = "fail"
+                    details = "Unable to reach api: " + str(error_message)
 
                 if status == "ok":
-                    with open(
-                        config_dir + "/all.json", "r+", encoding="UTF-8"
-                    ) as config_file:
-                        config_file_data = json.load(config_file)
-                        config_file_data["license_code"] = details["license_code"]
-                        config_file.seek(0)
-                        config_file.write(json.dumps(config_file_data))
-                        config_file.truncate()
-                        logging.info("Updated config with new license key")
-                        post_url = requests.post(
-                            config_file_data["api_server"] + "/api/config/upload",
-                            json={
-                                "id": config_file_data["email_address"],
-                                "license": config_file_data["license_code"],
-                                "config": config_file_data,
-                            },
+                    config_file_data = config_store.update(
+                        lambda config_data: set_license(
+                            config_data,
+                            config_data["email_address"],
+                            details["license_code"],
                         )
+                    )
+                    logging.info("Updated config with new license key")
+                    config_outbox.enqueue(config_file_data)
                 else:
                     sg.Popup(
                         "License request unsuccessful: " + details,
@@ -241,63 +400,43 @@ def show_settings():
                     )
 
             if event == "Save":
-                with open(
-                    config_dir + "/all.json", "r+", encoding="UTF-8"
-                ) as config_file:
-                    config_file_data = json.load(config_file)
-                    config_file_data["total_hours"]["value"] = setting_values[0]
-                    config_file_data["reminder_minutes"]["value"] = setting_values[1]
-                    config_file_data["historic_reports_to_show"] = int(
-                        setting_values[2]
-                    )
-                    config_file_data["email_address"] = setting_values[3]
-                    config_file_data["license_code"] = setting_values[4]
-                    config_file.seek(0)
-                    config_file.write(json.dumps(config_file_data))
-                    config_file.truncate()
-                    # Upload to cloud if paid
-                    if config_file_data["license_level"] == "paid":
-                        print("Got here")
-                        post_url = requests.post(
-                            config_file_data["api_server"] + "/api/config/upload",
-                            json={
-                                "id": config_file_data["email_address"],
-                                "license": config_file_data["license_code"],
-                                "config": config_file_data,
-                            },
-                        )
-                        logging.info("Settings uploaded to Cloud")
+
+                def apply_settings(config_data):
+                    config_data["total_hours"]["value"] = setting_values[0]
+                    config_data["reminder_minutes"]["value"] = setting_values[1]
+                    config_data["historic_reports_to_show"] = int(setting_values[2])
+                    set_license(config_data, setting_values[3], setting_values[4])
+
+                config_file_data = config_store.update(apply_settings)
+                queue_cloud_upload(config_file_data)
                 logging.info("New settings applied: %s", config_file_data)
-            if event.startswith("Edit"):
-                for edit_bin in config["time_bins"]:
-                    raw_event = event.replace("Edit ", "")
-                    if raw_event == edit_bin["nice_name"]:
-                        edit_bin_layout = [
-                            [
-                                sg.Text(
-                                    "Update fields below to edit "
-                                    + edit_bin["nice_name"],
-                                    font=font,
-                                ),
-                            ],
-                            [
-                                sg.Text("Nice name:", font=font),
-                                sg.InputText(
-                                    default_text=edit_bin["nice_name"], font=font
-                                ),
-                            ],
-                            [
-                                sg.Text("System name:", font=font),
-                                sg.InputText(default_text=edit_bin["name"], font=font),
-                            ],
-                            [
-                                sg.Text("Description:", font=font),
-                                sg.InputText(
-                                    default_text=edit_bin["description"], font=font
-                                ),
-                            ],
-                            [sg.Button("Save", font=font)],
-                        ]
+            # Bin buttons are keyed (action, slot), the pager knows the bin
+            event_bin = None
+            if isinstance(event, tuple):
+                event_bin = settings_pager.bin_at(event[1])
+            if event_bin is not None and event[0] == EDIT_KEY:
+                edit_bin = event_bin
+                edit_bin_layout = [
+                    [
+                        sg.Text(
+                            "Update fields below to edit " + edit_bin["nice_name"],
+                            font=font,
+                        ),
+                    ],
+                    [
+                        sg.Text("Nice name:", font=font),
+                        sg.InputText(default_text=edit_bin["nice_name"], font=font),
+                    ],
+                    [
+                        sg.Text("System name:", font=font),
+                        sg.InputText(default_text=edit_bin["name"], font=font),
+                    ],
+                    [
+                        sg.Text("Description:", font=font),
+                        sg.InputText(default_text=edit_bin["description"], font=font),
+                    ],
+                    [sg.Button("Save", font=font)],
+                ]
                 edit_bin_window = sg.Window(
                     "Edit bin", edit_bin_layout, use_default_focus=False, finalize=True
                 )
@@ -311,58 +450,38 @@ def show_settings():
                         "nice_name": bin_setting_values[0],
                         "description": bin_setting_values[2],
                     }
-                    with open(
-                        config_dir + "/all.json", "r+", encoding="UTF-8"
-                    ) as bin_config:
-                        bin_config_data = json.load(bin_config)
-                        list_position = 0
-                        for bin_config_item in bin_config_data["time_bins"]:
-                            if edit_bin["name"] != bin_config_item["name"]:
-                                list_position += 1
-                        bin_config_data["time_bins"][list_position] = new_bin_config
-                        bin_config.seek(0)
-                        bin_config.write(json.dumps(bin_config_data))
-                        bin_config.truncate()
-                        sg.Popup(
-                            "Bin edited successfully! App reload required to display new name",
-                            font=font,
-                        )
-                        post_url = requests.post(
-                            bin_config_data["api_server"] + "/api/config/upload",
-                            json={
-                                "id": bin_config_data["email_address"],
-                                "license": bin_config_data["license_code"],
-                                "config": bin_config_data,
-                            },
-                        )
+                    edited_name = edit_bin["name"]
+
+                    def apply_bin_edit(config_data):
+                        config_data["time_bins"] = [
+                            new_bin_config
+                            if time_bin["name"] == edited_name
+                            else time_bin
+                            for time_bin in config_data["time_bins"]
+                        ]
+
+                    bin_config_data = config_store.update(apply_bin_edit)
+                    if new_bin_config["name"] != edited_name:
+                        renamed_bins[edited_name] = new_bin_config["name"]
+                    sg.Popup("Bin edited successfully!", font=font)
+                    queue_cloud_upload(bin_config_data)
                     logging.info("New bin settings for applied: %s", new_bin_config)
                 edit_bin_window.close()
 
-            if event.startswith("Delete"):
-                del_pos = 0
-                for del_bin in config["time_bins"]:
-                    raw_event = event.replace("Delete ", "")
-                    if raw_event == del_bin["nice_name"]:
-                        with open(
-                            config_dir + "all.json", "r+", encoding="UTF-8"
-                        ) as bin_config:
-                            bin_config_data = json.load(bin_config)
-                            bin_config_data["time_bins"].pop(del_pos)
-                            bin_config.seek(0)
-                            bin_config.write(json.dumps(bin_config_data))
-                            bin_config.truncate()
-                            sg.Popup("Bin has been deleted!", font=font)
-                            logging.info("Bin has been deleted: %s", bin_config_data)
-                            post_url = requests.post(
-                                bin_config_data["api_server"] + "/api/config/upload",
-                                json={
-                                    "id": bin_config_data["email_address"],
-                                    "license": bin_config_data["license_code"],
-                                    "config": bin_config_data,
-                                },
-                            )
-                    else:
-                        del_pos += 1
+            if event_bin is not None and event[0] == DELETE_KEY:
+                deleted_name = event_bin["name"]
+
+                def apply_bin_delete(config_data):
+                    config_data["time_bins"] = [
+                        time_bin
+                        for time_bin in config_data["time_bins"]
+                        if time_bin["name"] != deleted_name
+                    ]
+
+                bin_config_data = config_store.update(apply_bin_delete)
+                sg.Popup("Bin has been deleted!", font=font)
+                logging.info("Bin has been deleted: %s", bin_config_data)
+                queue_cloud_upload(bin_config_data)
 
             if event == ("Add bin"):
                 add_bin_layout = [
@@ -393,55 +512,42 @@ def show_settings():
                         "nice_name": add_bin_values[0],
                         "description": add_bin_values[2],
                     }
-                    with open(
-                        config_dir + "all.json", "r+", encoding="UTF-8"
-                    ) as bin_config:
-                        bin_config_data = json.load(bin_config)
-                        # Validate bin nice name or system name
-                        # does not exist already with the same name
-                        okay_to_apply = True
-                        for current_bin in bin_config_data["time_bins"]:
-                            if (
-                                current_bin["name"].lower() == add_bin_values[1].lower()
-                                or current_bin["nice_name"].lower()
-                                == add_bin_values[0].lower()
-                            ):
-                                popup_text = (
-                                    "Bin cannot be created with the same name "
-                                    "as a current bin (System name must be unique)"
-                                )
-                                okay_to_apply = False
-                        if (
-                            len(add_bin_values[0]) == 0
-                            or len(add_bin_values[1]) == 0
-                            or len(add_bin_values[2]) == 0
-                        ):
-                            popup_text = "All fields must be entered"
-                            okay_to_apply = False
-
-                        if okay_to_apply:
-                            bin_config_data["time_bins"].append(add_bin_config)
-                            bin_config.seek(0)
-                            bin_config.write(json.dumps(bin_config_data))
-                            bin_config.truncate()
-                            popup_text = (
-                                "New bin added "
-                                "(NOTE: This requires an app reload to log time against)!"
+                    # Validate bin nice name or system name
+                    # does not exist already with the same name
+                    okay_to_apply = True
+                    bin_registry = get_bin_registry()
+                    if (
+                        bin_registry.get(add_bin_values[1]) is not None
+                        or add_bin_values[0].lower() in bin_registry.by_nice_name
+                    ):
+                        popup_text = (
+                            "Bin cannot be created with the same name "
+                            "as a current bin (System name must be unique)"
+                        )
+                        okay_to_apply = False
+                    if (
+                        len(add_bin_values[0]) == 0
+                        or len(add_bin_values[1]) == 0
+                        or len(add_bin_values[2]) == 0
+                    ):
+                        popup_text = "All fields must be entered"
+                        okay_to_apply = False
+
+                    if okay_to_apply:
+                        bin_config_data = config_store.update(
+                            lambda config_data: config_data["time_bins"].append(
+                                add_bin_config
                             )
-                        post_url = requests.post(
-                            bin_config_data["api_server"] + "/api/config/upload",
-                            json={
-                                "id": bin_config_data["email_address"],
-                                "license": bin_config_data["license_code"],
-                                "config": bin_config_data,
-                            },
                         )
-                        sg.Popup(popup_text, font=font)
+                        popup_text = "New bin added!"
+                        queue_cloud_upload(bin_config_data)
+                    sg.Popup(popup_text, font=font)
                 logging.info("New bin created: %s", add_bin_config)
                 add_bin_window.close()
 
         settings_window.close()
         break
+    return renamed_bins
 
 
 def show_ask_email():
@@ -476,22 +582,19 @@ def show_ask_email():
                 entered_email_address = "unlicensed"
             else:
                 entered_email_address = email_address_value[0]
-            with open(config_dir + "/all.json", "r+", encoding="UTF-8") as all_config:
-                all_config_data = json.load(all_config)
-                all_config_data["email_address"] = entered_email_address
-                all_config.seek(0)
-                all_config.write(json.dumps(all_config_data))
-                all_config.truncate()
-                if entered_email_address == "unlicensed":
-                    email_request_message = (
-                        "No problem, only required for paid features!"
-                    )
-                else:
-                    email_request_message = (
-                        "Email address updated successfully!"
-                        " (With whatever you entered.. We're not checking!"
-                    )
-                sg.Popup(email_request_message, font=font)
+            config_store.update(
+                lambda config_data: config_data.update(
+                    email_address=entered_email_address
+                )
+            )
+            if entered_email_address == "unlicensed":
+                email_request_message = "No problem, only required for paid features!"
+            else:
+                email_request_message = (
+                    "Email address updated successfully!"
+                    " (With whatever you entered.. We're not checking!"
+                )
+            sg.Popup(email_request_message, font=font)
 
     email_enter_window.close()
 
@@ -499,71 +602,133 @@ def show_ask_email():
 def get_report():
     """Function to get or generate todays report"""
     check_for_dir(reports_dir)
-    current_config = json.loads(get_config())
-    try:
-        with open(reports_dir + today_date + ".json", encoding="utf-8") as report:
-            report = json.load(report)
-    except FileNotFoundError:
+    with metrics.timed("wubu2_get_report", description="Today's report reads"):
+        report = get_report_view().read_day(today_date)
+    if report is None:
         logging.info("Generating report file on first run for today")
-        with open(
-            reports_dir + today_date + ".json", "w", encoding="UTF-8"
-        ) as report_file:
-            report_skeleton = {}
-            for update_bin in current_config["time_bins"]:
-                report_skeleton.update({update_bin["name"]: 0})
-            report_file.write(json.dumps(report_skeleton))
-            report_file.close()
+        report = {}
+        for update_bin in get_config()["time_bins"]:
+            report.update({update_bin["name"]: 0})
+        get_report_store().write_summary(today_date, report)
         logging.info("Default report_skeleton applied to report!")
-        report = report_skeleton
     return json.dumps(report)
 
 
-def show_report():
-    """Popup modal with current time logging stats"""
+def format_report(report_json):
+    """Function to format a report as one line per bin"""
+    report_text = ""
+    for report_item in report_json:
+        report_text += report_item + " : " + str(report_json[report_item]) + " \n"
+    return report_text
+
+
+def today_text(day_state):
+    """Function to format the day state as one line per bin"""
+    counts = day_state.snapshot()[0]
+    return "\n".join(
+        time_bin + ": " + str(amount) for time_bin, amount in counts.items()
+    )
+
+
+def show_report(day_state=None):
+    """Popup modal with current time logging stats, today's kept live"""
     logging.info("Report opened")
-    current_config = json.loads(get_config())
-    files = os.listdir(reports_dir)
-    paths = [os.path.join(reports_dir, basename) for basename in files]
-    paths.sort(key=os.path.getctime)
-    historic_report_list = []
-    for path in paths:
-        file_name = path.split("/")[-1].replace(".json", "")
-        with open(path, "r", encoding="UTF-8") as historic_report_item:
-            report_json = json.load(historic_report_item)
-            report_text = ""
-            for report_item in report_json:
-                report_text += (
-                    report_item + " : " + str(report_json[report_item]) + " \n"
-                )
-            layout = [[sg.T(report_text, font=font)]]
-            historic_report_list.insert(0, [sg.Tab(file_name, layout, font=font)])
-            historic_reports_to_show = current_config["historic_reports_to_show"]
-            historic_report_list = historic_report_list[0:historic_reports_to_show]
-    historic_report_frame = [[sg.TabGroup(historic_report_list, font=font)]]
+    open_started = time.perf_counter()
+    current_config = get_config()
+    report_store = get_report_view()
+    historic_days = report_store.recent_days(current_config["historic_reports_to_show"])
+    # Only the newest report is read up front, other tabs load on first view
+    historic_report_list = [
+        [
+            sg.Tab(
+                day,
+                [[sg.T("", font=font, key="-HISTORIC-" + day)]],
+                font=font,
+                key="-TAB-" + day,
+            )
+        ]
+        for day in historic_days
+    ]
+    historic_report_frame = [
+        [
+            sg.TabGroup(
+                historic_report_list, font=font, enable_events=True, key="-HISTORIC-"
+            )
+        ]
+    ]
+    if day_state is None:
+        day_state = DayState(today_date, json.loads(get_report()))
+    # One refresh for all three tabs, it also writes changes made by logging
+    rollups = get_rollups()
+    rollups.refresh()
+    rollup_tabs = [
+        [
+            sg.Tab(
+                title,
+                [
+                    [
+                        sg.T(
+                            "\n".join(
+                                key + "\n" + format_report(totals)
+                                for key, totals in rollups.totals(
+                                    period, current_config["historic_reports_to_show"]
+                                )
+                            ),
+                            font=font,
+                        )
+                    ]
+                ],
+                font=font,
+            )
+        ]
+        for title, period in (("Weeks", "week"), ("Months", "month"), ("Years", "year"))
+    ]
     report_layout = [
         [sg.Text("Todays", font=big_font)],
-        [
-            [
-                sg.Text(
-                    time_bin + ": " + str(json.loads(get_report())[time_bin]),
-                    font=font,
-                )
-            ]
-            for time_bin in json.loads(get_report())
-        ],
+        [sg.Text(today_text(day_state), font=font, key="-TODAY-")],
         [sg.Frame("Historic Reports", historic_report_frame, font=font)],
+        [sg.Frame("Totals", [[sg.TabGroup(rollup_tabs, font=font)]], font=font)],
     ]
     report_window = sg.Window(
         "Time Report", report_layout, use_default_focus=False, finalize=True
     )
-    report_window.read()
+    metrics.observe(
+        "wubu2_window_open",
+        time.perf_counter() - open_started,
+        {"window": "report"},
+        "Time to build and show a window",
+    )
+    unsubscribe = day_state.subscribe(post_on_change(report_window, DAY_STATE_EVENT))
+    loaded_days = set()
+    pending_days = historic_days[:1]
+    while True:
+        for day in pending_days:
+            if day not in loaded_days:
+                report_window["-HISTORIC-" + day].update(
+                    format_report(report_store.read_day(day) or {})
+                )
+                loaded_days.add(day)
+        event, report_values = report_window.read()
+        if event == DAY_STATE_EVENT:
+            report_values[DAY_STATE_EVENT].clear()
+            report_window["-TODAY-"].update(today_text(day_state))
+            if day_state.day in loaded_days:
+                report_window["-HISTORIC-" + day_state.day].update(
+                    format_report(day_state.snapshot()[0])
+                )
+            pending_days = []
+            continue
+        if event != "-HISTORIC-":
+            break
+        pending_days = [report_values["-HISTORIC-"].replace("-TAB-", "", 1)]
 
+    unsubscribe()
     report_window.close()
 
 
 def show_about():
     """Popup modal with the about page for the app"""
-    current_config = json.loads(get_config())
+    current_config = get_config()
 
     about_layout = [
         [sg.Text("About WUBU2", font=big_font)],
@@ -597,138 +762,288 @@ def show_about():
         "About WUBU2", about_layout, use_default_focus=False, finalize=True
     )
     event, about_values = about_window.read()
-    if event == "WEBSITE_LINK":
-        logging.debug("About button clicked, details: %s", about_values)
-        webbrowser.open(WEBSITE_LINK)
-    if event == "AUTHOR_LINK":
-        webbrowser.open(AUTHOR_LINK)
+    if event in ("WEBSITE_LINK", "AUTHOR_LINK"):
+        import webbrowser  # pylint: disable=import-outside-toplevel
+
+        logging.debug("About link clicked, details: %s", about_values)
+        webbrowser.open(WEBSITE_LINK if event == "WEBSITE_LINK" else AUTHOR_LINK)
 
     about_window.close()
 
 
-class NotifyThread(threading.Thread):
-    """Class used for management of notification thread"""
-
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self._stopper = threading.Event()
-
-    def stop(self):
-        """Stop function"""
-        logging.info("NotifyThread will exit on next cycle")
-        self._stopper.set()
-
-    def stopped(self):
-        """Check if stopped"""
-        return self._stopper.isSet()
-
-    def run(self):
-        start_time = time.time()
-        while True:
-            if self.stopped():
-                logging.info("NotifyThread stopping")
-                break
-            config = json.loads(get_config())
-            time_since = round((time.time() - start_time) / 60, 1)
-            if time_since > float(config["reminder_minutes"]["value"]):
-                logging.info("Required time elapsed, triggering notification")
-                break
-            else:
-                remaining_time = round(
-                    float(config["reminder_minutes"]["value"]) - time_since, 1
-                )
-                logging.info("Not yet ready to notify, %s minutes left", remaining_time)
-                time.sleep(1)
+def roll_over_date():
+    """Function to move today_date on to the current day"""
+    global today_date  # pylint: disable=global-statement
+    today_date = current_date()
+    logging.info("Date rolled over to %s", today_date)
 
 
-def check_licensing():
-    """Function to check licensing against API"""
-    date_format = "%Y-%m-%d %H:%M:%S"
-    current_config = json.loads(get_config())
-    now_time = datetime.now().strftime(date_format)
-    now_time = datetime.strptime(now_time, date_format)
+def schedule_rollover_check(scheduler, main_window):
+    """Function to post a rollover event once the wall clock reaches a new day
+
+    The scheduler sleeps on the monotonic clock, which stops during suspend,
+    so the date is checked at midnight or every ROLLOVER_CHECK_SECONDS,
+    whichever comes first.
+    """
+
+    def check_date():
+        if current_date() != today_date:
+            main_window.write_event_value(ROLLOVER_EVENT, None)
+        schedule_rollover_check(scheduler, main_window)
+
+    return scheduler.schedule(
+        "date_rollover", seconds_until_midnight(ROLLOVER_CHECK_SECONDS), check_date
+    )
+
+
+def schedule_reminder(scheduler, main_window, started):
+    """Function to schedule the next reminder, counted from started"""
+    reminder_seconds = float(get_config()["reminder_minutes"]["value"]) * 60
+    return scheduler.schedule(
+        "reminder",
+        max(0, started + reminder_seconds - time.monotonic()),
+        lambda: main_window.write_event_value(NOTIFY_EVENT, None),
+    )
 
+
+def refresh_license(main_window):
+    """Function to fetch a fresh signed license token, run off the UI thread
+
+    A license check is posted however the refresh ends, so the check always
+    sees the outcome of the latest refresh attempt.
+    """
     try:
-        # If not unlicensed
-        if current_config["email_address"] != "unlicensed":
-            if len(current_config["license_validated"]) == 0:
-                validated_time = datetime.strptime(str(now_time), date_format)
-            else:
-                validated_time = datetime.strptime(
-                    current_config["license_validated"], date_format
-                )
-            time_diff = now_time - validated_time
-            # If never validated or validated > 1 minute ago
-            if (
-                len(current_config["license_validated"]) == 0
-                or time_diff.total_seconds() / 60 > 0.1
-            ):
-                logging.info("Validating license..")
-
-                url = current_config["api_server"] + "/api/auth/validate"
-
-                post_url = requests.post(
-                    url,
-                    json={
-                        "id": current_config["email_address"],
-                        "license": current_config["license_code"],
-                    },
-                )
+        update_license()
+    finally:
+        main_window.write_event_value(LICENSE_EVENT, None)
 
-                try:
-                    response = json.loads(post_url.text)
-                    status = response["status"]
-                    details = response["details"]
-                except json.JSONDecodeError:
-                    status = "fail"
-                    details = "Invalid response from api"
-                # License failed to validate
-                with open(
-                    config_dir + "/all.json", "r+", encoding="UTF-8"
-                ) as all_config_license_val:
-                    all_config_license_val_data = json.load(all_config_license_val)
-                    all_config_license_val_data["license_validated"] = str(now_time)
-                    if status == "ok":
-                        all_config_license_val_data["license_level"] = response[
-                            "details"
-                        ]["license_status"]
-                    all_config_license_val.seek(0)
-                    all_config_license_val.write(
-                        json.dumps(all_config_license_val_data)
-                    )
-                    all_config_license_val.truncate()
-                logging.info("License validation complete - %s", str(details))
-            else:
-                status = "ok"
-                details = "Not ready to validate license yet, time left: " + str(
-                    time_diff.total_seconds() / 60
-                )
+
+def update_license():
+    """Function to ask the api_server about the license and cache the answer"""
+    date_format = "%Y-%m-%d %H:%M:%S"
+    current_config = get_config()
+    if current_config["email_address"] == "unlicensed" or not licensed(current_config):
+        return
+    logging.info("Refreshing license..")
+    try:
+        post_url = api_client.post(
+            current_config["api_server"],
+            "/api/auth/validate",
+            {
+                "id": current_config["email_address"],
+                "license": current_config["license_code"],
+            },
+        )
+        response = json.loads(post_url.text)
+        status = response["status"]
+        details = response["details"]
+    except (ApiError, json.JSONDecodeError, KeyError) as error:
+        # Keep using the cached license, check_licensing applies the grace period
+        logging.warning("License refresh failed, using cached license: %s", error)
+        return
+
+    def apply_license(license_config_data):
+        if status == "ok":
+            license_config_data["license_validated"] = datetime.now().strftime(
+                date_format
+            )
+            license_config_data["license_level"] = details.get(
+                "license_status", license_config_data["license_level"]
+            )
+            license_config_data["license_error"] = ""
         else:
-            status = "ok"
-            details = "Unlicensed email address"
-    except Exception as error_message:
+            license_config_data["license_error"] = str(details)
+
+    config_store.update(apply_license)
+    logging.info("License refresh complete - %s", str(details))
+
+
+def check_licensing():
+    """Function to check licensing offline against the last validation time"""
+    date_format = "%Y-%m-%d %H:%M:%S"
+    current_config = get_config()
+    grace_hours = min(
+        float(current_config.get("license_grace_hours", MAX_GRACE_HOURS)),
+        MAX_GRACE_HOURS,
+    )
+
+    if current_config["email_address"] == "unlicensed":
+        status = "ok"
+        details = "Unlicensed email address"
+    elif current_config.get("license_error"):
         status = "fail"
-        details = "Something has gone wrong: " + str(error_message)
+        details = "License rejected by api: " + current_config["license_error"]
+    elif len(current_config["license_validated"]) == 0:
+        # First background refresh has not completed yet
+        status = "ok"
+        details = "License not yet validated"
+    else:
+        validated_time = datetime.strptime(
+            current_config["license_validated"], date_format
+        )
+        validated_age = (datetime.now() - validated_time).total_seconds()
+        if validated_age < 0:
+            # Set ahead of the clock, which would otherwise extend the grace period
+            status = "fail"
+            details = "License validation time is in the future: " + str(validated_time)
+        elif validated_age < grace_hours * 3600:
+            status = "ok"
+            details = "License validated at " + current_config["license_validated"]
+        else:
+            status = "fail"
+            details = "License has not been validated since " + str(validated_time)
 
     response = json.dumps({"status": status, "details": details})
     return response
 
 
-def main():
-    """Main app launch function"""
-    logging.info("Getting config")
-    json.loads(get_config())
-    config = json.loads(get_config())
+def start_license_refresh(main_window):
+    """Function to refresh the license in a short-lived background thread"""
+    threading.Thread(
+        target=refresh_license, args=(main_window,), name="license_refresh", daemon=True
+    ).start()
+
+
+def licensed(current_config):
+    """Function to check if the config holds a non-free license"""
+    return (
+        current_config["license_level"] != "free"
+        or len(current_config["license_code"]) > 0
+    )
+
+
+def set_license(config_data, email_address, license_code):
+    """Function to set the license details, dropping state kept for the old ones
+
+    The validation time, level and any rejection from the api
+    belong to the previous email address and license code, so they are reset
+    for the next license refresh to fill in.
+    """
+    if (config_data["email_address"], config_data["license_code"]) != (
+        email_address,
+        license_code,
+    ):
+        for key in (
+            "license_level",
+            "license_validated",
+            "license_error",
+        ):
+            config_data[key] = default_config[key]
+    config_data["email_address"] = email_address
+    config_data["license_code"] = license_code
+
+
+def refresh_total(main_window, day_state):
+    """Function to update the logged total shown in the main window"""
+    hours_spent = day_state.total
+    working_hours = get_config()["total_hours"]["value"]
+    main_window["current_total"].update(
+        "Total logged: " + str(hours_spent) + "/" + str(working_hours)
+    )
+
+
+def handle_ipc_requests(main_window, day_state, requests):
+    """Function to apply a batch of IPC requests, run on the IPC thread"""
+    responses = []
+    time_logged = False
+    for request in requests:
+        operation = request.get("op") if isinstance(request, dict) else None
+        if operation == "log":
+            time_bin = get_bin_registry().find(str(request.get("bin", "")))
+            amount = request.get("amount", 1)
+            if time_bin is None:
+                responses.append(
+                    {
+                        "status": "fail",
+                        "details": "Unknown bin " + str(request.get("bin")),
+                    }
+                )
+                continue
+            if not isinstance(amount, int) or isinstance(amount, bool) or amount < 1:
+                responses.append(
+                    {"status": "fail", "details": "amount must be a positive integer"}
+                )
+                continue
+            # The wall clock date, the UI thread rolls today_date over on the
+            # next event
+            log_date = current_date()
+            if log_date != today_date:
+                main_window.write_event_value(ROLLOVER_EVENT, None)
+            get_report_store().log(log_date, time_bin["name"], amount)
+            time_logged = True
+            logging.info("%s time logged over IPC", time_bin["nice_name"])
+            new_total = day_state.add(log_date, time_bin["name"], amount)
+            get_rollups().update([log_date])
+            if new_total is None:
+                # Logged just as the day rolled over
+                new_total = get_report_view().read_day(log_date)[time_bin["name"]]
+            responses.append(
+                {"status": "ok", "bin": time_bin["name"], "total": new_total}
+            )
+        elif operation == "totals":
+            responses.append(
+                {
+                    "status": "ok",
+                    "date": day_state.day,
+                    "totals": day_state.snapshot()[0],
+                    "total_hours": get_config()["total_hours"]["value"],
+                }
+            )
+        else:
+            responses.append(
+                {"status": "fail", "details": "Unknown op " + str(operation)}
+            )
+    if time_logged:
+        # Let the UI thread ask for a report sync
+        main_window.write_event_value(IPC_EVENT, None)
+    return responses
+
+
+def reload_bins(main_window, main_pager, day_state, renamed_bins=None):
+    """Function to show changed bins in the running main window
+
+    Today's time logged against a renamed bin is moved to its new name with
+    a single balancing journal entry.
+    """
+    if renamed_bins:
+        local_report = get_report_store().read_day(today_date) or {}
+        moves = {}
+        for old_name, new_name in renamed_bins.items():
+            amount = local_report.get(old_name, 0)
+            if amount:
+                moves[old_name] = moves.get(old_name, 0) - amount
+                moves[new_name] = moves.get(new_name, 0) + amount
+        if moves:
+            get_report_store().log_many(today_date, moves)
+            logging.info("Moved today's time for renamed bins: %s", renamed_bins)
+        day_state.replace(today_date, get_report_view().read_day(today_date) or {})
+    main_pager.refresh(get_bin_registry())
+    show_main_bin_page(main_window, main_pager)
+
+
+def build_main_window(config):
+    """Function to build the main widget window
+
+    Only bin_page_size Log buttons are made, BinPager fills them from the
+    current search and page, so the window is the same size for any number
+    of bins.
+    """
+    load_gui()
+    page_size = int(config.get("bin_page_size", 10))
     main_layout = [
+        bin_paging_row(),
         [
             [
-                sg.Button(
-                    "Log " + time_bin["nice_name"],
-                    font=font,
-                    tooltip="Log time in " + time_bin["nice_name"] + " bin",
+                sg.pin(
+                    sg.Button(
+                        "",
+                        key=(LOG_KEY, slot),
+                        font=font,
+                        tooltip="Log time in this bin",
+                    )
                 )
             ]
-            for time_bin in config["time_bins"]
+            for slot in range(page_size)
         ],
         [sg.Text("", font=font, key="current_total")],
         [
@@ -744,68 +1059,145 @@ def main():
         [sg.Button("About", font=font, tooltip="About the app")],
         [sg.Button("Exit", font=font, tooltip="Exit the app")],
     ]
+    return sg.Window(
+        "WUBU2", main_layout, keep_on_top=True, location=(1000, 200), finalize=True
+    )
+
+
+def main():
+    """Main app launch function"""
+    init_app()
+    logging.info("Whatubinup2 starting..")
+    logging.info("Getting config")
+    config = get_config()
     logging.info("Launching client")
-    main_window = sg.Window(
-        "WUBU2", main_layout, keep_on_top=True, location=(1000, 200)
+    main_window = build_main_window(config)
+    main_pager = BinPager(get_bin_registry(), int(config.get("bin_page_size", 10)))
+
+    # Check email address configured
+    if len(config["email_address"]) < 1:
+        show_ask_email()
+
+    # Sync settings
+    current_config = get_config()
+    if licensed(current_config):
+        try:
+            # Retrieve config changes from Cloud
+            print("Retrieving config from Cloud")
+            if pull_config(api_client, config_store, get_sync_state()) == "delta":
+                # Upload anything changed locally while offline
+                changes, removed = get_sync_state().local_changes(get_config())
+                if changes or removed:
+                    queue_cloud_upload(get_config())
+            logging.info("Updated local config from cloud")
+        except Exception as error_message:
+            print("Failed to retrieve config: " + str(error_message))
+
+    # Bins as they are after any Cloud changes
+    main_pager.refresh(get_bin_registry())
+    show_main_bin_page(main_window, main_pager)
+
+    # Reminders, license checks and the date rollover are posted as window
+    # events by the scheduler, so the loop below blocks in read() until
+    # something happens
+    scheduler = Scheduler(name="scheduler")
+    scheduler.start()
+    config_outbox.start()
+    get_report_store().compact_before(today_date)
+    # Today's counts are read once, then kept up to date as time is logged
+    day_state = DayState(today_date, json.loads(get_report()))
+    day_state.subscribe(post_on_change(main_window, DAY_STATE_EVENT))
+    refresh_total(main_window, day_state)
+    ipc_server = IpcServer(
+        ipc_address(home_dir),
+        lambda requests: handle_ipc_requests(main_window, day_state, requests),
+    )
+    ipc_server.start()
+    report_sync = start_report_sync(main_window)
+    metrics_writer = metrics.MetricsFileWriter(home_dir + "metrics.prom")
+    if config.get("metrics_file", True):
+        scheduler.schedule(
+            "metrics",
+            float(config.get("metrics_interval_seconds", 60)),
+            metrics_writer.write,
+            interval=float(config.get("metrics_interval_seconds", 60)),
+        )
+    if config.get("metrics_port"):
+        try:
+            metrics.serve(int(config["metrics_port"]))
+        except OSError as error_message:
+            logging.warning("Unable to serve metrics: %s", error_message)
+    reminder_started = time.monotonic()
+    reminder_job = schedule_reminder(scheduler, main_window, reminder_started)
+    # The first check is posted by the first license refresh once it is done,
+    # so a stale cached token or error is not acted on before it is refreshed
+    scheduler.schedule(
+        "license_check",
+        LICENSE_CHECK_SECONDS,
+        lambda: main_window.write_event_value(LICENSE_EVENT, None),
+        interval=LICENSE_CHECK_SECONDS,
+    )
+    scheduler.schedule(
+        "license_refresh",
+        0,
+        lambda: start_license_refresh(main_window),
+        interval=float(config.get("license_refresh_minutes", 60)) * 60,
+    )
+    schedule_rollover_check(scheduler, main_window)
+    scheduler.schedule(
+        "log_retention",
+        0,
+        lambda: prune_logs(
+            logs_dir,
+            int(get_config().get("log_retention_days", 30)),
+            get_config().get("log_compress", True),
+        ),
+        interval=24 * 60 * 60,
     )
-    first_run = True
+
     while True:
-        today_report = json.loads(get_report())
-        current_config = json.loads(get_config())
-        list_bins = config["time_bins"]
-
-        # Check email address configured
-        if first_run:
-            if len(current_config["email_address"]) < 1:
-                show_ask_email()
-
-        # Sync settings
-        if first_run:
-            if (
-                current_config["license_level"] != "free"
-                or len(current_config["license_code"]) > 0
-            ):
-                try:
-                    # Retrieve config from Cloud
-                    print("Retrieving config from Cloud")
-                    post_url = requests.post(
-                        current_config["api_server"] + "/api/config/sync",
-                        json={
-                            "id": current_config["email_address"],
-                            "license": current_config["license_code"],
-                        },
-                    )
-                    cloud_config = json.loads(post_url.text)["details"]
-                    # Apply Cloud config if not license_validated
-                    with open(
-                        config_dir + "/all.json", "r+", encoding="UTF-8"
-                    ) as config_file:
-                        config_file_data = json.load(config_file)
-                        for setting in cloud_config:
-                            if setting != "license_validated":
-                                config_file_data[setting] = cloud_config[setting]
-                        config_file.seek(0)
-                        config_file.write(json.dumps(config_file_data))
-                        config_file.truncate()
-                        logging.info("Updated local config from cloud")
-                except Exception as error_message:
-                    print("Failed to retrieve config: " + str(error_message))
-
-        if len(threading.enumerate()) < 2:
-            if not first_run:
-                sg.Popup("Log your time!", font=font)
-                logging.info("Time logging prompt acknowledged")
-            notify_thread_manage = NotifyThread()
-            notify_thread_manage.start()
-            first_run = False
-
-        # Check licensing
-        if not first_run:
-            # If not a free license, validate with api
-            if (
-                current_config["license_level"] != "free"
-                or len(current_config["license_code"]) > 0
-            ):
+        event, main_values = main_window.read()
+        iteration_started = time.perf_counter()
+        if main_values:
+            logging.debug("Event triggered, entered values: %s", main_values)
+        if current_date() != today_date:
+            # Checked on every event, not only on ROLLOVER_EVENT, so nothing is
+            # logged against yesterday after waking from suspend
+            roll_over_date()
+            get_report_store().compact_before(today_date)
+            day_state.replace(today_date, json.loads(get_report()))
+        if event in (sg.WIN_CLOSED, "Exit"):
+            logging.info("Exiting")
+            ipc_server.stop()
+            # Leave today's summary json up to date for anything reading it
+            get_report_store().compact(today_date, keep_journal=True)
+            scheduler.stop()
+            scheduler.join()
+            config_outbox.stop()
+            if report_sync is not None:
+                report_sync.stop()
+            # Rollups changed by logging are only written on report open or here
+            get_rollups().flush()
+            if config.get("metrics_file", True):
+                metrics_writer.write()
+            break
+        if event == NOTIFY_EVENT:
+            sg.Popup("Log your time!", font=font)
+            logging.info("Time logging prompt acknowledged")
+            reminder_started = time.monotonic()
+            reminder_job = schedule_reminder(scheduler, main_window, reminder_started)
+        if event == DAY_STATE_EVENT:
+            main_values[DAY_STATE_EVENT].clear()
+            refresh_total(main_window, day_state)
+        if event == REPORT_SYNC_EVENT:
+            # Only tells subscribers if another device changed today
+            day_state.replace(today_date, get_report_view().read_day(today_date) or {})
+            get_rollups().update(main_values[REPORT_SYNC_EVENT])
+        if event == IPC_EVENT and report_sync is not None:
+            report_sync.notify()
+        if event == LICENSE_EVENT:
+            # If not a free license, check the cached license token
+            if licensed(get_config()):
                 licensing_check = json.loads(check_licensing())
                 if licensing_check["status"] != "ok":
                     licensing_message = (
@@ -814,73 +1206,56 @@ def main():
                     )
                     sg.Popup(licensing_message, font=font)
                     logging.info(licensing_message)
-                    notify_thread_manage.stop()
-                    notify_thread_manage.join()
+                    ipc_server.stop()
+                    scheduler.stop()
+                    scheduler.join()
+                    config_outbox.stop()
+                    if report_sync is not None:
+                        report_sync.stop()
+                    get_rollups().flush()
                     break
-
-        working_hours = current_config["total_hours"]["value"]
-        event, main_values = main_window.read(timeout=2)
-        if main_values != {}:
-            logging.debug("Event triggered, entered values: %s", main_values)
-        try:
-            hours_spent = 0
-            for today_bin in today_report:
-                hours_spent += today_report[today_bin]
-        except KeyError:
-            hours_spent = 0
-        main_window["current_total"].update(
-            "Total logged: " + str(hours_spent) + "/" + str(working_hours)
-        )
-        time_logged = False
-        if event in (sg.WIN_CLOSED, "Exit"):
-            logging.info("Exit requested, closing NotifyThread")
-            sg.PopupNoButtons(
-                "Exiting, please wait for notify thread to close..",
-                font=font,
-                auto_close_duration=2,
-                auto_close=True,
-            )
-            notify_thread_manage.stop()
-            notify_thread_manage.join()
-            logging.info("Exiting")
-            break
         if event == "Report":
-            show_report()
+            show_report(day_state)
         if event == "Settings":
-            show_settings()
+            reload_bins(main_window, main_pager, day_state, show_settings())
+            # Pick up a changed reminder interval without resetting the timer
+            scheduler.cancel(reminder_job)
+            reminder_job = schedule_reminder(scheduler, main_window, reminder_started)
         if event == "About":
             show_about()
-        if event.startswith("Log"):
-            # Iterate over bins looking for event
-            for event_bin in list_bins:
-                raw_event = event.replace("Log ", "")
-                if raw_event == event_bin["nice_name"]:
-                    try:
-                        today_report[event_bin["name"]] = (
-                            today_report[event_bin["name"]] + 1
-                        )
-                    except KeyError:
-                        today_report[event_bin["name"]] = 1
-                    new_total = today_report[event_bin["name"]]
-                    logging.info("%s time logged", raw_event)
-                    time_logged = True
+        if handle_paging_event(main_pager, event, main_values):
+            show_main_bin_page(main_window, main_pager)
+        time_logged = False
+        event_bin = None
+        if isinstance(event, tuple) and event[0] == LOG_KEY:
+            event_bin = main_pager.bin_at(event[1])
+        if event_bin is not None:
+            get_report_store().log(today_date, event_bin["name"])
+            new_total = day_state.add(today_date, event_bin["name"])
+            get_rollups().update([today_date])
+            logging.info("%s time logged", event_bin["nice_name"])
+            time_logged = True
+        if time_logged and report_sync is not None:
+            report_sync.notify()
         if time_logged is True:
-            with open(
-                reports_dir + today_date + ".json",
-                "w",
-                encoding="UTF-8",
-            ) as report_file:
-                report_file.write(json.dumps(today_report))
-                report_file.close()
             sg.PopupNoButtons(
-                "New total for " + event + " is " + str(new_total),
+                "New total for Log " + event_bin["nice_name"] + " is " + str(new_total),
                 font=font,
                 auto_close_duration=1,
                 auto_close=True,
             )
+        if event == "Settings":
+            # The working hours shown next to the total may have changed
+            refresh_total(main_window, day_state)
+        metrics.observe(
+            "wubu2_main_loop_iteration",
+            time.perf_counter() - iteration_started,
+            description="Main loop event handling, popups included",
+        )
     main_window.close()
 
 
 if __name__ == "__main__":
-    logging.info("Whatubinup2 starting..")
-    main()
+    # aggregate's worker processes, needed in the PyInstaller build
+    multiprocessing.freeze_support()
+    sys.exit(cli_main(gui=main))
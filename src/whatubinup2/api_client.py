@@ -0,0 +1,144 @@
+# coding=utf8
+""" Shared HTTP client for calls to the wubu2 api_server
+
+requests is only imported when the first call is made, so starting the
+app without a license never pays for it.
+"""
+import gzip
+import json
+import logging
+import random
+import threading
+import time
+
+from whatubinup2 import metrics
+
+# (connect, read) timeouts in seconds, retry count and whether a request can
+# safely be repeated once it may have reached the server
+ENDPOINTS = {
+    "/api/auth/create": {"timeout": (3.05, 15), "retries": 2, "idempotent": False},
+    "/api/auth/validate": {"timeout": (3.05, 10), "retries": 2, "idempotent": True},
+    "/api/config/upload": {"timeout": (3.05, 30), "retries": 2, "idempotent": True},
+    "/api/config/sync": {"timeout": (3.05, 15), "retries": 2, "idempotent": True},
+    # Counters merge by max, so repeating an upload is harmless
+    "/api/reports/sync": {"timeout": (3.05, 30), "retries": 2, "idempotent": True},
+}
+DEFAULT_ENDPOINT = {"timeout": (3.05, 15), "retries": 0, "idempotent": False}
+RETRY_STATUS_CODES = (502, 503, 504)
+
+
+class ApiError(Exception):
+    """Raised when an api_server call fails after any retries"""
+
+
+class ApiClient:
+    """Class holding a pooled keep-alive session for api_server calls"""
+
+    def __init__(self, backoff_seconds=0.5, gzip_min_bytes=None, pool_size=4):
+        self.backoff_seconds = backoff_seconds
+        # Only compress when the api_server is known to accept gzip bodies
+        self.gzip_min_bytes = gzip_min_bytes
+        self.pool_size = pool_size
+        self._session = None
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def _get_session(self):
+        """Function to create the pooled session on first use"""
+        with self._lock:
+            if self._session is None:
+                # pylint: disable=import-outside-toplevel
+                import requests
+                from requests.adapters import HTTPAdapter
+
+                adapter = HTTPAdapter(
+                    pool_connections=self.pool_size, pool_maxsize=self.pool_size
+                )
+                self._session = requests.Session()
+                self._session.mount("https://", adapter)
+                self._session.mount("http://", adapter)
+            return self._session
+
+    def _record(self, endpoint, seconds, failed):
+        """Function to update latency and error counters for an endpoint"""
+        with self._lock:
+            endpoint_stats = self._stats.setdefault(
+                endpoint,
+                {"requests": 0, "errors": 0, "total_seconds": 0.0, "max_seconds": 0},
+            )
+            endpoint_stats["requests"] += 1
+            endpoint_stats["total_seconds"] += seconds
+            endpoint_stats["max_seconds"] = max(endpoint_stats["max_seconds"], seconds)
+            if failed:
+                endpoint_stats["errors"] += 1
+        metrics.observe(
+            "wubu2_http_request",
+            seconds,
+            {"endpoint": endpoint},
+            "api_server request latency",
+        )
+        if failed:
+            metrics.increment(
+                "wubu2_http_request_failures",
+                {"endpoint": endpoint},
+                description="api_server requests failed or answered 5xx",
+            )
+
+    def stats(self):
+        """Function to get a snapshot of per-endpoint counters"""
+        with self._lock:
+            return {endpoint: dict(item) for endpoint, item in self._stats.items()}
+
+    def _encode(self, payload):
+        """Function to build request body and headers, gzipped when large"""
+        body = json.dumps(payload).encode("utf-8")
+        headers = {"Content-Type": "application/json"}
+        if self.gzip_min_bytes is not None and len(body) >= self.gzip_min_bytes:
+            body = gzip.compress(body)
+            headers["Content-Encoding"] = "gzip"
+        return body, headers
+
+    def post(self, api_server, endpoint, payload):
+        """Function to post json to the api_server, retrying transient failures"""
+        session = self._get_session()
+        # pylint: disable=import-outside-toplevel
+        from requests import ConnectTimeout, RequestException
+
+        policy = ENDPOINTS.get(endpoint, DEFAULT_ENDPOINT)
+        body, headers = self._encode(payload)
+        attempt = 0
+        while True:
+            start = time.perf_counter()
+            try:
+                response = session.post(
+                    api_server + endpoint,
+                    data=body,
+                    headers=headers,
+                    timeout=policy["timeout"],
+                )
+            except RequestException as error_message:
+                self._record(endpoint, time.perf_counter() - start, True)
+                # Connect failures never reached the server so are always safe
+                retryable = policy["idempotent"] or isinstance(
+                    error_message, ConnectTimeout
+                )
+                if not retryable or attempt >= policy["retries"]:
+                    raise ApiError(
+                        endpoint + " failed: " + str(error_message)
+                    ) from error_message
+                logging.warning("%s failed: %s, retrying", endpoint, error_message)
+            else:
+                failed = response.status_code >= 500
+                self._record(endpoint, time.perf_counter() - start, failed)
+                if (
+                    response.status_code not in RETRY_STATUS_CODES
+                    or not policy["idempotent"]
+                    or attempt >= policy["retries"]
+                ):
+                    return response
+                logging.warning(
+                    "%s returned %s, retrying", endpoint, response.status_code
+                )
+            attempt += 1
+            # Full jitter so many clients don't retry in lockstep
+            time.sleep(random.uniform(0, self.backoff_seconds * 2**attempt))
@@ -0,0 +1,141 @@
+# coding=utf8
+""" Indexed lookups and paged, searchable views over the configured bins
+
+Windows show bins in a fixed number of widget slots keyed by slot number,
+e.g. ``("-LOG-", 3)``, and a BinPager maps each slot to the bin currently
+shown in it. Building a window therefore costs the same for 5 or 500 bins,
+and an event is resolved to its bin with a list index instead of comparing
+button text against every bin.
+"""
+import threading
+
+LOG_KEY = "-LOG-"
+EDIT_KEY = "-EDIT-"
+DELETE_KEY = "-DELETE-"
+BIN_ROW_KEY = "-BIN-ROW-"
+BIN_NAME_KEY = "-BIN-NAME-"
+BIN_DESCRIPTION_KEY = "-BIN-DESCRIPTION-"
+BIN_SEARCH_KEY = "-BIN-SEARCH-"
+BIN_PREVIOUS_KEY = "-BIN-PREVIOUS-"
+BIN_NEXT_KEY = "-BIN-NEXT-"
+BIN_PAGE_KEY = "-BIN-PAGE-"
+
+
+class BinRegistry:
+    """Class indexing a config's time_bins by system name and nice name"""
+
+    def __init__(self, time_bins):
+        self.time_bins = time_bins
+        self.by_name = {}
+        self.by_nice_name = {}
+        self._search_text = []
+        for time_bin in time_bins:
+            self.by_name.setdefault(time_bin["name"].lower(), time_bin)
+            self.by_nice_name.setdefault(time_bin["nice_name"].lower(), time_bin)
+            self._search_text.append(
+                "\n".join(
+                    (time_bin["name"], time_bin["nice_name"], time_bin["description"])
+                ).lower()
+            )
+        self._last_search = ("", time_bins)
+
+    def __len__(self):
+        return len(self.time_bins)
+
+    def get(self, name):
+        """Function to get a bin by system name, None if there is none"""
+        return self.by_name.get(name.lower())
+
+    def find(self, bin_name):
+        """Function to find a bin by system name or nice name, ignoring case"""
+        return self.by_name.get(bin_name.lower()) or self.by_nice_name.get(
+            bin_name.lower()
+        )
+
+    def search(self, query):
+        """Function to list bins whose names or description contain query"""
+        query = query.strip().lower()
+        last_query, last_result = self._last_search
+        if query == last_query:
+            return last_result
+        result = [
+            time_bin
+            for time_bin, text in zip(self.time_bins, self._search_text)
+            if query in text
+        ]
+        self._last_search = (query, result)
+        return result
+
+    def page(self, query, page_number, page_size):
+        """Function to get one page of search results
+
+        Returns the bins on the page, the page number clamped to the results
+        and the number of pages.
+        """
+        result = self.search(query)
+        page_count = max(1, -(-len(result) // page_size))
+        page_number = min(max(page_number, 0), page_count - 1)
+        start = page_number * page_size
+        return result[start : start + page_size], page_number, page_count
+
+
+# The registry for the last time_bins list seen, ConfigStore hands out the
+# same list until the config changes
+_registry_cache = {"time_bins": None, "registry": None}
+_registry_lock = threading.Lock()
+
+
+def registry_for(time_bins):
+    """Function to get the registry for a time_bins list, built once per list"""
+    with _registry_lock:
+        if _registry_cache["time_bins"] is not time_bins:
+            _registry_cache["registry"] = BinRegistry(time_bins)
+            _registry_cache["time_bins"] = time_bins
+        return _registry_cache["registry"]
+
+
+class BinPager:
+    """Class tracking the search and page shown in a window's bin slots"""
+
+    def __init__(self, registry, page_size):
+        self.registry = registry
+        self.page_size = page_size
+        self.query = ""
+        self.page_number = 0
+        self.page_count = 1
+        self.slots = []
+
+    def search(self, query):
+        """Function to show the first page of bins matching query"""
+        self.query = query
+        self.page_number = 0
+
+    def move(self, step):
+        """Function to move step pages forward or back"""
+        self.page_number += step
+
+    def refresh(self, registry=None):
+        """Function to work out which bins fill the slots, returns them"""
+        if registry is not None:
+            self.registry = registry
+        self.slots, self.page_number, self.page_count = self.registry.page(
+            self.query, self.page_number, self.page_size
+        )
+        return self.slots
+
+    def bin_at(self, slot):
+        """Function to get the bin shown in a slot, None for an empty slot"""
+        if 0 <= slot < len(self.slots):
+            return self.slots[slot]
+        return None
+
+    def page_label(self):
+        """Function to describe the current page for the window"""
+        return (
+            str(self.page_number + 1)
+            + "/"
+            + str(self.page_count)
+            + " ("
+            + str(len(self.registry.search(self.query)))
+            + " bins)"
+        )
@@ -0,0 +1,289 @@
+# coding=utf8
+""" Console entry point, headless subcommands or the desktop widget
+
+The subcommands only import the config and report stores, so they start
+quickly and can be called from shell aliases, git hooks and cron. While the
+widget is running, ``log`` goes through its IPC endpoint so its total
+updates straight away, otherwise it appends to the same journal directly.
+"""
+import argparse
+import json
+import sys
+
+from whatubinup2.ipc import ipc_address, send_requests
+from whatubinup2.settings import (
+    current_date,
+    get_bin_registry,
+    get_config,
+    get_report_store,
+    get_report_view,
+    home_dir,
+)
+
+# The same as export.FORMATS, export is only imported by its subcommand
+EXPORT_FORMATS = ("csv", "jsonl")
+
+
+def positive_int(value):
+    """Function to parse a whole number of 1 or more for argparse"""
+    try:
+        number = int(value)
+    except ValueError:
+        number = 0
+    if number < 1:
+        raise argparse.ArgumentTypeError(
+            "must be a positive whole number, not " + repr(value)
+        )
+    return number
+
+
+def log_time(args):
+    """Function to log time against a bin from the command line"""
+    config = get_config()
+    time_bin = get_bin_registry().find(args.bin)
+    if time_bin is None:
+        print(
+            "Unknown bin "
+            + args.bin
+            + ", choose from: "
+            + ", ".join(time_bin["name"] for time_bin in config["time_bins"]),
+            file=sys.stderr,
+        )
+        return 2
+    try:
+        response = send_requests(
+            ipc_address(home_dir),
+            [{"op": "log", "bin": time_bin["name"], "amount": args.amount}],
+        )[0]
+    except TimeoutError:
+        # The request may still have been applied, don't log it twice
+        print("Running app did not reply, check its total", file=sys.stderr)
+        return 1
+    except (EOFError, ConnectionResetError) as error_message:
+        # The app may have applied the request before dropping the connection
+        print(
+            "Running app closed the connection, check its total: "
+            + str(error_message or type(error_message).__name__),
+            file=sys.stderr,
+        )
+        return 1
+    except OSError:
+        response = None
+    if response is not None:
+        if response["status"] != "ok":
+            print(response["details"], file=sys.stderr)
+            return 1
+        print(
+            "New total for " + time_bin["nice_name"] + " is " + str(response["total"])
+        )
+        return 0
+    report_store = get_report_store()
+    today_date = current_date()
+    report_store.log(today_date, time_bin["name"], args.amount)
+    new_total = (get_report_view().read_day(today_date) or {}).get(time_bin["name"], 0)
+    print("New total for " + time_bin["nice_name"] + " is " + str(new_total))
+    return 0
+
+
+def show_status(args):  # pylint: disable=unused-argument
+    """Function to print today's totals"""
+    config = get_config()
+    today_report = get_report_view().read_day(current_date()) or {}
+    for time_bin in config["time_bins"]:
+        print(time_bin["nice_name"] + ": " + str(today_report.get(time_bin["name"], 0)))
+    print(
+        "Total logged: "
+        + str(sum(today_report.values()))
+        + "/"
+        + str(config["total_hours"]["value"])
+    )
+    return 0
+
+
+def import_calendar(args):
+    """Function to pre-fill reports from an exported .ics calendar"""
+    # Subcommand modules are imported when used, so log and status start fast
+    # pylint: disable-next=import-outside-toplevel
+    from whatubinup2.ics_import import import_ics
+
+    config = get_config()
+    written, counts = import_ics(
+        args.file,
+        config,
+        get_report_store(),
+        home_dir + "cache/ics_index.json",
+        since_day=args.since,
+        until_day=args.until,
+        dry_run=args.dry_run,
+    )
+    for day, units in written.items():
+        print(
+            day
+            + ": "
+            + ", ".join(
+                bin_name + " " + str(amount) for bin_name, amount in units.items()
+            )
+        )
+    print(
+        str(counts["imported"])
+        + " of "
+        + str(counts["events"])
+        + " events imported into "
+        + str(len(written))
+        + " days, "
+        + str(counts["already_imported"])
+        + " already imported, "
+        + str(counts["unmatched"])
+        + " matched no bin, "
+        + str(counts["skipped"])
+        + " all-day or cancelled"
+        + (" (dry run, nothing written)" if args.dry_run else "")
+    )
+    return 0
+
+
+def export_history(args):
+    """Function to stream report history to stdout or a file"""
+    # pylint: disable-next=import-outside-toplevel
+    from whatubinup2.export import close_output, export_reports, open_output
+
+    bins = None
+    if args.bin:
+        registry = get_bin_registry()
+        # Names of deleted bins are kept as given, their history still exports
+        bins = [
+            (registry.find(bin_name) or {"name": bin_name})["name"]
+            for bin_name in args.bin
+        ]
+    output = open_output(args.output, args.gzip)
+    try:
+        count = export_reports(
+            get_report_view(),
+            output,
+            args.format,
+            start_day=args.since,
+            end_day=args.until,
+            bins=bins,
+        )
+    finally:
+        close_output(output)
+    print("Exported " + str(count) + " rows", file=sys.stderr)
+    return 0
+
+
+def aggregate_team(args):
+    """Function to write one summary of many users' copied reports"""
+    # pylint: disable-next=import-outside-toplevel
+    from whatubinup2.team_aggregate import aggregate
+
+    summary = aggregate(
+        args.root,
+        cache_path=args.cache,
+        workers=args.workers,
+        chunk_days=args.chunk_days,
+        start_day=args.since,
+        end_day=args.until,
+    )
+    summary_json = json.dumps(summary, indent=2, sort_keys=True)
+    if args.output is None:
+        print(summary_json)
+    else:
+        with open(args.output, "w", encoding="UTF-8") as summary_file:
+            summary_file.write(summary_json + "\n")
+    print(
+        "Aggregated "
+        + str(len(summary["users"]))
+        + " users over "
+        + str(len(summary["days"]))
+        + " days",
+        file=sys.stderr,
+    )
+    return 0
+
+
+def build_parser():
+    """Function to build the command line parser"""
+    parser = argparse.ArgumentParser(
+        prog="whatubinup2",
+        description="Log time into buckets. Run without a command for the widget.",
+    )
+    subparsers = parser.add_subparsers(dest="command")
+    log_parser = subparsers.add_parser("log", help="Log time against a bin")
+    log_parser.add_argument("bin", help="Bin system name or nice name")
+    log_parser.add_argument(
+        "amount",
+        nargs="?",
+        type=positive_int,
+        default=1,
+        help="Units to log (default 1)",
+    )
+    log_parser.set_defaults(handler=log_time)
+    status_parser = subparsers.add_parser("status", help="Show today's totals")
+    status_parser.set_defaults(handler=show_status)
+    import_parser = subparsers.add_parser(
+        "import-ics", help="Pre-fill bins from an exported .ics calendar"
+    )
+    import_parser.add_argument("file", help="Path to the .ics file")
+    import_parser.add_argument("--since", help="First day to import, yy-mm-dd")
+    import_parser.add_argument("--until", help="Last day to import, yy-mm-dd")
+    import_parser.add_argument(
+        "--dry-run", action="store_true", help="Show what would be logged"
+    )
+    import_parser.set_defaults(handler=import_calendar)
+    export_parser = subparsers.add_parser(
+        "export", help="Export report history as date, bin, amount rows"
+    )
+    export_parser.add_argument(
+        "--format", choices=EXPORT_FORMATS, default="csv", help="Output format (csv)"
+    )
+    export_parser.add_argument("--since", help="First day to export, yy-mm-dd")
+    export_parser.add_argument("--until", help="Last day to export, yy-mm-dd")
+    export_parser.add_argument(
+        "--bin",
+        action="append",
+        help="Only export this bin, system or nice name (repeatable)",
+    )
+    export_parser.add_argument("--gzip", action="store_true", help="Gzip the output")
+    export_parser.add_argument("--output", "-o", help="Write to a file, not stdout")
+    export_parser.set_defaults(handler=export_history)
+    aggregate_parser = subparsers.add_parser(
+        "aggregate", help="Combine many users' copied report directories"
+    )
+    aggregate_parser.add_argument(
+        "root", help="Directory with one copied ~/whatubinup2 (or reports/) per user"
+    )
+    aggregate_parser.add_argument(
+        "--cache", help="Cache file so re-runs only read changed reports"
+    )
+    aggregate_parser.add_argument(
+        "--workers", type=positive_int, help="Worker processes (default one per core)"
+    )
+    aggregate_parser.add_argument(
+        "--chunk-days",
+        type=positive_int,
+        default=500,
+        help="Days of one user read per worker task (default 500)",
+    )
+    aggregate_parser.add_argument("--since", help="First day to include, yy-mm-dd")
+    aggregate_parser.add_argument("--until", help="Last day to include, yy-mm-dd")
+    aggregate_parser.add_argument(
+        "--output", "-o", help="Write the summary json here, not stdout"
+    )
+    aggregate_parser.set_defaults(handler=aggregate_team)
+    return parser
+
+
+def main(argv=None, gui=None):
+    """Main console entry point"""
+    args = build_parser().parse_args(argv)
+    if args.command is None:
+        if gui is None:
+            # pylint: disable=import-outside-toplevel
+            from whatubinup2.__main__ import main as gui
+        gui()
+        return 0
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,80 @@
+# coding=utf8
+""" In-process store and single writer for the local all.json config """
+import copy
+import json
+import logging
+import os
+import threading
+
+from whatubinup2 import metrics
+
+
+class ConfigStore:
+    """Class holding the parsed config, only re-read when the file changes"""
+
+    def __init__(self, path, default_config):
+        self.path = path
+        self.default_config = default_config
+        self._lock = threading.RLock()
+        self._data = None
+        self._signature = None
+
+    def _file_signature(self):
+        """Function to get a cheap fingerprint of the config file"""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+    def get(self):
+        """Function to get the parsed config, treat the result as read-only"""
+        with self._lock:
+            signature = self._file_signature()
+            if signature is None:
+                logging.info("all.json config missing, generating from skeleton")
+                self.save(copy.deepcopy(self.default_config))
+                logging.info("Default config applied!")
+            elif signature != self._signature or self._data is None:
+                with open(self.path, encoding="utf-8") as config_file:
+                    self._data = json.load(config_file)
+                self._signature = signature
+                metrics.increment(
+                    "wubu2_config_file_reads", description="all.json parses"
+                )
+                logging.debug("Config loaded from %s", self.path)
+            return self._data
+
+    def save(self, config_data):
+        """Function to atomically write config to disk and refresh the cache"""
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            temp_path = self.path + ".tmp"
+            with open(temp_path, "w", encoding="UTF-8") as config_file:
+                config_file.write(json.dumps(config_data))
+                config_file.flush()
+                os.fsync(config_file.fileno())
+            # A crash leaves either the old or the new file, never a torn one
+            os.replace(temp_path, self.path)
+            self._data = config_data
+            self._signature = self._file_signature()
+
+    def update(self, *mutations):
+        """Function to apply mutations to the config and save once
+
+        Each mutation is called with a private copy of the config to change
+        in place. Updates from the UI and background threads are applied one
+        at a time, so none are lost. Returns the saved config.
+        """
+        with self._lock:
+            config_data = copy.deepcopy(self.get())
+            for mutation in mutations:
+                mutation(config_data)
+            self.save(config_data)
+            logging.debug("Config updated with %s change(s)", len(mutations))
+            return config_data
+
+    def invalidate(self):
+        """Function to force a re-read on next get, used after external writes"""
+        with self._lock:
+            self._signature = None
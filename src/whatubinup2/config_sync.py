@@ -0,0 +1,244 @@
+# coding=utf8
+""" Versioned, delta based Cloud config sync
+
+The api_server keeps a revision for the whole config and for every key.
+The client remembers the last revision it saw and a hash of each key's
+value at that point (``cache/sync_state.json``), so that:
+
+- fetches send ``revision`` and get ``{"not_modified": true}`` back when
+  nothing changed, or only the keys changed since then
+- uploads send only keys whose value changed since the last sync, with the
+  key revisions they were based on
+- a key changed both locally and on the server is resolved by revision, the
+  server's value wins when its key revision is newer than the one the local
+  change was based on
+
+Older api_servers answer without a ``revision``. They are treated as before,
+the full config is applied on fetch and sent on upload.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+
+from whatubinup2.api_client import ApiError
+
+# Keys only meaningful on this machine, never sent or taken from deltas:
+# license state, the port metrics are served on and where reports are kept.
+# license_token and license_public_key are only found in configs from older
+# versions
+LOCAL_ONLY_KEYS = (
+    "license_validated",
+    "license_token",
+    "license_public_key",
+    "license_error",
+    "license_grace_hours",
+    "metrics_port",
+    "report_backend",
+)
+
+
+def shared_settings(config_data):
+    """Function to drop LOCAL_ONLY_KEYS from a config sent to or taken from Cloud"""
+    return {
+        key: value for key, value in config_data.items() if key not in LOCAL_ONLY_KEYS
+    }
+
+
+def value_hash(value):
+    """Function to get a stable fingerprint of a config value"""
+    return hashlib.sha1(json.dumps(value, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class SyncState:
+    """Class persisting the last synced revision and per-key fingerprints"""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.revision = None
+        self.key_revisions = {}
+        self.hashes = {}
+        try:
+            with open(path, encoding="utf-8") as state_file:
+                state = json.load(state_file)
+            self.revision = state["revision"]
+            self.key_revisions = state["key_revisions"]
+            self.hashes = state["hashes"]
+        except FileNotFoundError:
+            pass
+        except (ValueError, KeyError) as error_message:
+            logging.warning(
+                "Ignoring bad sync state, full sync next: %s", error_message
+            )
+
+    def save(self):
+        """Function to atomically write the sync state"""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w", encoding="UTF-8") as state_file:
+            state_file.write(
+                json.dumps(
+                    {
+                        "revision": self.revision,
+                        "key_revisions": self.key_revisions,
+                        "hashes": self.hashes,
+                    }
+                )
+            )
+        os.replace(temp_path, self.path)
+
+    def mark_synced(self, config_data, keys, key_revisions):
+        """Function to record keys as matching the server"""
+        for key in keys:
+            if key in config_data:
+                self.hashes[key] = value_hash(config_data[key])
+            else:
+                self.hashes.pop(key, None)
+        self.key_revisions.update(key_revisions)
+
+    def local_changes(self, config_data):
+        """Function to get keys changed and removed since the last sync"""
+        changes = {
+            key: value
+            for key, value in config_data.items()
+            if key not in LOCAL_ONLY_KEYS and self.hashes.get(key) != value_hash(value)
+        }
+        removed = [key for key in self.hashes if key not in config_data]
+        return changes, removed
+
+
+def pull_config(api_client, config_store, sync_state):
+    """Function to fetch Cloud config changes and merge them into local config
+
+    Returns "not_modified", "delta", "full" for an older api_server or
+    "failed" when the api_server refused the request.
+    """
+    current_config = config_store.get()
+    response = json.loads(
+        api_client.post(
+            current_config["api_server"],
+            "/api/config/sync",
+            {
+                "id": current_config["email_address"],
+                "license": current_config["license_code"],
+                "revision": sync_state.revision,
+            },
+        ).text
+    )
+    if response.get("status", "ok") != "ok":
+        logging.warning("Cloud config sync refused: %s", response.get("details"))
+        return "failed"
+    if "revision" not in response:
+        # Older api_server, apply the full config as before
+        config_store.update(
+            lambda config_data: config_data.update(shared_settings(response["details"]))
+        )
+        return "full"
+    if response.get("not_modified"):
+        logging.info(
+            "Cloud config not modified since revision %s", response["revision"]
+        )
+        return "not_modified"
+
+    remote = shared_settings(response["details"])
+    remote_removed = response.get("removed", [])
+    remote_revisions = response.get("key_revisions", {})
+    with sync_state.lock:
+        local_changed, local_removed = sync_state.local_changes(current_config)
+        applied = []
+        for key in list(remote) + remote_removed:
+            newer = remote_revisions.get(key, 0) > sync_state.key_revisions.get(key, 0)
+            if (key in local_changed or key in local_removed) and not newer:
+                # Local change is based on the server's value, keep it to upload
+                continue
+            if sync_state.revision is not None and (
+                key in local_changed or key in local_removed
+            ):
+                logging.warning("Cloud change to %s replaces a local change", key)
+            applied.append(key)
+
+        def apply_remote(config_data):
+            for key in applied:
+                if key in remote:
+                    config_data[key] = remote[key]
+                else:
+                    config_data.pop(key, None)
+
+        config_data = config_store.update(apply_remote)
+        sync_state.revision = response["revision"]
+        sync_state.mark_synced(
+            config_data,
+            applied,
+            {key: remote_revisions[key] for key in applied if key in remote_revisions},
+        )
+        sync_state.save()
+    logging.info(
+        "Applied %s Cloud config change(s), now at revision %s",
+        len(applied),
+        response["revision"],
+    )
+    return "delta"
+
+
+def push_config(api_client, config_store, sync_state, config_data):
+    """Function to upload config, only changed keys once the server versions it
+
+    Raises ApiError on server errors so the outbox retries.
+    """
+    with sync_state.lock:
+        if sync_state.revision is None:
+            payload = {"config": shared_settings(config_data)}
+        else:
+            changes, removed = sync_state.local_changes(config_data)
+            if not changes and not removed:
+                logging.info("Config unchanged since last sync, nothing to upload")
+                return
+            payload = {
+                "base_revision": sync_state.revision,
+                "base_key_revisions": {
+                    key: sync_state.key_revisions.get(key, 0)
+                    for key in list(changes) + removed
+                },
+                "changes": changes,
+                "removed": removed,
+            }
+        payload["id"] = config_data["email_address"]
+        payload["license"] = config_data["license_code"]
+        post_url = api_client.post(
+            config_data["api_server"], "/api/config/upload", payload
+        )
+        if post_url.status_code >= 500:
+            raise ApiError("Config upload returned " + str(post_url.status_code))
+        if sync_state.revision is None:
+            logging.info("Settings uploaded to Cloud")
+            return
+        response = json.loads(post_url.text)
+        if response.get("status", "ok") != "ok":
+            logging.warning("Cloud config upload refused: %s", response.get("details"))
+            return
+        # Keys the server refused because another device changed them first
+        rejected = response.get("rejected", {})
+        sent = [key for key in list(changes) + removed if key not in rejected]
+        if rejected:
+            logging.warning(
+                "Cloud has newer values for %s, keeping those", ", ".join(rejected)
+            )
+
+            def apply_rejected(latest_config):
+                for key, value in rejected.items():
+                    latest_config[key] = value
+
+            config_store.update(apply_rejected)
+            config_data = dict(config_data, **rejected)
+        sync_state.revision = response["revision"]
+        sync_state.mark_synced(
+            config_data, sent + list(rejected), response.get("key_revisions", {})
+        )
+        sync_state.save()
+    logging.info(
+        "Uploaded %s config change(s) to Cloud, now at revision %s",
+        len(sent),
+        response["revision"],
+    )
@@ -0,0 +1,103 @@
+# coding=utf8
+""" In-memory counters for the day being logged, with change subscribers
+
+DayState is loaded from the report once and then kept up to date as time
+is logged, with the day's total adjusted per change rather than re-summed.
+Windows subscribe to it instead of re-reading the report, and are only
+told when something actually changed.
+"""
+import logging
+import threading
+
+
+class DayState:
+    """Class owning one day's {bin: count} and its running total
+
+    Subscribers are called as callback(day_state, changed_bins) on the
+    thread that made the change, so window subscribers should only post an
+    event to their window (see post_on_change).
+    """
+
+    def __init__(self, day, counts):
+        self._lock = threading.Lock()
+        self._subscribers = []
+        self.day = day
+        self.counts = dict(counts)
+        self.total = sum(self.counts.values())
+
+    def subscribe(self, callback):
+        """Function to be told about changes, returns a function to unsubscribe"""
+        with self._lock:
+            self._subscribers.append(callback)
+        return lambda: self.unsubscribe(callback)
+
+    def unsubscribe(self, callback):
+        """Function to stop telling callback about changes"""
+        with self._lock:
+            if callback in self._subscribers:
+                self._subscribers.remove(callback)
+
+    def snapshot(self):
+        """Function to get a copy of the day's counts and total"""
+        with self._lock:
+            return dict(self.counts), self.total
+
+    def add(self, day, bin_name, amount=1):
+        """Function to count time logged against a bin
+
+        Returns the bin's new count, or None if day is no longer current.
+        """
+        with self._lock:
+            if day != self.day:
+                return None
+            count = self.counts.get(bin_name, 0) + amount
+            self.counts[bin_name] = count
+            self.total += amount
+        self._notify({bin_name})
+        return count
+
+    def replace(self, day, counts):
+        """Function to load new counts, after a rollover or a sync
+
+        Subscribers are only told if a count or the day changed.
+        """
+        with self._lock:
+            changed = {
+                bin_name
+                for bin_name in set(self.counts) | set(counts)
+                if self.counts.get(bin_name, 0) != counts.get(bin_name, 0)
+            }
+            if not changed and day == self.day:
+                return changed
+            self.day = day
+            self.counts = dict(counts)
+            self.total = sum(self.counts.values())
+        self._notify(changed)
+        return changed
+
+    def _notify(self, changed_bins):
+        """Function to call every subscriber, one failing doesn't stop the rest"""
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            try:
+                callback(self, changed_bins)
+            except Exception as error_message:  # pylint: disable=broad-except
+                logging.warning("Day state subscriber failed: %s", error_message)
+
+
+def post_on_change(window, event_key):
+    """Function to get a subscriber posting event_key to a window on change
+
+    Only one event is posted until the window handles it, so a burst of
+    changes causes one refresh. The event's value is a threading.Event the
+    handler clears before reading the state.
+    """
+    pending = threading.Event()
+
+    def post(day_state, changed_bins):  # pylint: disable=unused-argument
+        if not pending.is_set():
+            pending.set()
+            window.write_event_value(event_key, pending)
+
+    return post
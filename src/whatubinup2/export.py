@@ -0,0 +1,112 @@
+# coding=utf8
+""" Streaming export of report history as CSV or JSON Lines
+
+Reports are read one day at a time, oldest first, and passed through a
+chain of generators down to the writer, so memory use does not grow with
+the length of the history. Rows are ``date, bin, amount`` with ISO dates,
+days and bins with nothing logged are left out.
+"""
+import csv
+import gzip
+import io
+import json
+import sys
+from datetime import datetime
+
+FORMATS = ("csv", "jsonl")
+
+
+def iter_days(report_store, start_day=None, end_day=None):
+    """Function to yield yy-mm-dd days with a report, oldest first"""
+    for day in report_store.list_days():
+        if start_day and day < start_day:
+            continue
+        if end_day and day > end_day:
+            break
+        yield day
+
+
+def iter_rows(report_store, days):
+    """Function to yield (day, bin, amount) for each bin logged on each day"""
+    for day in days:
+        for bin_name, amount in (report_store.read_day(day) or {}).items():
+            if amount:
+                yield day, bin_name, amount
+
+
+def filter_bins(rows, bins):
+    """Function to only pass rows for the given bin system names"""
+    bins = set(bins)
+    return (row for row in rows if row[1] in bins)
+
+
+def iso_dates(rows):
+    """Function to turn yy-mm-dd days into ISO dates for other tools"""
+    for day, bin_name, amount in rows:
+        yield datetime.strptime(day, "%y-%m-%d").date().isoformat(), bin_name, amount
+
+
+def write_csv(rows, output):
+    """Function to write rows as CSV with a header, returns the row count"""
+    writer = csv.writer(output, lineterminator="\n")
+    writer.writerow(("date", "bin", "amount"))
+    count = 0
+    for row in rows:
+        writer.writerow(row)
+        count += 1
+    return count
+
+
+def write_jsonl(rows, output):
+    """Function to write rows as one json object per line, returns the row count"""
+    count = 0
+    for day, bin_name, amount in rows:
+        output.write(json.dumps({"date": day, "bin": bin_name, "amount": amount}))
+        output.write("\n")
+        count += 1
+    return count
+
+
+def open_output(path=None, compress=False):
+    """Function to open a text stream for an export, stdout when path is None
+
+    Close it with close_output, which leaves stdout open.
+    """
+    if path is None:
+        if not compress:
+            return sys.stdout
+        return io.TextIOWrapper(
+            gzip.GzipFile(fileobj=sys.stdout.buffer, mode="wb"), encoding="utf-8"
+        )
+    if compress:
+        return gzip.open(path, "wt", encoding="utf-8", newline="")
+    return open(path, "w", encoding="utf-8", newline="")
+
+
+def close_output(output):
+    """Function to finish an export stream, writing any gzip trailer"""
+    if output is sys.stdout:
+        output.flush()
+    else:
+        output.close()
+
+
+# pylint: disable-next=too-many-arguments,too-many-positional-arguments
+def export_reports(
+    report_store,
+    output,
+    export_format="csv",
+    start_day=None,
+    end_day=None,
+    bins=None,
+):
+    """Function to stream report history to an open text output
+
+    start_day and end_day are inclusive yy-mm-dd days. Returns the number
+    of rows written.
+    """
+    rows = iter_rows(report_store, iter_days(report_store, start_day, end_day))
+    if bins:
+        rows = filter_bins(rows, bins)
+    writer = write_jsonl if export_format == "jsonl" else write_csv
+    return writer(iso_dates(rows), output)
@@ -0,0 +1,320 @@
+# coding=utf8
+""" Streaming import of exported .ics calendars into daily reports
+
+The file is read line by line and only the event being parsed is held in
+memory, so exports of tens of MB import in constant memory. Events are
+mapped to bins by the ``calendar_rules`` in config, each a bin name plus
+case-insensitive regular expressions for ``title`` and/or ``organizer``
+that must all match, first matching rule wins. Each event's days already
+imported are kept in an index, so importing a newer export or a wider
+``--since``/``--until`` range only adds the days not counted yet.
+
+Time is summed per day and bin in minutes, then written to the report
+store as whole units of ``calendar_minutes_per_unit`` (60, one hour), one
+batch per day. The index also keeps the minutes and units imported so far
+per day and bin, so rounding is applied to the running total and minutes
+left over from one import count towards the next. The index is saved before
+the report store is written, so an import cut short is never counted twice
+by the next one. Recurring events only
+count their first occurrence, RRULE expansion is left to the calendar's
+export.
+"""
+import json
+import logging
+import os
+import re
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+DURATION_PATTERN = re.compile(
+    r"^(?P<sign>[+-])?P(?:(?P<weeks>\d+)W)?(?:(?P<days>\d+)D)?"
+    r"(?:T(?:(?P<hours>\d+)H)?(?:(?P<minutes>\d+)M)?(?:(?P<seconds>\d+)S)?)?$"
+)
+
+
+def unfolded_lines(lines):
+    """Function to join RFC 5545 folded lines, yielding one property at a time"""
+    pending = None
+    for line in lines:
+        line = line.rstrip("\r\n")
+        if line[:1] in (" ", "\t") and pending is not None:
+            pending += line[1:]
+            continue
+        if pending is not None:
+            yield pending
+        pending = line
+    if pending:
+        yield pending
+
+
+def parse_property(line):
+    """Function to split 'NAME;PARAM=x:value' into (name, params, value)"""
+    head, _, value = line.partition(":")
+    name, *raw_params = head.split(";")
+    params = {}
+    for raw_param in raw_params:
+        key, _, param_value = raw_param.partition("=")
+        params[key.upper()] = param_value.strip('"')
+    return name.upper(), params, value
+
+
+def iter_events(lines):
+    """Function to yield each VEVENT as a {NAME: (params, value)} dict"""
+    event = None
+    # Depth of components nested in the event, like VALARM, whose
+    # properties must not override the event's own
+    nested = 0
+    for line in unfolded_lines(lines):
+        if line == "BEGIN:VEVENT":
+            event = {}
+            nested = 0
+        elif event is None:
+            continue
+        elif line == "END:VEVENT":
+            yield event
+            event = None
+        elif line.startswith("BEGIN:"):
+            nested += 1
+        elif line.startswith("END:"):
+            nested -= 1
+        elif not nested:
+            name, params, value = parse_property(line)
+            event.setdefault(name, (params, value))
+
+
+def parse_datetime(params, value):
+    """Function to parse a DTSTART/DTEND as local time, None for all-day"""
+    if params.get("VALUE") == "DATE" or "T" not in value:
+        return None
+    parsed = datetime.strptime(value.rstrip("Z")[:15], "%Y%m%dT%H%M%S")
+    if value.endswith("Z"):
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    elif "TZID" in params:
+        try:
+            parsed = parsed.replace(tzinfo=ZoneInfo(params["TZID"]))
+        except (KeyError, ValueError):
+            # Windows style or unknown zone names, assume local time
+            return parsed
+    else:
+        return parsed
+    return parsed.astimezone().replace(tzinfo=None)
+
+
+def parse_duration(value):
+    """Function to parse an RFC 5545 DURATION into a timedelta"""
+    match = DURATION_PATTERN.match(value.strip())
+    if match is None:
+        raise ValueError("Bad DURATION " + value)
+    duration = timedelta(
+        weeks=int(match["weeks"] or 0),
+        days=int(match["days"] or 0),
+        hours=int(match["hours"] or 0),
+        minutes=int(match["minutes"] or 0),
+        seconds=int(match["seconds"] or 0),
+    )
+    return -duration if match["sign"] == "-" else duration
+
+
+def event_span(event):
+    """Function to get an event's (start, end) local datetimes, None if timeless"""
+    if "DTSTART" not in event:
+        return None
+    start = parse_datetime(*event["DTSTART"])
+    if start is None:
+        return None
+    if "DTEND" in event:
+        end = parse_datetime(*event["DTEND"])
+    elif "DURATION" in event:
+        end = start + parse_duration(event["DURATION"][1])
+    else:
+        return None
+    if end is None or end <= start:
+        return None
+    return start, end
+
+
+def compile_rules(rules):
+    """Function to pre-compile calendar_rules regular expressions"""
+    return [
+        (
+            rule["bin"],
+            {
+                field: re.compile(rule[field], re.IGNORECASE)
+                for field in ("title", "organizer")
+                if rule.get(field)
+            },
+        )
+        for rule in rules
+    ]
+
+
+def match_bin(compiled_rules, title, organizer, default_bin=None):
+    """Function to get the bin for an event, default_bin if no rule matches"""
+    fields = {"title": title, "organizer": organizer}
+    for bin_name, patterns in compiled_rules:
+        if patterns and all(
+            pattern.search(fields[field]) for field, pattern in patterns.items()
+        ):
+            return bin_name
+    return default_bin
+
+
+def minutes_by_day(start, end):
+    """Function to split an event into {yy-mm-dd: minutes} at midnight"""
+    minutes = {}
+    while start < end:
+        next_midnight = datetime.combine(
+            start.date() + timedelta(days=1), datetime.min.time()
+        )
+        part_end = min(end, next_midnight)
+        day = start.strftime("%y-%m-%d")
+        minutes[day] = minutes.get(day, 0) + (part_end - start).total_seconds() / 60
+        start = part_end
+    return minutes
+
+
+def event_key(event):
+    """Function to identify one occurrence of an event for the import index"""
+    return "|".join(
+        [
+            event.get("UID", ({}, ""))[1],
+            event.get("RECURRENCE-ID", ({}, ""))[1],
+            event.get("DTSTART", ({}, ""))[1],
+        ]
+    )
+
+
+def day_key(key, day):
+    """Function to identify one day of an event occurrence for the import index"""
+    return key + "|" + day
+
+
+def load_index(index_path):
+    """Function to load already imported keys and per day totals
+
+    Keys are day keys, or event keys for every day of an event in an index
+    from an older version. Totals are {day: {bin: {"minutes", "units"}}}, an
+    index written before they were kept is a plain list of keys.
+    """
+    try:
+        with open(index_path, encoding="utf-8") as index_file:
+            index = json.load(index_file)
+    except FileNotFoundError:
+        return set(), {}
+    if isinstance(index, list):
+        return set(index), {}
+    return set(index["events"]), index["totals"]
+
+
+def save_index(index_path, imported, totals):
+    """Function to atomically write the import index"""
+    os.makedirs(os.path.dirname(index_path), exist_ok=True)
+    temp_path = index_path + ".tmp"
+    with open(temp_path, "w", encoding="UTF-8") as index_file:
+        index_file.write(json.dumps({"events": sorted(imported), "totals": totals}))
+    os.replace(temp_path, index_path)
+
+
+def add_minutes(totals, day_minutes, minutes_per_unit):
+    """Function to add a day's {bin: minutes} to its totals, returns new units
+
+    Half a unit or more of the running total rounds up, so the units written
+    for a day and bin always match its minutes however they were imported.
+    """
+    units = {}
+    for bin_name, minutes in day_minutes.items():
+        total = totals.setdefault(bin_name, {"minutes": 0, "units": 0})
+        total["minutes"] += minutes
+        total_units = int(total["minutes"] / minutes_per_unit + 0.5)
+        if total_units > total["units"]:
+            units[bin_name] = total_units - total["units"]
+            total["units"] = total_units
+    return units
+
+
+# pylint: disable-next=too-many-arguments,too-many-positional-arguments,too-many-locals
+def import_ics(
+    ics_path,
+    config,
+    report_store,
+    index_path,
+    since_day=None,
+    until_day=None,
+    dry_run=False,
+):
+    """Function to import an .ics file into the report store
+
+    Returns the {day: {bin: units}} written and a dict of event counts.
+    """
+    compiled_rules = compile_rules(config.get("calendar_rules", []))
+    default_bin = config.get("calendar_default_bin") or None
+    minutes_per_unit = float(config.get("calendar_minutes_per_unit", 60))
+    known_bins = {time_bin["name"] for time_bin in config["time_bins"]}
+    imported, totals = load_index(index_path)
+    new_keys = set()
+    minutes = {}
+    counts = dict.fromkeys(
+        ("events", "imported", "already_imported", "unmatched", "skipped"), 0
+    )
+    with open(ics_path, encoding="utf-8", errors="replace") as ics_file:
+        for event in iter_events(ics_file):
+            counts["events"] += 1
+            key = event_key(event)
+            if key in imported:
+                counts["already_imported"] += 1
+                continue
+            try:
+                span = event_span(event)
+            except ValueError as error_message:
+                logging.warning("Skipping event %s: %s", key, error_message)
+                span = None
+            if span is None or event.get("STATUS", ({}, ""))[1] == "CANCELLED":
+                counts["skipped"] += 1
+                continue
+            bin_name = match_bin(
+                compiled_rules,
+                event.get("SUMMARY", ({}, ""))[1],
+                event.get("ORGANIZER", ({}, ""))[1],
+                default_bin,
+            )
+            if bin_name not in known_bins:
+                counts["unmatched"] += 1
+                continue
+            # Days outside the range are left out of the index, so a later
+            # import with a wider range takes them
+            in_range = {
+                day: day_minutes
+                for day, day_minutes in minutes_by_day(*span).items()
+                if not (since_day and day < since_day)
+                and not (until_day and day > until_day)
+            }
+            if not in_range:
+                continue
+            new_days = {
+                day: day_minutes
+                for day, day_minutes in in_range.items()
+                if day_key(key, day) not in imported
+                and day_key(key, day) not in new_keys
+            }
+            if not new_days:
+                counts["already_imported"] += 1
+                continue
+            for day, day_minutes in new_days.items():
+                day_bins = minutes.setdefault(day, {})
+                day_bins[bin_name] = day_bins.get(bin_name, 0) + day_minutes
+                new_keys.add(day_key(key, day))
+            counts["imported"] += 1
+
+    written = {}
+    for day in sorted(minutes):
+        units = add_minutes(totals.setdefault(day, {}), minutes[day], minutes_per_unit)
+        if units:
+            written[day] = units
+    if not dry_run and new_keys:
+        # Saved first, a crash before the writes below loses this import's
+        # units instead of the next import counting them again
+        save_index(index_path, imported | new_keys, totals)
+        for day, units in written.items():
+            report_store.log_many(day, units)
+    logging.info("Calendar import of %s: %s", ics_path, counts)
+    return written, counts
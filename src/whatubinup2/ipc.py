@@ -0,0 +1,138 @@
+# coding=utf8
+""" Local IPC endpoint so other tools can log time into the running app
+
+The app listens on a Unix domain socket (a named pipe on Windows) using
+``multiprocessing.connection`` framing: each message is a 4 byte big-endian
+length followed by that many bytes of utf-8 json. A message holds a batch,
+``{"requests": [{"op": "log", "bin": "x", "amount": 1}, {"op": "totals"}]}``
+and is answered with ``{"responses": [...]}`` in the same order.
+"""
+import getpass
+import json
+import logging
+import os
+import sys
+import threading
+from multiprocessing.connection import Client, Listener
+
+MAX_MESSAGE_BYTES = 1024 * 1024
+
+
+def ipc_address(home_dir):
+    """Function to get the address the running app listens on"""
+    if sys.platform == "win32":
+        return r"\\.\pipe\whatubinup2-" + getpass.getuser()
+    return os.path.join(home_dir, "wubu2.sock")
+
+
+def send_requests(address, requests, timeout=2):
+    """Function to send a batch of requests to the running app
+
+    Raises OSError when nothing is listening.
+    """
+    if sys.platform != "win32" and not os.path.exists(address):
+        raise FileNotFoundError("No running app listening on " + address)
+    with Client(address) as connection:
+        connection.send_bytes(json.dumps({"requests": requests}).encode("utf-8"))
+        if not connection.poll(timeout):
+            raise TimeoutError("No reply from running app")
+        return json.loads(connection.recv_bytes(MAX_MESSAGE_BYTES))["responses"]
+
+
+class IpcServer(threading.Thread):
+    """Class serving IPC batches from a background thread
+
+    handle is called with the list of requests from one message and returns
+    the list of responses, it may be called from several threads at once.
+    """
+
+    def __init__(self, address, handle):
+        super().__init__(name="ipc_server", daemon=True)
+        self.address = address
+        self.handle = handle
+        self._listener = None
+        self._stopped = threading.Event()
+
+    def listen(self):
+        """Function to open the endpoint, False if another app is serving it"""
+        if sys.platform != "win32" and os.path.exists(self.address):
+            try:
+                Client(self.address).close()
+                logging.warning("IPC endpoint in use by another instance")
+                return False
+            except OSError:
+                # Left behind by a crash
+                os.remove(self.address)
+        try:
+            self._listener = Listener(self.address)
+        except OSError as error_message:
+            logging.warning("Unable to open IPC endpoint: %s", error_message)
+            return False
+        if sys.platform != "win32":
+            os.chmod(self.address, 0o600)
+        logging.info("IPC endpoint listening on %s", self.address)
+        return True
+
+    def stop(self):
+        """Stop function, wakes the blocking accept with a dummy connection"""
+        self._stopped.set()
+        if self._listener is None:
+            return
+        try:
+            Client(self.address).close()
+        except OSError:
+            pass
+
+    def _serve(self, connection):
+        """Function to answer every message on a connection until it closes"""
+        with connection:
+            while not self._stopped.is_set():
+                try:
+                    message = connection.recv_bytes(MAX_MESSAGE_BYTES)
+                except (EOFError, OSError):
+                    return
+                try:
+                    requests = json.loads(message)["requests"]
+                    if not isinstance(requests, list):
+                        raise TypeError("requests must be a list")
+                    responses = self.handle(requests)
+                except (ValueError, KeyError, TypeError) as error_message:
+                    responses = [{"status": "fail", "details": str(error_message)}]
+                except Exception as error_message:  # pylint: disable=broad-except
+                    # Such as an OSError writing the journal, the client still
+                    # gets an answer instead of a dropped connection
+                    logging.exception("IPC request failed")
+                    responses = [
+                        {
+                            "status": "fail",
+                            "details": "Request failed: " + str(error_message),
+                        }
+                    ]
+                try:
+                    connection.send_bytes(
+                        json.dumps({"responses": responses}).encode("utf-8")
+                    )
+                except OSError:
+                    return
+
+    def run(self):
+        if self._listener is None and not self.listen():
+            return
+        with self._listener:
+            while not self._stopped.is_set():
+                try:
+                    connection = self._listener.accept()
+                except OSError as error_message:
+                    logging.warning("IPC accept failed: %s", error_message)
+                    break
+                if self._stopped.is_set():
+                    connection.close()
+                    break
+                threading.Thread(
+                    target=self._serve,
+                    args=(connection,),
+                    name="ipc_connection",
+                    daemon=True,
+                ).start()
+        # Closing the listener also removes the socket file
+        logging.info("IPC endpoint stopped")
@@ -0,0 +1,135 @@
+# coding=utf8
+""" Queue based logging with dated files, repeat suppression and retention
+
+Records are put on a queue by the calling thread and written by a
+QueueListener thread, so the UI thread never waits on disk. Files are named
+``application_<yy-mm-dd>.log`` after the day each record was made, which
+keeps long-running sessions rotating at midnight.
+"""
+import atexit
+import gzip
+import logging
+import logging.handlers
+import os
+import queue
+import shutil
+import threading
+from datetime import date, datetime, timedelta
+
+LOG_FORMAT = "%(asctime)s [%(levelname)s] %(message)s"
+
+
+class RepeatFilter(logging.Filter):  # pylint: disable=too-few-public-methods
+    """Class dropping repeats of the same message within a window
+
+    The next copy let through after the window notes how many were dropped.
+    """
+
+    def __init__(self, window_seconds=60):
+        super().__init__()
+        self.window_seconds = window_seconds
+        self._lock = threading.Lock()
+        self._seen = {}
+
+    def filter(self, record):
+        key = (record.levelno, record.pathname, record.lineno, record.getMessage())
+        with self._lock:
+            first_seen, suppressed = self._seen.get(key, (None, 0))
+            if (
+                first_seen is not None
+                and record.created - first_seen < self.window_seconds
+            ):
+                self._seen[key] = (first_seen, suppressed + 1)
+                return False
+            self._seen[key] = (record.created, 0)
+            if len(self._seen) > 1000:
+                # Forget messages that have not repeated recently
+                self._seen = {
+                    seen_key: value
+                    for seen_key, value in self._seen.items()
+                    if record.created - value[0] < self.window_seconds
+                }
+        if suppressed:
+            record.msg = (
+                record.getMessage() + " (" + str(suppressed) + " repeats suppressed)"
+            )
+            record.args = ()
+        return True
+
+
+class DatedFileHandler(logging.FileHandler):
+    """Class writing each record to the log file for the day it was made"""
+
+    def __init__(self, logs_dir):
+        self.logs_dir = logs_dir
+        self.day = date.today().strftime("%y-%m-%d")
+        super().__init__(self.path_for(self.day), encoding="UTF-8", delay=True)
+
+    def path_for(self, day):
+        """Function to get the log file path for a day"""
+        return os.path.join(self.logs_dir, "application_" + day + ".log")
+
+    def emit(self, record):
+        day = datetime.fromtimestamp(record.created).strftime("%y-%m-%d")
+        if day != self.day:
+            self.acquire()
+            try:
+                self.close()
+                self.day = day
+                self.baseFilename = os.path.abspath(self.path_for(day))
+            finally:
+                self.release()
+        super().emit(record)
+
+
+def prune_logs(logs_dir, retention_days=30, compress=True):
+    """Function to gzip logs from earlier days and delete expired ones"""
+    today = date.today().strftime("%y-%m-%d")
+    oldest = (date.today() - timedelta(days=retention_days)).strftime("%y-%m-%d")
+    removed = compressed = 0
+    for file_name in os.listdir(logs_dir):
+        if not file_name.startswith("application_"):
+            continue
+        day = file_name[len("application_") :].split(".", 1)[0]
+        path = os.path.join(logs_dir, file_name)
+        try:
+            if day < oldest:
+                os.remove(path)
+                removed += 1
+            elif compress and day < today and file_name.endswith(".log"):
+                with open(path, "rb") as log_file, gzip.open(
+                    path + ".gz.tmp", "wb"
+                ) as gzip_file:
+                    shutil.copyfileobj(log_file, gzip_file)
+                os.replace(path + ".gz.tmp", path + ".gz")
+                os.remove(path)
+                compressed += 1
+        except OSError as error_message:
+            logging.warning("Unable to prune log %s: %s", file_name, error_message)
+    if removed or compressed:
+        logging.info(
+            "Pruned logs, %s compressed and %s past retention removed",
+            compressed,
+            removed,
+        )
+
+
+def setup_logging(logs_dir, level=logging.INFO, repeat_window_seconds=60):
+    """Function to route logging through a queue to a background writer"""
+    formatter = logging.Formatter(LOG_FORMAT)
+    file_handler = DatedFileHandler(logs_dir)
+    stream_handler = logging.StreamHandler()
+    for handler in (file_handler, stream_handler):
+        handler.setFormatter(formatter)
+    listener = logging.handlers.QueueListener(
+        queue.SimpleQueue(), file_handler, stream_handler
+    )
+    queue_handler = logging.handlers.QueueHandler(listener.queue)
+    queue_handler.addFilter(RepeatFilter(repeat_window_seconds))
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(queue_handler)
+    listener.start()
+    # Flush anything still queued when the app exits
+    atexit.register(listener.stop)
+    return listener
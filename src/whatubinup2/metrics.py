@@ -0,0 +1,182 @@
+# coding=utf8
+""" Lightweight in-process counters and timers, exported as Prometheus text
+
+Counters are rendered as ``<name>_total`` and timers as a summary with
+``<name>_seconds_count`` and ``<name>_seconds_sum``, each keyed by an
+optional dict of labels. Recording is a dict update under a lock, so it is
+cheap enough for the main loop.
+"""
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+_lock = threading.Lock()
+_counters = {}
+_timers = {}
+_help = {}
+_generation = 0  # pylint: disable=invalid-name
+_started = time.time()
+
+
+def _key(name, labels):
+    """Function to build a hashable key for a metric and its labels"""
+    return name, tuple(sorted((labels or {}).items()))
+
+
+def increment(name, labels=None, amount=1, description=""):
+    """Function to add to a counter"""
+    global _generation  # pylint: disable=global-statement
+    with _lock:
+        key = _key(name, labels)
+        _counters[key] = _counters.get(key, 0) + amount
+        _help.setdefault(name, description)
+        _generation += 1
+
+
+def observe(name, seconds, labels=None, description=""):
+    """Function to record one timing"""
+    global _generation  # pylint: disable=global-statement
+    with _lock:
+        key = _key(name, labels)
+        count, total = _timers.get(key, (0, 0.0))
+        _timers[key] = (count + 1, total + seconds)
+        _help.setdefault(name, description)
+        _generation += 1
+
+
+@contextmanager
+def timed(name, labels=None, description=""):
+    """Function to time a with block, failures are counted too"""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        increment(name + "_errors", labels, description="Failures of " + name)
+        raise
+    finally:
+        observe(name, time.perf_counter() - start, labels, description)
+
+
+def generation():
+    """Function to get a number that changes whenever a metric is recorded"""
+    with _lock:
+        return _generation
+
+
+def _format_labels(labels):
+    """Function to format labels as {name="value",...}"""
+    if not labels:
+        return ""
+    return (
+        "{"
+        + ",".join(
+            name
+            + '="'
+            + str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+            + '"'
+            for name, value in labels
+        )
+        + "}"
+    )
+
+
+def render():
+    """Function to render every metric in the Prometheus text format"""
+    with _lock:
+        counters = dict(_counters)
+        timers = dict(_timers)
+        descriptions = dict(_help)
+    cpu_times = os.times()
+    lines = [
+        "# HELP process_cpu_seconds_total User and system CPU time used.",
+        "# TYPE process_cpu_seconds_total counter",
+        "process_cpu_seconds_total " + repr(cpu_times.user + cpu_times.system),
+        "# HELP process_start_time_seconds Start time since the unix epoch.",
+        "# TYPE process_start_time_seconds gauge",
+        "process_start_time_seconds " + repr(_started),
+    ]
+    for name in sorted({key[0] for key in counters}):
+        lines.append("# HELP " + name + "_total " + (descriptions[name] or name))
+        lines.append("# TYPE " + name + "_total counter")
+        for (metric, labels), value in sorted(counters.items()):
+            if metric == name:
+                lines.append(
+                    name + "_total" + _format_labels(labels) + " " + str(value)
+                )
+    for name in sorted({key[0] for key in timers}):
+        lines.append("# HELP " + name + "_seconds " + (descriptions[name] or name))
+        lines.append("# TYPE " + name + "_seconds summary")
+        for (metric, labels), (count, total) in sorted(timers.items()):
+            if metric == name:
+                lines.append(
+                    name + "_seconds_count" + _format_labels(labels) + " " + str(count)
+                )
+                lines.append(
+                    name + "_seconds_sum" + _format_labels(labels) + " " + repr(total)
+                )
+    return "\n".join(lines) + "\n"
+
+
+def write_file(path):
+    """Function to atomically replace the metrics file"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = path + ".tmp"
+    with open(temp_path, "w", encoding="UTF-8") as metrics_file:
+        metrics_file.write(render())
+    os.replace(temp_path, path)
+
+
+class MetricsFileWriter:
+    """Class writing the metrics file, skipping writes when nothing changed
+
+    An idle app then does no disk I/O for metrics at all.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._written_generation = None
+
+    def write(self):
+        """Function to write the metrics file if any metric changed"""
+        current_generation = generation()
+        if current_generation == self._written_generation:
+            return
+        try:
+            write_file(self.path)
+            self._written_generation = current_generation
+        except OSError as error_message:
+            logging.warning("Unable to write metrics file: %s", error_message)
+
+
+def serve(port):
+    """Function to serve /metrics on a localhost-only port, returns the server"""
+    # pylint: disable=import-outside-toplevel
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        """Class answering scrapes of /metrics"""
+
+        def do_GET(self):  # pylint: disable=invalid-name
+            """Function to answer a GET request"""
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+            logging.debug("Metrics scrape: " + format, *args)
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(
+        target=server.serve_forever, name="metrics_server", daemon=True
+    ).start()
+    logging.info("Serving metrics on http://127.0.0.1:%s/metrics", port)
+    return server
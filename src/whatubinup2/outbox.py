@@ -0,0 +1,89 @@
+# coding=utf8
+""" Persistent, coalescing outbox for Cloud config uploads """
+import json
+import logging
+import os
+import random
+import threading
+
+
+class ConfigOutbox(threading.Thread):
+    """Class uploading the latest spooled config from a background thread
+
+    Only the newest config is kept on disk, so a burst of edits collapses
+    into a single upload. A failed upload stays spooled and is retried with
+    backoff, including on the next app launch.
+    """
+
+    def __init__(
+        self,
+        spool_path,
+        send,
+        coalesce_seconds=2,
+        retry_seconds=5,
+        max_retry_seconds=900,
+    ):
+        super().__init__(name="config_outbox", daemon=True)
+        self.spool_path = spool_path
+        self.send = send
+        self.coalesce_seconds = coalesce_seconds
+        self.retry_seconds = retry_seconds
+        self.max_retry_seconds = max_retry_seconds
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopper = threading.Event()
+        self._generation = 0
+
+    def enqueue(self, config_data):
+        """Function to spool config for upload, replacing anything pending"""
+        with self._lock:
+            os.makedirs(os.path.dirname(self.spool_path), exist_ok=True)
+            temp_path = self.spool_path + ".tmp"
+            with open(temp_path, "w", encoding="UTF-8") as spool_file:
+                spool_file.write(json.dumps(config_data))
+            os.replace(temp_path, self.spool_path)
+            self._generation += 1
+        logging.info("Config queued for Cloud upload")
+        self._wakeup.set()
+
+    def pending(self):
+        """Check if an upload is waiting in the spool"""
+        return os.path.exists(self.spool_path)
+
+    def stop(self):
+        """Stop function, anything still spooled is sent on next launch"""
+        self._stopper.set()
+        self._wakeup.set()
+
+    def run(self):
+        retry_seconds = self.retry_seconds
+        while not self._stopper.is_set():
+            self._wakeup.clear()
+            if not self.pending():
+                self._wakeup.wait()
+                continue
+            # Give a burst of edits time to land before uploading
+            if self._stopper.wait(self.coalesce_seconds):
+                break
+            with self._lock:
+                generation = self._generation
+                with open(self.spool_path, encoding="utf-8") as spool_file:
+                    config_data = json.load(spool_file)
+            try:
+                self.send(config_data)
+            except Exception as error_message:  # pylint: disable=broad-except
+                logging.warning(
+                    "Config upload failed, retrying in %s seconds: %s",
+                    retry_seconds,
+                    error_message,
+                )
+                if self._stopper.wait(retry_seconds * random.uniform(0.5, 1)):
+                    break
+                retry_seconds = min(retry_seconds * 2, self.max_retry_seconds)
+                continue
+            retry_seconds = self.retry_seconds
+            with self._lock:
+                # Keep the spool if a newer config arrived during the upload
+                if generation == self._generation:
+                    os.remove(self.spool_path)
+        logging.info("Config outbox stopped")
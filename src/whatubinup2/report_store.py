@@ -0,0 +1,278 @@
+# coding=utf8
+""" Storage for daily time reports
+
+Each day has a summary json (``reports/<yy-mm-dd>.json``, a ``{bin: count}``
+dict) and, while time is being logged, an append-only journal
+(``journal/<yy-mm-dd>.journal``) with one ``timestamp<TAB>bin<TAB>amount``
+line per entry. A journal always starts with the summary it was created
+from (lines with a ``base`` timestamp), so the day's totals can be rebuilt
+from the journal alone and compaction can safely be repeated after a crash.
+Compacted journals are kept under ``journal/archive/`` as an audit trail.
+"""
+import json
+import logging
+import os
+import threading
+from datetime import datetime
+
+from whatubinup2 import metrics
+
+BASE_TIMESTAMP = "base"
+
+
+def append_lines(path, lines):
+    """Function to durably append whole lines, dropping a torn last line first"""
+    with open(path, "a+b") as journal:
+        end = journal.seek(0, os.SEEK_END)
+        if end > 0:
+            journal.seek(max(0, end - 4096))
+            tail = journal.read()
+            if not tail.endswith(b"\n"):
+                journal.truncate(end - len(tail) + tail.rfind(b"\n") + 1)
+                logging.warning("Dropped partial last line from %s", path)
+        journal.write("".join(lines).encode("utf-8"))
+        journal.flush()
+        os.fsync(journal.fileno())
+
+
+def format_line(timestamp, bin_name, amount):
+    """Function to format a single journal line"""
+    return timestamp + "\t" + bin_name + "\t" + str(int(amount)) + "\n"
+
+
+class ReportStore:
+    """Class for reading, logging to and compacting daily reports"""
+
+    def __init__(self, reports_dir, journal_dir):
+        self.reports_dir = reports_dir
+        self.journal_dir = journal_dir
+
+    def summary_path(self, day):
+        """Function to get the path of a day's summary json"""
+        return os.path.join(self.reports_dir, day + ".json")
+
+    def journal_path(self, day):
+        """Function to get the path of a day's journal"""
+        return os.path.join(self.journal_dir, day + ".journal")
+
+    def read_summary(self, day):
+        """Function to read a day's summary json, None if there isn't one"""
+        try:
+            with open(self.summary_path(day), encoding="utf-8") as report:
+                return json.load(report)
+        except FileNotFoundError:
+            return None
+
+    def write_summary(self, day, report):
+        """Function to atomically replace a day's summary json"""
+        with metrics.timed(
+            "wubu2_report_write",
+            {"backend": "json", "operation": "summary"},
+            "Report store writes",
+        ):
+            os.makedirs(self.reports_dir, exist_ok=True)
+            temp_path = self.summary_path(day) + ".tmp"
+            with open(temp_path, "w", encoding="UTF-8") as report_file:
+                report_file.write(json.dumps(report))
+                report_file.flush()
+                os.fsync(report_file.fileno())
+            os.replace(temp_path, self.summary_path(day))
+
+    def entries(self, day):
+        """Function to yield (timestamp, bin, amount) entries from a journal"""
+        try:
+            journal = open(self.journal_path(day), encoding="utf-8")
+        except FileNotFoundError:
+            return
+        with journal:
+            for line in journal:
+                # A line without its newline was torn by a crash, skip it
+                if not line.endswith("\n"):
+                    logging.warning("Ignoring partial journal line for %s", day)
+                    continue
+                try:
+                    timestamp, rest = line.rstrip("\n").split("\t", 1)
+                    bin_name, amount = rest.rsplit("\t", 1)
+                    yield timestamp, bin_name, int(amount)
+                except ValueError:
+                    logging.warning("Ignoring bad journal line for %s: %r", day, line)
+
+    def read_day(self, day):
+        """Function to get a day's totals, None if nothing has been recorded"""
+        if not os.path.exists(self.journal_path(day)):
+            return self.read_summary(day)
+        report = {}
+        for _, bin_name, amount in self.entries(day):
+            report[bin_name] = report.get(bin_name, 0) + amount
+        return report
+
+    def _start_journal(self, day):
+        """Function to create a day's journal seeded from its summary"""
+        os.makedirs(self.journal_dir, exist_ok=True)
+        # Unique per thread too, the app also logs from its IPC thread
+        temp_path = (
+            self.journal_path(day)
+            + "."
+            + str(os.getpid())
+            + "."
+            + str(threading.get_ident())
+            + ".tmp"
+        )
+        append_lines(
+            temp_path,
+            [
+                format_line(BASE_TIMESTAMP, bin_name, amount)
+                for bin_name, amount in (self.read_summary(day) or {}).items()
+            ],
+        )
+        try:
+            # link rather than rename so a journal started elsewhere is kept
+            os.link(temp_path, self.journal_path(day))
+        except FileExistsError:
+            pass
+        finally:
+            os.remove(temp_path)
+
+    def log(self, day, bin_name, amount=1, timestamp=None):
+        """Function to append a time entry to a day's journal"""
+        self.log_many(day, {bin_name: amount}, timestamp)
+
+    def log_many(self, day, amounts, timestamp=None):
+        """Function to append a {bin: amount} batch to a day's journal at once"""
+        with metrics.timed(
+            "wubu2_report_write",
+            {"backend": "json", "operation": "log"},
+            "Report store writes",
+        ):
+            if not os.path.exists(self.journal_path(day)):
+                self._start_journal(day)
+            if timestamp is None:
+                timestamp = datetime.now().isoformat(timespec="seconds")
+            append_lines(
+                self.journal_path(day),
+                [
+                    format_line(timestamp, bin_name, amount)
+                    for bin_name, amount in amounts.items()
+                ],
+            )
+
+    def archive_path(self, day):
+        """Function to get the path of a day's archived journal"""
+        return os.path.join(self.journal_dir, "archive", day + ".journal")
+
+    def _archive(self, day):
+        """Function to move a compacted journal into the audit archive"""
+        os.makedirs(os.path.dirname(self.archive_path(day)), exist_ok=True)
+        if not os.path.exists(self.archive_path(day)):
+            os.replace(self.journal_path(day), self.archive_path(day))
+            return
+        # Day was logged to again after compaction, keep only the new entries
+        append_lines(
+            self.archive_path(day),
+            [
+                format_line(timestamp, bin_name, amount)
+                for timestamp, bin_name, amount in self.entries(day)
+                if timestamp != BASE_TIMESTAMP
+            ],
+        )
+        os.remove(self.journal_path(day))
+
+    def compact(self, day, keep_journal=False):
+        """Function to fold a day's journal into its summary json"""
+        if not os.path.exists(self.journal_path(day)):
+            return
+        self.write_summary(day, self.read_day(day))
+        if not keep_journal:
+            self._archive(day)
+        logging.info("Compacted journal for %s", day)
+
+    def list_days(self):
+        """Function to list every day with a report, oldest first"""
+        days = set()
+        if os.path.isdir(self.reports_dir):
+            days.update(
+                name[:-5]
+                for name in os.listdir(self.reports_dir)
+                if name.endswith(".json")
+            )
+        if os.path.isdir(self.journal_dir):
+            days.update(
+                name[:-8]
+                for name in os.listdir(self.journal_dir)
+                if name.endswith(".journal")
+            )
+        return sorted(days)
+
+    def day_signatures(self):
+        """Function to get a cheap change fingerprint for every day"""
+        signatures = {}
+        for directory, suffix in (
+            (self.reports_dir, ".json"),
+            (self.journal_dir, ".journal"),
+        ):
+            if not os.path.isdir(directory):
+                continue
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.name.endswith(suffix):
+                        stat = entry.stat()
+                        signatures.setdefault(entry.name[: -len(suffix)], []).extend(
+                            [suffix, stat.st_mtime_ns, stat.st_size]
+                        )
+        return signatures
+
+    def day_signature(self, day):
+        """Function to get one day's change fingerprint, None if it has no report"""
+        signature = []
+        for path, suffix in (
+            (self.summary_path(day), ".json"),
+            (self.journal_path(day), ".journal"),
+        ):
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            signature.extend([suffix, stat.st_mtime_ns, stat.st_size])
+        return signature or None
+
+    def recent_days(self, count):
+        """Function to get the newest days with a report, newest first
+
+        Days are picked by their yy-mm-dd file names, so no file is opened or
+        stat'd and copied files keep their order.
+        """
+        return self.list_days()[::-1][:count]
+
+    def totals(self, start_day, end_day):
+        """Function to sum each bin over an inclusive range of days"""
+        totals = {}
+        for day in self.list_days():
+            if start_day <= day <= end_day:
+                for bin_name, amount in (self.read_day(day) or {}).items():
+                    totals[bin_name] = totals.get(bin_name, 0) + amount
+        return totals
+
+    def compact_before(self, day):
+        """Function to compact every journal for days before the given day"""
+        if not os.path.isdir(self.journal_dir):
+            return
+        for file_name in os.listdir(self.journal_dir):
+            if file_name.endswith(".journal") and file_name[:-8] < day:
+                self.compact(file_name[:-8])
+
+
+def open_report_store(config, home_dir):
+    """Function to open the report store selected by report_backend in config"""
+    reports_dir = home_dir + "reports/"
+    journal_dir = home_dir + "journal/"
+    if config.get("report_backend", "json") == "sqlite":
+        # pylint: disable=import-outside-toplevel
+        from whatubinup2.sqlite_store import open_sqlite_store
+
+        return open_sqlite_store(
+            home_dir + "reports.db",
+            reports_dir,
+            journal_dir,
+            config.get("report_json_compat", True),
+        )
+    return ReportStore(reports_dir, journal_dir)
@@ -0,0 +1,379 @@
+# coding=utf8
+""" Multi-device Cloud report sync with grow-only per-device counters
+
+Every device only ever writes its own counters, per day and bin a pair of
+grow-only counters ``{"p": added, "n": removed}`` (a PN-counter). A local
+total going up adds to ``p`` and going down, after a rename or a negative
+entry, adds to ``n``, so neither ever decreases. The api_server and every
+client merge counters by taking the maximum of each half per device, so
+uploads can be repeated, reordered or lost and retried and all devices
+still converge on the same totals. A bin's merged total is the sum over
+devices of ``p - n``.
+
+Counters from other devices are kept in ``cache/remote_reports.json`` and
+added to local reports by MergedReportStore, the local report store itself
+only ever holds this device's entries.
+"""
+import json
+import logging
+import os
+import random
+import threading
+import uuid
+
+from whatubinup2.report_store import ReportStore
+
+UPLOAD_BATCH_DAYS = 500
+
+
+def load_device_id(path):
+    """Function to get this device's id, created on first use"""
+    try:
+        with open(path, encoding="utf-8") as device_file:
+            device_id = device_file.read().strip()
+        if device_id:
+            return device_id
+    except FileNotFoundError:
+        pass
+    device_id = uuid.uuid4().hex
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="UTF-8") as device_file:
+        device_file.write(device_id)
+    return device_id
+
+
+def pn_counter(counter):
+    """Function to read a device's counter, plain counts are from older clients"""
+    if isinstance(counter, dict):
+        return {"p": counter.get("p", 0), "n": counter.get("n", 0)}
+    return {"p": counter, "n": 0}
+
+
+def counter_total(counter):
+    """Function to get the value of a device's counter"""
+    counter = pn_counter(counter)
+    return counter["p"] - counter["n"]
+
+
+def advance_counter(counter, total):
+    """Function to grow a counter so its value matches a local total"""
+    counter = pn_counter(counter)
+    difference = total - (counter["p"] - counter["n"])
+    if difference > 0:
+        counter["p"] += difference
+    elif difference < 0:
+        counter["n"] -= difference
+    return counter
+
+
+def merge_counters(counters, incoming, exclude_device=None):
+    """Function to merge {day: {bin: {device: counter}}} by max, in place
+
+    Returns the days whose counters changed.
+    """
+    changed_days = set()
+    for day, bins in incoming.items():
+        for bin_name, devices in bins.items():
+            for device, counter in devices.items():
+                if device == exclude_device:
+                    continue
+                day_bins = counters.setdefault(day, {})
+                known = day_bins.setdefault(bin_name, {})
+                current = pn_counter(known.get(device, 0))
+                counter = pn_counter(counter)
+                merged = {
+                    "p": max(current["p"], counter["p"]),
+                    "n": max(current["n"], counter["n"]),
+                }
+                if device not in known or merged != current:
+                    known[device] = merged
+                    changed_days.add(day)
+    return changed_days
+
+
+class RemoteCounters:
+    """Class holding other devices' counters, persisted as json"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self.counters = {}
+        # Bumped per day on every change, part of the day's signature
+        self.revisions = {}
+        try:
+            with open(path, encoding="utf-8") as counters_file:
+                data = json.load(counters_file)
+            self.counters = data["counters"]
+            self.revisions = data["revisions"]
+        except FileNotFoundError:
+            pass
+        except (ValueError, KeyError) as error_message:
+            logging.warning("Ignoring bad remote report cache: %s", error_message)
+
+    def merge(self, incoming, exclude_device):
+        """Function to merge counters from the api_server, returns changed days"""
+        with self._lock:
+            changed_days = merge_counters(self.counters, incoming, exclude_device)
+            if not changed_days:
+                return changed_days
+            for day in changed_days:
+                self.revisions[day] = self.revisions.get(day, 0) + 1
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            temp_path = self.path + ".tmp"
+            with open(temp_path, "w", encoding="UTF-8") as counters_file:
+                counters_file.write(
+                    json.dumps({"counters": self.counters, "revisions": self.revisions})
+                )
+            os.replace(temp_path, self.path)
+        return changed_days
+
+    def day_totals(self, day):
+        """Function to get a day's {bin: total} summed over other devices"""
+        with self._lock:
+            return {
+                bin_name: sum(counter_total(counter) for counter in devices.values())
+                for bin_name, devices in self.counters.get(day, {}).items()
+            }
+
+    def days(self):
+        """Function to list days with counters from other devices"""
+        with self._lock:
+            return list(self.counters)
+
+    def revision(self, day):
+        """Function to get a day's change counter"""
+        with self._lock:
+            return self.revisions.get(day, 0)
+
+
+class MergedReportStore:
+    """Class reading local reports with other devices' counters added
+
+    Writes and anything else go straight to the local report store.
+    """
+
+    def __init__(self, report_store, remote_counters):
+        self.report_store = report_store
+        self.remote_counters = remote_counters
+
+    def __getattr__(self, name):
+        return getattr(self.report_store, name)
+
+    def read_day(self, day):
+        """Function to get a day's merged totals, None if nothing recorded"""
+        report = self.report_store.read_day(day)
+        remote = self.remote_counters.day_totals(day)
+        if not remote:
+            return report
+        merged = dict(report or {})
+        for bin_name, amount in remote.items():
+            merged[bin_name] = merged.get(bin_name, 0) + amount
+        return merged
+
+    def list_days(self):
+        """Function to list every day with a local or remote report"""
+        return sorted(
+            set(self.report_store.list_days()) | set(self.remote_counters.days())
+        )
+
+    def recent_days(self, count):
+        """Function to get the newest days with a report, newest first"""
+        return self.list_days()[::-1][:count]
+
+    def day_signatures(self):
+        """Function to get change fingerprints covering both sources"""
+        signatures = self.report_store.day_signatures()
+        for day in self.remote_counters.days():
+            signatures[day] = list(signatures.get(day, [])) + [
+                "remote",
+                self.remote_counters.revision(day),
+            ]
+        return signatures
+
+    def day_signature(self, day):
+        """Function to get one day's fingerprint covering both sources"""
+        signature = self.report_store.day_signature(day)
+        if day not in self.remote_counters.days():
+            return signature
+        return list(signature or []) + ["remote", self.remote_counters.revision(day)]
+
+    def totals(self, start_day, end_day):
+        """Function to sum each bin over an inclusive range of days"""
+        # Only needs list_days and read_day, which are the merged ones here
+        return ReportStore.totals(self, start_day, end_day)
+
+
+class ReportSync(threading.Thread):  # pylint: disable=too-many-instance-attributes
+    """Class exchanging report counters with the api_server in the background
+
+    Local changes are found from the report store's day signatures, so only
+    days logged to since the last upload are sent, batched into one request
+    per UPLOAD_BATCH_DAYS days. The PN-counters last uploaded are kept in
+    the state file, and taken back from the api_server if it is lost.
+    send posts a payload and returns the decoded reply, raising on failure.
+    """
+
+    # pylint: disable-next=too-many-arguments,too-many-positional-arguments
+    def __init__(
+        self,
+        state_path,
+        device_id,
+        report_store,
+        remote_counters,
+        send,
+        on_remote_change=None,
+        interval_seconds=300,
+        coalesce_seconds=30,
+        max_retry_seconds=3600,
+    ):
+        super().__init__(name="report_sync", daemon=True)
+        self.state_path = state_path
+        self.device_id = device_id
+        self.report_store = report_store
+        self.remote_counters = remote_counters
+        self.send = send
+        self.on_remote_change = on_remote_change
+        self.interval_seconds = interval_seconds
+        self.coalesce_seconds = coalesce_seconds
+        self.max_retry_seconds = max_retry_seconds
+        self._wakeup = threading.Event()
+        self._stopper = threading.Event()
+        self._state = {"cursor": None, "signatures": {}, "uploaded": {}}
+        try:
+            with open(state_path, encoding="utf-8") as state_file:
+                self._state = json.load(state_file)
+        except FileNotFoundError:
+            pass
+        except ValueError as error_message:
+            logging.warning("Ignoring bad report sync state: %s", error_message)
+
+    def notify(self):
+        """Function to ask for an upload soon, after time is logged"""
+        self._wakeup.set()
+
+    def stop(self):
+        """Stop function, unsent counters go with the next sync"""
+        self._stopper.set()
+        self._wakeup.set()
+
+    def _save_state(self):
+        """Function to atomically write the sync state"""
+        os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+        temp_path = self.state_path + ".tmp"
+        with open(temp_path, "w", encoding="UTF-8") as state_file:
+            state_file.write(json.dumps(self._state))
+        os.replace(temp_path, self.state_path)
+
+    def _pending_counters(self):
+        """Function to advance this device's counters for days changed locally
+
+        Returns {day: {bin: counter}} for the counters that grew.
+        """
+        signatures = self.report_store.day_signatures()
+        pending = {}
+        for day, signature in signatures.items():
+            if self._state["signatures"].get(day) == signature:
+                continue
+            counts = self.report_store.read_day(day) or {}
+            uploaded = self._state["uploaded"].get(day, {})
+            changed = {}
+            for bin_name in set(counts) | set(uploaded):
+                counter = advance_counter(
+                    uploaded.get(bin_name, 0), counts.get(bin_name, 0)
+                )
+                if counter != pn_counter(uploaded.get(bin_name, 0)):
+                    changed[bin_name] = counter
+            if changed:
+                pending[day] = changed
+            else:
+                self._state["signatures"][day] = signature
+        return pending, signatures
+
+    def _restore_own_counters(self, counters):
+        """Function to take back this device's counters the api_server holds
+
+        Used after the state file was lost, so counters carry on from what
+        was uploaded before rather than starting again below it.
+        """
+        for day, bins in counters.items():
+            for bin_name, devices in bins.items():
+                if self.device_id not in devices:
+                    continue
+                uploaded = self._state["uploaded"].setdefault(day, {})
+                known = pn_counter(uploaded.get(bin_name, 0))
+                remote = pn_counter(devices[self.device_id])
+                uploaded[bin_name] = {
+                    "p": max(known["p"], remote["p"]),
+                    "n": max(known["n"], remote["n"]),
+                }
+
+    def sync_once(self):
+        """Function to upload local counter changes and merge remote ones"""
+        changed_days = set()
+        if self._state["cursor"] is None:
+            # First sync or lost state, fetch everything before uploading
+            response = self.send(
+                {"device": self.device_id, "since": None, "counters": {}}
+            )
+            self._restore_own_counters(response.get("counters", {}))
+            changed_days |= self.remote_counters.merge(
+                response.get("counters", {}), self.device_id
+            )
+            self._state["cursor"] = response["cursor"]
+            self._save_state()
+        pending, signatures = self._pending_counters()
+        days = sorted(pending)
+        # Always one request, even with nothing to upload, to fetch changes
+        for start in range(0, max(len(days), 1), UPLOAD_BATCH_DAYS):
+            batch = days[start : start + UPLOAD_BATCH_DAYS]
+            response = self.send(
+                {
+                    "device": self.device_id,
+                    "since": self._state["cursor"],
+                    "counters": {
+                        day: {
+                            bin_name: {self.device_id: counter}
+                            for bin_name, counter in pending[day].items()
+                        }
+                        for day in batch
+                    },
+                }
+            )
+            changed_days |= self.remote_counters.merge(
+                response.get("counters", {}), self.device_id
+            )
+            self._state["cursor"] = response["cursor"]
+            for day in batch:
+                self._state["uploaded"].setdefault(day, {}).update(pending[day])
+                self._state["signatures"][day] = signatures[day]
+            self._save_state()
+        if days or changed_days:
+            logging.info(
+                "Report sync sent %s day(s), received changes for %s day(s)",
+                len(days),
+                len(changed_days),
+            )
+        if changed_days and self.on_remote_change is not None:
+            self.on_remote_change(changed_days)
+
+    def run(self):
+        retry_seconds = self.coalesce_seconds
+        while not self._stopper.is_set():
+            try:
+                self.sync_once()
+                retry_seconds = self.coalesce_seconds
+                wait_seconds = self.interval_seconds
+            except Exception as error_message:  # pylint: disable=broad-except
+                logging.warning(
+                    "Report sync failed, retrying in %s seconds: %s",
+                    retry_seconds,
+                    error_message,
+                )
+                wait_seconds = retry_seconds * random.uniform(0.5, 1)
+                retry_seconds = min(retry_seconds * 2, self.max_retry_seconds)
+            if self._wakeup.wait(wait_seconds):
+                self._wakeup.clear()
+                # Let a burst of logging land before uploading
+                if self._stopper.wait(self.coalesce_seconds):
+                    break
+        logging.info("Report sync stopped")
@@ -0,0 +1,152 @@
+# coding=utf8
+""" Weekly, monthly and yearly report totals kept in a cache file
+
+The cache holds each day's last seen totals and change fingerprint next to
+the per-period totals. A refresh only re-reads days whose fingerprint has
+changed, subtracting their old totals from each period before adding the
+new ones, so history is only ever read in full once. Once loaded, logging
+updates just the day logged to in memory, and the cache file is written on
+the next refresh or flush rather than on every log.
+"""
+import json
+import logging
+import os
+import threading
+from datetime import datetime
+
+CACHE_VERSION = 1
+PERIODS = {
+    "week": "%G-W%V",
+    "month": "%Y-%m",
+    "year": "%Y",
+}
+
+
+def period_keys(day):
+    """Function to get the week, month and year keys a yy-mm-dd day falls in"""
+    day_date = datetime.strptime(day, "%y-%m-%d")
+    return {period: day_date.strftime(fmt) for period, fmt in PERIODS.items()}
+
+
+class ReportRollups:
+    """Class keeping materialised per period totals for a report store"""
+
+    def __init__(self, cache_path, report_store):
+        self.cache_path = cache_path
+        self.report_store = report_store
+        self._cache = None
+        self._dirty = False
+        self._lock = threading.Lock()
+
+    def _empty_cache(self):
+        """Function to build an empty cache"""
+        return {
+            "version": CACHE_VERSION,
+            "days": {},
+            "periods": {period: {} for period in PERIODS},
+        }
+
+    def _load(self):
+        """Function to load the cache file, starting over if it is unusable"""
+        if self._cache is not None:
+            return self._cache
+        try:
+            with open(self.cache_path, encoding="utf-8") as cache_file:
+                self._cache = json.load(cache_file)
+            if self._cache.get("version") != CACHE_VERSION:
+                raise ValueError("Rollup cache version changed")
+        except (FileNotFoundError, ValueError):
+            logging.info("Building report rollups from scratch")
+            self._cache = self._empty_cache()
+        return self._cache
+
+    def _save(self):
+        """Function to atomically write the cache file"""
+        os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+        temp_path = self.cache_path + ".tmp"
+        with open(temp_path, "w", encoding="UTF-8") as cache_file:
+            cache_file.write(json.dumps(self._cache))
+        os.replace(temp_path, self.cache_path)
+
+    def _apply(self, day, report, sign):
+        """Function to add (sign 1) or remove (sign -1) a day from its periods"""
+        try:
+            keys = period_keys(day)
+        except ValueError:
+            return
+        for period, key in keys.items():
+            totals = self._cache["periods"][period].setdefault(key, {})
+            for bin_name, amount in report.items():
+                totals[bin_name] = totals.get(bin_name, 0) + sign * amount
+                if totals[bin_name] == 0:
+                    del totals[bin_name]
+            if not totals:
+                del self._cache["periods"][period][key]
+
+    def _update_day(self, day, signature):
+        """Function to re-read a day if its signature changed, returns True if so"""
+        cached_day = self._cache["days"].get(day)
+        if signature is None:
+            if cached_day is None:
+                return False
+            self._apply(day, self._cache["days"].pop(day)["report"], -1)
+            return True
+        if cached_day is not None and cached_day["signature"] == signature:
+            return False
+        report = self.report_store.read_day(day) or {}
+        if cached_day is not None:
+            self._apply(day, cached_day["report"], -1)
+        self._apply(day, report, 1)
+        self._cache["days"][day] = {"signature": signature, "report": report}
+        return True
+
+    def _flush(self):
+        """Function to write the cache file if it has unsaved changes"""
+        if self._dirty:
+            self._save()
+            self._dirty = False
+
+    def refresh(self):
+        """Function to bring the rollups up to date with the report store"""
+        with self._lock:
+            cache = self._load()
+            signatures = self.report_store.day_signatures()
+            changed = 0
+            for day in list(cache["days"]):
+                if day not in signatures:
+                    changed += self._update_day(day, None)
+            for day, signature in signatures.items():
+                changed += self._update_day(day, signature)
+            if changed:
+                logging.info("Report rollups updated for %s days", changed)
+                self._dirty = True
+            self._flush()
+
+    def update(self, days):
+        """Function to bring only the given days up to date, in memory
+
+        Called after logging, only those days' files are checked. Nothing is
+        done until the cache has been loaded by a refresh, which then finds
+        the change itself.
+        """
+        with self._lock:
+            if self._cache is None:
+                return
+            for day in days:
+                if self._update_day(day, self.report_store.day_signature(day)):
+                    self._dirty = True
+
+    def flush(self):
+        """Function to write changes made by update, called on exit"""
+        with self._lock:
+            self._flush()
+
+    def totals(self, period, count=None):
+        """Function to get (key, totals) pairs for a period, newest first
+
+        Call refresh first, the cache is not checked here.
+        """
+        with self._lock:
+            period_totals = self._load()["periods"][period]
+            keys = sorted(period_totals, reverse=True)[:count]
+            return [(key, dict(period_totals[key])) for key in keys]
@@ -0,0 +1,99 @@
+# coding=utf8
+""" Single background thread running timed and periodic jobs """
+import heapq
+import itertools
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+
+
+class Job:
+    """Class describing a scheduled job, returned so callers can cancel it"""
+
+    def __init__(self, name, callback, deadline, interval=None):
+        self.name = name
+        self.callback = callback
+        self.deadline = deadline
+        self.interval = interval
+        self.cancelled = False
+
+
+class Scheduler(threading.Thread):
+    """Class keeping a heap of jobs, sleeping until the earliest deadline"""
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault("daemon", True)
+        super().__init__(*args, **kwargs)
+        self._condition = threading.Condition()
+        self._heap = []
+        self._counter = itertools.count()
+        self._stopped = False
+
+    def schedule(self, name, delay, callback, interval=None):
+        """Function to run callback after delay seconds, then every interval"""
+        job = Job(name, callback, time.monotonic() + delay, interval)
+        with self._condition:
+            heapq.heappush(self._heap, (job.deadline, next(self._counter), job))
+            self._condition.notify()
+        logging.debug("Scheduled %s in %.1f seconds", name, delay)
+        return job
+
+    def cancel(self, job):
+        """Function to cancel a job, it is dropped when it reaches the top"""
+        with self._condition:
+            job.cancelled = True
+            self._condition.notify()
+
+    def stop(self):
+        """Stop function, wakes the thread straight away"""
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+
+    def _next_due_job(self):
+        """Function to block until a job is due, returns None once stopped"""
+        with self._condition:
+            while not self._stopped:
+                while self._heap and self._heap[0][2].cancelled:
+                    heapq.heappop(self._heap)
+                if not self._heap:
+                    self._condition.wait()
+                    continue
+                deadline, _, job = self._heap[0]
+                remaining = deadline - time.monotonic()
+                if remaining > 0:
+                    self._condition.wait(remaining)
+                    continue
+                heapq.heappop(self._heap)
+                if job.interval is not None:
+                    job.deadline = max(deadline + job.interval, time.monotonic())
+                    heapq.heappush(self._heap, (job.deadline, next(self._counter), job))
+                return job
+            return None
+
+    def run(self):
+        while True:
+            job = self._next_due_job()
+            if job is None:
+                logging.info("Scheduler stopped")
+                break
+            try:
+                job.callback()
+            except Exception:  # pylint: disable=broad-exception-caught
+                logging.exception("Scheduled job %s failed", job.name)
+
+
+def seconds_until_midnight(limit=None):
+    """Function to get the number of seconds until the next local midnight
+
+    Deadlines are kept on the monotonic clock, which stops while the machine
+    is suspended, so a job waiting for a wall clock time should pass a limit
+    and check the date again each time it runs.
+    """
+    now = datetime.now()
+    midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+    seconds = (midnight - now).total_seconds()
+    if limit is not None:
+        return min(seconds, limit)
+    return seconds
@@ -0,0 +1,114 @@
+# coding=utf8
+""" Paths, default config and shared stores, free of GUI and network imports """
+import functools
+from datetime import date
+from os.path import expanduser
+
+from whatubinup2 import metrics
+from whatubinup2.bin_registry import registry_for
+from whatubinup2.config_store import ConfigStore
+from whatubinup2.config_sync import SyncState
+from whatubinup2.report_store import open_report_store
+from whatubinup2.report_sync import MergedReportStore, RemoteCounters, load_device_id
+from whatubinup2.rollups import ReportRollups
+
+home_dir = expanduser("~") + "/whatubinup2/"
+reports_dir = home_dir + "reports/"
+config_dir = home_dir + "config/"
+logs_dir = home_dir + "logs/"
+
+default_config = {
+    "total_hours": {
+        "description": "Total number of hours in working day",
+        "value": 8,
+    },
+    "reminder_minutes": {
+        "description": "After how many minutes would you like a reminder",
+        "value": 10,
+    },
+    "email_address": "",
+    "license_level": "free",
+    "license_code": "",
+    "license_validated": "",
+    "license_error": "",
+    "license_refresh_minutes": 60,
+    "license_grace_hours": 72,
+    "api_server": "https://api-wubu2.tjth.co",
+    "historic_reports_to_show": 7,
+    "report_backend": "json",
+    "report_json_compat": True,
+    "metrics_file": True,
+    "metrics_interval_seconds": 60,
+    "metrics_port": 0,
+    "log_retention_days": 30,
+    "log_compress": True,
+    "report_sync": False,
+    "calendar_rules": [],
+    "calendar_default_bin": "",
+    "calendar_minutes_per_unit": 60,
+    "bin_page_size": 10,
+    "time_bins": [
+        {
+            "name": "default",
+            "nice_name": "Default",
+            "description": "Default time bin",
+        }
+    ],
+}
+
+config_store = ConfigStore(config_dir + "all.json", default_config)
+
+
+def current_date():
+    """Function to get today's date in the yy-mm-dd form used for reports"""
+    return date.today().strftime("%y-%m-%d")
+
+
+def get_config():
+    """Function to get configuration from local config (cached until changed)"""
+    with metrics.timed("wubu2_get_config", description="get_config calls"):
+        return config_store.get()
+
+
+def get_bin_registry():
+    """Function to get the bin index for the current config, rebuilt on change"""
+    return registry_for(get_config()["time_bins"])
+
+
+@functools.lru_cache(maxsize=None)
+def get_report_store():
+    """Function to get the report store selected in config, opened once"""
+    return open_report_store(get_config(), home_dir)
+
+
+@functools.lru_cache(maxsize=None)
+def get_remote_counters():
+    """Function to get report counters synced from other devices"""
+    return RemoteCounters(home_dir + "cache/remote_reports.json")
+
+
+def get_device_id():
+    """Function to get the id this device syncs reports under"""
+    return load_device_id(home_dir + "device_id")
+
+
+def get_report_view():
+    """Function to get the store to read report totals from
+
+    With report_sync enabled, other devices' counters are added in.
+    """
+    if get_config().get("report_sync", False):
+        return MergedReportStore(get_report_store(), get_remote_counters())
+    return get_report_store()
+
+
+@functools.lru_cache(maxsize=None)
+def get_sync_state():
+    """Function to get the Cloud config sync state, loaded once"""
+    return SyncState(home_dir + "cache/sync_state.json")
+
+
+@functools.lru_cache(maxsize=None)
+def get_rollups():
+    """Function to get the weekly/monthly/yearly report rollups"""
+    return ReportRollups(home_dir + "cache/rollups.json", get_report_view())
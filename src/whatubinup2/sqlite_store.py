@@ -0,0 +1,207 @@
+# coding=utf8
+""" SQLite storage for daily time reports
+
+Same interface as ReportStore, but every entry is a row indexed by day and
+by bin, so range questions don't need to open one file per day. With
+``json_compat`` enabled the per-day summary json files are still written
+for anything else reading ``reports/``.
+"""
+import logging
+import sqlite3
+import threading
+from datetime import datetime
+
+from whatubinup2 import metrics
+from whatubinup2.report_store import BASE_TIMESTAMP, ReportStore
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    id INTEGER PRIMARY KEY,
+    day TEXT NOT NULL,
+    bin TEXT NOT NULL,
+    amount INTEGER NOT NULL,
+    logged_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_day_bin ON entries (day, bin);
+CREATE INDEX IF NOT EXISTS entries_bin_day ON entries (bin, day);
+"""
+
+
+class SqliteReportStore:
+    """Class storing report entries in a SQLite database"""
+
+    def __init__(self, db_path, json_store=None, json_compat=True):
+        self.db_path = db_path
+        # Used for json compatibility writes and the one-shot import
+        self.json_store = json_store
+        self.json_compat = json_compat and json_store is not None
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(
+            db_path, check_same_thread=False, isolation_level=None
+        )
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA busy_timeout=5000")
+        self._connection.executescript(SCHEMA)
+
+    def _query(self, sql, parameters=()):
+        """Function to run a read query and fetch every row"""
+        with self._lock:
+            return self._connection.execute(sql, parameters).fetchall()
+
+    def _write_json(self, day):
+        """Function to mirror a day into its summary json in compat mode"""
+        if self.json_compat:
+            self.json_store.write_summary(day, self.read_day(day) or {})
+
+    def read_day(self, day):
+        """Function to get a day's totals, None if nothing has been recorded"""
+        rows = self._query(
+            "SELECT bin, SUM(amount) FROM entries WHERE day = ? GROUP BY bin "
+            "ORDER BY MIN(id)",
+            (day,),
+        )
+        if not rows:
+            return None
+        return dict(rows)
+
+    def write_summary(self, day, report):
+        """Function to replace a day's totals"""
+        with metrics.timed(
+            "wubu2_report_write",
+            {"backend": "sqlite", "operation": "summary"},
+            "Report store writes",
+        ), self._lock, self._connection:
+            self._connection.execute("BEGIN IMMEDIATE")
+            self._connection.execute("DELETE FROM entries WHERE day = ?", (day,))
+            self._connection.executemany(
+                "INSERT INTO entries (day, bin, amount, logged_at) VALUES (?, ?, ?, ?)",
+                [
+                    (day, bin_name, amount, BASE_TIMESTAMP)
+                    for bin_name, amount in report.items()
+                ],
+            )
+        self._write_json(day)
+
+    def entries(self, day):
+        """Function to yield (timestamp, bin, amount) entries for a day"""
+        yield from self._query(
+            "SELECT logged_at, bin, amount FROM entries WHERE day = ? ORDER BY id",
+            (day,),
+        )
+
+    def log(self, day, bin_name, amount=1, timestamp=None):
+        """Function to record a time entry"""
+        self.log_many(day, {bin_name: amount}, timestamp)
+
+    def log_many(self, day, amounts, timestamp=None):
+        """Function to record a {bin: amount} batch in one transaction"""
+        if timestamp is None:
+            timestamp = datetime.now().isoformat(timespec="seconds")
+        with metrics.timed(
+            "wubu2_report_write",
+            {"backend": "sqlite", "operation": "log"},
+            "Report store writes",
+        ), self._lock, self._connection:
+            self._connection.execute("BEGIN IMMEDIATE")
+            self._connection.executemany(
+                "INSERT INTO entries (day, bin, amount, logged_at) VALUES (?, ?, ?, ?)",
+                [
+                    (day, bin_name, int(amount), timestamp)
+                    for bin_name, amount in amounts.items()
+                ],
+            )
+        self._write_json(day)
+
+    def list_days(self):
+        """Function to list every day with a report, oldest first"""
+        return [
+            row[0]
+            for row in self._query("SELECT DISTINCT day FROM entries ORDER BY day")
+        ]
+
+    def day_signatures(self):
+        """Function to get a cheap change fingerprint for every day"""
+        return {
+            day: [count, last_id]
+            for day, count, last_id in self._query(
+                "SELECT day, COUNT(*), MAX(id) FROM entries GROUP BY day"
+            )
+        }
+
+    def day_signature(self, day):
+        """Function to get one day's change fingerprint, None if it has no report"""
+        count, last_id = self._query(
+            "SELECT COUNT(*), MAX(id) FROM entries WHERE day = ?", (day,)
+        )[0]
+        if not count:
+            return None
+        return [count, last_id]
+
+    def recent_days(self, count):
+        """Function to get the newest days with a report, newest first"""
+        return [
+            row[0]
+            for row in self._query(
+                "SELECT DISTINCT day FROM entries ORDER BY day DESC LIMIT ?", (count,)
+            )
+        ]
+
+    def totals(self, start_day, end_day):
+        """Function to sum each bin over an inclusive range of days"""
+        return dict(
+            self._query(
+                "SELECT bin, SUM(amount) FROM entries WHERE day BETWEEN ? AND ? "
+                "GROUP BY bin",
+                (start_day, end_day),
+            )
+        )
+
+    def compact(self, day, keep_journal=False):  # pylint: disable=unused-argument
+        """Function kept for interface parity, entries are already indexed"""
+        self._write_json(day)
+
+    def compact_before(self, day):
+        """Function kept for interface parity, there are no journals"""
+
+    def import_json_reports(self, json_store):
+        """Function to import days from a ReportStore missing from the database"""
+        known_days = set(self.list_days())
+        imported = 0
+        for day in json_store.list_days():
+            if day in known_days:
+                continue
+            rows = [
+                (day, bin_name, amount, timestamp)
+                for timestamp, bin_name, amount in json_store.entries(day)
+            ]
+            if not rows:
+                rows = [
+                    (day, bin_name, amount, BASE_TIMESTAMP)
+                    for bin_name, amount in (json_store.read_summary(day) or {}).items()
+                ]
+            with self._lock, self._connection:
+                self._connection.execute("BEGIN IMMEDIATE")
+                self._connection.executemany(
+                    "INSERT INTO entries (day, bin, amount, logged_at) "
+                    "VALUES (?, ?, ?, ?)",
+                    rows,
+                )
+            # Journal entries now live in the database, archive the file
+            json_store.compact(day)
+            imported += 1
+        logging.info("Imported %s days of json reports into %s", imported, self.db_path)
+        return imported
+
+    def close(self):
+        """Function to close the database connection"""
+        with self._lock:
+            self._connection.close()
+
+
+def open_sqlite_store(db_path, reports_dir, journal_dir, json_compat=True):
+    """Function to open the SQLite store, importing json reports on first use"""
+    json_store = ReportStore(reports_dir, journal_dir)
+    store = SqliteReportStore(db_path, json_store, json_compat)
+    if not store.list_days():
+        store.import_json_reports(json_store)
+    return store
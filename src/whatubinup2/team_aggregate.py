@@ -0,0 +1,184 @@
+# coding=utf8
+""" Team totals aggregated from many users' copied report directories
+
+The shared volume holds one directory per user, each a copy of that user's
+``~/whatubinup2/`` (or just its ``reports/``). Days are read with the same
+ReportStore the app uses, so summary json and any journals are both
+understood. Reading is fanned out over a process pool in chunks of days,
+and with a cache file each day's counts are kept with the report store's
+change fingerprint (file mtimes and sizes), so a re-run only reads days
+whose files changed.
+"""
+import json
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from whatubinup2.report_store import ReportStore
+
+CACHE_VERSION = 1
+
+
+def user_store(user_dir):
+    """Function to open a user's copied reports, with or without reports/"""
+    reports_dir = os.path.join(user_dir, "reports")
+    if not os.path.isdir(reports_dir):
+        reports_dir = user_dir
+    return ReportStore(reports_dir, os.path.join(user_dir, "journal"))
+
+
+def list_users(root):
+    """Function to map each user directory name under root to its path"""
+    with os.scandir(root) as entries:
+        return {
+            entry.name: entry.path
+            for entry in sorted(entries, key=lambda entry: entry.name)
+            if entry.is_dir() and not entry.name.startswith(".")
+        }
+
+
+def read_chunk(chunk):
+    """Function to read a chunk of one user's days, run in a worker process
+
+    chunk is (user, user_dir, [days]), returns (user, {day: counts}).
+    """
+    user, user_dir, days = chunk
+    store = user_store(user_dir)
+    counts = {}
+    for day in days:
+        try:
+            counts[day] = store.read_day(day) or {}
+        except (ValueError, OSError) as error_message:
+            # Left out of the cache, so the day is read again on the next run
+            logging.warning(
+                "Skipping unreadable report %s for %s: %s",
+                store.summary_path(day),
+                user,
+                error_message,
+            )
+    return user, counts
+
+
+def load_cache(cache_path):
+    """Function to load {user: {day: {"signature", "counts"}}} from a cache file"""
+    if not cache_path:
+        return {}
+    try:
+        with open(cache_path, encoding="utf-8") as cache_file:
+            cache = json.load(cache_file)
+        if cache.get("version") == CACHE_VERSION:
+            return cache["users"]
+    except FileNotFoundError:
+        pass
+    except (ValueError, KeyError) as error_message:
+        logging.warning("Ignoring bad aggregate cache: %s", error_message)
+    return {}
+
+
+def save_cache(cache_path, users):
+    """Function to atomically write the aggregate cache"""
+    directory = os.path.dirname(os.path.abspath(cache_path))
+    os.makedirs(directory, exist_ok=True)
+    temp_path = cache_path + ".tmp"
+    with open(temp_path, "w", encoding="UTF-8") as cache_file:
+        cache_file.write(json.dumps({"version": CACHE_VERSION, "users": users}))
+    os.replace(temp_path, cache_path)
+
+
+def changed_chunks(users, cache, chunk_days):
+    """Function to find days changed since the cache, split into chunks
+
+    Cache entries for days and users that no longer exist are dropped.
+    Returns the chunks to read and {(user, day): signature} for them.
+    """
+    chunks = []
+    signatures = {}
+    for user in list(cache):
+        if user not in users:
+            del cache[user]
+    for user, user_dir in users.items():
+        day_signatures = user_store(user_dir).day_signatures()
+        user_cache = cache.setdefault(user, {})
+        for day in list(user_cache):
+            if day not in day_signatures:
+                del user_cache[day]
+        changed = sorted(
+            day
+            for day, signature in day_signatures.items()
+            if user_cache.get(day, {}).get("signature") != signature
+        )
+        for start in range(0, len(changed), chunk_days):
+            chunks.append((user, user_dir, changed[start : start + chunk_days]))
+        for day in changed:
+            signatures[(user, day)] = day_signatures[day]
+    return chunks, signatures
+
+
+def summarise(cache, start_day=None, end_day=None):
+    """Function to merge cached counts into per user, per bin and per day totals"""
+    summary = {
+        "generated": datetime.now().isoformat(timespec="seconds"),
+        "bins": {},
+        "days": {},
+        "users": {},
+    }
+    for user, user_cache in sorted(cache.items()):
+        user_totals = {"days": 0, "bins": {}}
+        for day, entry in sorted(user_cache.items()):
+            if (start_day and day < start_day) or (end_day and day > end_day):
+                continue
+            if not any(entry["counts"].values()):
+                continue
+            user_totals["days"] += 1
+            day_totals = summary["days"].setdefault(day, {})
+            for bin_name, amount in entry["counts"].items():
+                user_totals["bins"][bin_name] = (
+                    user_totals["bins"].get(bin_name, 0) + amount
+                )
+                day_totals[bin_name] = day_totals.get(bin_name, 0) + amount
+                summary["bins"][bin_name] = summary["bins"].get(bin_name, 0) + amount
+        summary["users"][user] = user_totals
+    return summary
+
+
+# pylint: disable-next=too-many-arguments,too-many-positional-arguments,too-many-locals
+def aggregate(
+    root,
+    cache_path=None,
+    workers=None,
+    chunk_days=500,
+    start_day=None,
+    end_day=None,
+):
+    """Function to aggregate every user's reports under root into one summary
+
+    workers defaults to one process per core, 1 reads in this process.
+    """
+    cache = load_cache(cache_path)
+    chunks, signatures = changed_chunks(list_users(root), cache, chunk_days)
+    if workers == 1 or len(chunks) <= 1:
+        results = map(read_chunk, chunks)
+        pool = None
+    else:
+        pool = ProcessPoolExecutor(max_workers=workers)
+        results = pool.map(read_chunk, chunks)
+    try:
+        for user, counts in results:
+            for day, day_counts in counts.items():
+                cache[user][day] = {
+                    "signature": signatures[(user, day)],
+                    "counts": day_counts,
+                }
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    logging.info(
+        "Aggregated %s user(s), read %s changed day(s) in %s chunk(s)",
+        len(cache),
+        len(signatures),
+        len(chunks),
+    )
+    if cache_path:
+        save_cache(cache_path, cache)
+    return summarise(cache, start_day, end_day)
@@ -0,0 +1,5 @@
+""" Shared test setup, makes the package importable from src/ """
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), "src"))
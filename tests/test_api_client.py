@@ -0,0 +1,119 @@
+""" Tests for ApiClient retries against a local http.server """
+import gzip
+import json
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from whatubinup2.api_client import ApiClient, ApiError
+
+
+class ScriptedHandler(BaseHTTPRequestHandler):
+    """Class answering each POST with the next scripted status code"""
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        """Function to record the request and send the next status"""
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        encoding = self.headers.get("Content-Encoding")
+        if encoding == "gzip":
+            body = gzip.decompress(body)
+        server = self.server
+        with server.lock:
+            server.received.append((self.path, json.loads(body)))
+            server.encodings.append(encoding)
+            status = server.statuses.pop(0) if server.statuses else 200
+        response = json.dumps({"status": "ok", "attempt": len(server.received)})
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(response)))
+        self.end_headers()
+        self.wfile.write(response.encode("utf-8"))
+
+    def log_message(self, format, *message_args):  # pylint: disable=redefined-builtin
+        """Function to silence the default access log"""
+
+
+@pytest.fixture(name="server")
+def fixture_server():
+    """Function to serve ScriptedHandler on a free local port"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ScriptedHandler)
+    server.lock = threading.Lock()
+    server.received = []
+    server.encodings = []
+    server.statuses = []
+    server.url = "http://127.0.0.1:" + str(server.server_address[1])
+    thread = threading.Thread(
+        target=server.serve_forever, kwargs={"poll_interval": 0.01}, daemon=True
+    )
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_idempotent_endpoint_retries_5xx(server):
+    server.statuses = [503, 502]
+
+    response = ApiClient(backoff_seconds=0.001).post(
+        server.url, "/api/config/sync", {"id": "a"}
+    )
+
+    assert response.status_code == 200
+    assert [path for path, _ in server.received] == ["/api/config/sync"] * 3
+
+
+def test_retries_run_out(server):
+    server.statuses = [503, 503, 503, 503]
+    client = ApiClient(backoff_seconds=0.001)
+
+    response = client.post(server.url, "/api/auth/validate", {"id": "a"})
+
+    assert response.status_code == 503
+    assert len(server.received) == 3
+    assert client.stats()["/api/auth/validate"]["errors"] == 3
+
+
+def test_non_idempotent_endpoint_is_sent_once(server):
+    server.statuses = [503]
+
+    response = ApiClient(backoff_seconds=0.001).post(
+        server.url, "/api/auth/create", {"id": "a"}
+    )
+
+    assert response.status_code == 503
+    assert len(server.received) == 1
+
+
+def test_other_errors_are_not_retried(server):
+    server.statuses = [500]
+
+    response = ApiClient(backoff_seconds=0.001).post(
+        server.url, "/api/config/upload", {"id": "a"}
+    )
+
+    assert response.status_code == 500
+    assert len(server.received) == 1
+
+
+def test_gzip_large_bodies(server):
+    payload = {
+        "id": "a",
+        "config": {"key" + str(number): number for number in range(200)},
+    }
+
+    ApiClient(gzip_min_bytes=100).post(server.url, "/api/config/upload", payload)
+    ApiClient(gzip_min_bytes=100).post(server.url, "/api/config/sync", {"id": "a"})
+
+    assert [body for _, body in server.received] == [payload, {"id": "a"}]
+    assert server.encodings == ["gzip", None]
+
+
+def test_connection_failure_raises_api_error():
+    with socket.socket() as unused:
+        unused.bind(("127.0.0.1", 0))
+        url = "http://127.0.0.1:" + str(unused.getsockname()[1])
+
+    with pytest.raises(ApiError, match="/api/config/sync failed"):
+        ApiClient(backoff_seconds=0.001).post(url, "/api/config/sync", {"id": "a"})
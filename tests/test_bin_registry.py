@@ -0,0 +1,73 @@
+""" Tests for bin lookups and the paged bin views """
+from whatubinup2.bin_registry import BinPager, BinRegistry, registry_for
+
+
+def make_bins(count):
+    """Function to build count time_bins named bin0, bin1 and so on"""
+    return [
+        {
+            "name": "bin" + str(number),
+            "nice_name": "Bin " + str(number),
+            "description": "Even" if number % 2 == 0 else "Odd",
+        }
+        for number in range(count)
+    ]
+
+
+def test_find_by_name_or_nice_name_ignoring_case():
+    registry = BinRegistry(make_bins(3))
+
+    assert registry.find("BIN1")["name"] == "bin1"
+    assert registry.find("bin 2")["name"] == "bin2"
+    assert registry.get("bin 2") is None
+    assert registry.find("missing") is None
+
+
+def test_first_bin_wins_duplicate_names():
+    time_bins = make_bins(2)
+    time_bins.append(dict(time_bins[0], description="Duplicate"))
+
+    assert BinRegistry(time_bins).get("bin0")["description"] == "Even"
+
+
+def test_search_matches_names_and_description():
+    registry = BinRegistry(make_bins(6))
+
+    assert [time_bin["name"] for time_bin in registry.search(" odd ")] == [
+        "bin1",
+        "bin3",
+        "bin5",
+    ]
+    assert len(registry.search("")) == 6
+
+
+def test_page_is_clamped_to_results():
+    registry = BinRegistry(make_bins(7))
+
+    bins, page_number, page_count = registry.page("", 5, 3)
+    assert (page_number, page_count) == (2, 3)
+    assert [time_bin["name"] for time_bin in bins] == ["bin6"]
+    assert registry.page("nothing", 1, 3) == ([], 0, 1)
+
+
+def test_registry_built_once_per_list():
+    time_bins = make_bins(2)
+
+    assert registry_for(time_bins) is registry_for(time_bins)
+    assert registry_for(make_bins(2)) is not registry_for(time_bins)
+
+
+def test_pager_maps_slots_to_bins():
+    pager = BinPager(BinRegistry(make_bins(5)), 2)
+    pager.refresh()
+    pager.move(1)
+    pager.refresh()
+
+    assert pager.bin_at(0)["name"] == "bin2"
+    assert pager.bin_at(2) is None
+    assert pager.page_label() == "2/3 (5 bins)"
+
+    pager.search("even")
+    pager.refresh()
+    assert [pager.bin_at(slot)["name"] for slot in range(2)] == ["bin0", "bin2"]
+    assert pager.page_label() == "1/2 (3 bins)"
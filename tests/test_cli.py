@@ -0,0 +1,44 @@
+""" Tests for command line argument parsing """
+import os
+import subprocess
+import sys
+
+import pytest
+
+from whatubinup2.cli import EXPORT_FORMATS, build_parser
+
+
+def test_log_amount_defaults_to_one():
+    assert build_parser().parse_args(["log", "default"]).amount == 1
+    assert build_parser().parse_args(["log", "default", "3"]).amount == 3
+
+
+@pytest.mark.parametrize("amount", ["0", "-2", "x", "1.5"])
+def test_log_amount_must_be_positive(amount, capsys):
+    with pytest.raises(SystemExit):
+        build_parser().parse_args(["log", "default", amount])
+    assert "positive whole number" in capsys.readouterr().err
+
+
+def test_export_formats_match_export_module():
+    # pylint: disable-next=import-outside-toplevel
+    from whatubinup2.export import FORMATS
+
+    assert EXPORT_FORMATS == FORMATS
+
+
+def test_subcommand_modules_not_imported():
+    script = (
+        "import sys, whatubinup2.cli; "
+        "print(sorted(name for name in sys.modules if name.startswith('whatubinup2')))"
+    )
+    source_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "src")
+    result = subprocess.run(
+        [sys.executable, "-c", script],
+        capture_output=True,
+        check=True,
+        cwd=source_dir,
+        text=True,
+    )
+    for name in ("ics_import", "export", "team_aggregate"):
+        assert "whatubinup2." + name not in result.stdout
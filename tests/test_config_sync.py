@@ -0,0 +1,196 @@
+""" Tests for Cloud config sync against the stub api_server and an older one """
+import json
+import os
+import socket
+import subprocess
+import sys
+
+import pytest
+
+from whatubinup2.api_client import ApiClient
+from whatubinup2.config_store import ConfigStore
+from whatubinup2.config_sync import SyncState, pull_config, push_config
+
+LOCAL_CONFIG = {
+    "email_address": "user@example.com",
+    "license_code": "CODE",
+    "license_level": "paid",
+    "license_validated": "2026-01-05 09:00:00",
+    "license_token": "local.token",
+    "license_error": "",
+    "license_grace_hours": 24,
+    "metrics_port": 9100,
+    "report_backend": "sqlite",
+    "api_server": "http://api",
+    "total_hours": {"description": "Hours", "value": 8},
+}
+
+LOCAL_KEYS = (
+    "license_validated",
+    "license_token",
+    "license_error",
+    "license_grace_hours",
+    "metrics_port",
+    "report_backend",
+)
+
+
+class Response:
+    """Class standing in for a requests response"""
+
+    def __init__(self, body, status_code=200):
+        self.text = json.dumps(body)
+        self.status_code = status_code
+
+
+class LegacyApi:
+    """Class answering like an api_server without revisions"""
+
+    def __init__(self, config):
+        self.config = config
+        self.uploads = []
+
+    def post(self, api_server, endpoint, payload):  # pylint: disable=unused-argument
+        """Function to answer a config request"""
+        if endpoint == "/api/config/upload":
+            self.uploads.append(payload)
+            return Response({"status": "ok"})
+        return Response({"status": "ok", "details": self.config})
+
+
+def make_store(tmp_path):
+    """Function to build a config store holding LOCAL_CONFIG"""
+    store = ConfigStore(str(tmp_path / "all.json"), LOCAL_CONFIG)
+    store.get()
+    return store, SyncState(str(tmp_path / "sync_state.json"))
+
+
+def test_legacy_pull_keeps_local_only_keys(tmp_path):
+    store, sync_state = make_store(tmp_path)
+    remote = dict(
+        LOCAL_CONFIG,
+        license_validated="2020-01-01 00:00:00",
+        license_token="other.token",
+        license_error="Rejected",
+        license_grace_hours=1000,
+        metrics_port=0,
+        report_backend="json",
+        total_hours={"description": "Hours", "value": 6},
+    )
+
+    assert pull_config(LegacyApi(remote), store, sync_state) == "full"
+
+    config = store.get()
+    assert config["total_hours"]["value"] == 6
+    for key in LOCAL_KEYS:
+        assert config[key] == LOCAL_CONFIG[key]
+
+
+def test_legacy_push_leaves_out_local_only_keys(tmp_path):
+    store, sync_state = make_store(tmp_path)
+    api = LegacyApi({})
+
+    push_config(api, store, sync_state, store.get())
+
+    sent = api.uploads[0]["config"]
+    assert sent["total_hours"]["value"] == 8
+    for key in LOCAL_KEYS:
+        assert key not in sent
+
+
+STUB_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(__file__)), "scripts", "stub_api_server.py"
+)
+
+
+@pytest.fixture(name="stub_url")
+def fixture_stub_url():
+    """Function to run scripts/stub_api_server.py on a free port"""
+    with socket.socket() as free:
+        free.bind(("127.0.0.1", 0))
+        port = str(free.getsockname()[1])
+    stub = subprocess.Popen(  # pylint: disable=consider-using-with
+        [sys.executable, STUB_PATH, "--port", port],
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    try:
+        assert stub.stdout.readline().startswith("Stub api_server on")
+        yield "http://127.0.0.1:" + port
+    finally:
+        stub.terminate()
+        stub.wait(5)
+        stub.stdout.close()
+
+
+class Device:
+    """Class holding one device's config store and sync state"""
+
+    def __init__(self, tmp_path, name, api_server):
+        self.api = ApiClient(backoff_seconds=0.001)
+        self.store = ConfigStore(
+            str(tmp_path / name / "all.json"), dict(LOCAL_CONFIG, api_server=api_server)
+        )
+        self.sync_state = SyncState(str(tmp_path / name / "sync_state.json"))
+
+    def pull(self):
+        """Function to fetch Cloud changes"""
+        return pull_config(self.api, self.store, self.sync_state)
+
+    def change(self, key, value):
+        """Function to change a setting locally and upload it"""
+        config_data = self.store.update(
+            lambda config_data: config_data.update({key: value})
+        )
+        push_config(self.api, self.store, self.sync_state, config_data)
+
+
+def test_change_reaches_other_device(tmp_path, stub_url):
+    first = Device(tmp_path, "first", stub_url)
+    second = Device(tmp_path, "second", stub_url)
+    first.pull()
+    first.change("historic_reports_to_show", 14)
+
+    assert second.pull() == "delta"
+    assert second.store.get()["historic_reports_to_show"] == 14
+    assert second.pull() == "not_modified"
+
+
+def test_first_upload_of_a_key_wins(tmp_path, stub_url):
+    first = Device(tmp_path, "first", stub_url)
+    second = Device(tmp_path, "second", stub_url)
+    first.pull()
+    second.pull()
+
+    first.change("historic_reports_to_show", 14)
+    second.change("historic_reports_to_show", 30)
+
+    assert second.store.get()["historic_reports_to_show"] == 14
+    assert second.pull() == "not_modified"
+    assert first.pull() == "not_modified"
+
+
+def test_local_change_kept_unless_cloud_is_newer(tmp_path, stub_url):
+    first = Device(tmp_path, "first", stub_url)
+    second = Device(tmp_path, "second", stub_url)
+    first.pull()
+    first.change("historic_reports_to_show", 14)
+    second.pull()
+    # Changed on the second device while its upload is still queued
+    second.store.update(
+        lambda config_data: config_data.update(
+            historic_reports_to_show=21, metrics_interval_seconds=30
+        )
+    )
+    first.change("log_retention_days", 10)
+    first.change("metrics_interval_seconds", 120)
+
+    assert second.pull() == "delta"
+
+    config = second.store.get()
+    assert config["log_retention_days"] == 10
+    assert config["historic_reports_to_show"] == 21
+    assert config["metrics_interval_seconds"] == 120
+    push_config(second.api, second.store, second.sync_state, config)
+    first.pull()
+    assert first.store.get()["historic_reports_to_show"] == 21
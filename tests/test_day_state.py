@@ -0,0 +1,79 @@
+""" Tests for the in-memory day counters and their subscribers """
+from whatubinup2.day_state import DayState, post_on_change
+
+DAY = "26-01-05"
+
+
+class Window:
+    """Class standing in for a window receiving posted events"""
+
+    def __init__(self):
+        self.events = []
+
+    def write_event_value(self, key, value):
+        """Function to record a posted event"""
+        self.events.append((key, value))
+
+
+def test_add_keeps_running_total():
+    day_state = DayState(DAY, {"work": 2})
+
+    assert day_state.add(DAY, "work") == 3
+    assert day_state.add(DAY, "admin", 2) == 2
+    assert day_state.snapshot() == ({"work": 3, "admin": 2}, 5)
+
+
+def test_add_for_another_day_is_ignored():
+    day_state = DayState(DAY, {"work": 2})
+    changes = []
+    day_state.subscribe(lambda state, changed: changes.append(changed))
+
+    assert day_state.add("26-01-04", "work") is None
+    assert day_state.snapshot() == ({"work": 2}, 2)
+    assert not changes
+
+
+def test_replace_tells_only_about_changes():
+    day_state = DayState(DAY, {"work": 2, "admin": 1})
+    changes = []
+    day_state.subscribe(lambda state, changed: changes.append(changed))
+
+    assert day_state.replace(DAY, {"work": 2, "admin": 1}) == set()
+    assert day_state.replace(DAY, {"work": 2, "meetings": 1}) == {"admin", "meetings"}
+    assert changes == [{"admin", "meetings"}]
+    # A new day with the same counts is still a change
+    day_state.replace("26-01-06", {"work": 2, "meetings": 1})
+    assert len(changes) == 2
+    assert day_state.snapshot() == ({"work": 2, "meetings": 1}, 3)
+
+
+def test_failing_subscriber_does_not_stop_others():
+    day_state = DayState(DAY, {})
+    changes = []
+
+    def broken(state, changed):
+        raise RuntimeError("window closed")
+
+    day_state.subscribe(broken)
+    unsubscribe = day_state.subscribe(lambda state, changed: changes.append(changed))
+    day_state.add(DAY, "work")
+    unsubscribe()
+    day_state.add(DAY, "work")
+
+    assert changes == [{"work"}]
+
+
+def test_post_on_change_posts_once_until_handled():
+    day_state = DayState(DAY, {})
+    window = Window()
+    day_state.subscribe(post_on_change(window, "-DAY-STATE-"))
+
+    day_state.add(DAY, "work")
+    day_state.add(DAY, "admin")
+    assert len(window.events) == 1
+
+    key, pending = window.events[0]
+    assert key == "-DAY-STATE-"
+    pending.clear()
+    day_state.add(DAY, "work")
+    assert len(window.events) == 2
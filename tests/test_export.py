@@ -0,0 +1,57 @@
+""" Tests for exporting report history as CSV and JSON Lines """
+import gzip
+import io
+import json
+
+import pytest
+
+from whatubinup2.export import close_output, export_reports, open_output
+from whatubinup2.report_store import ReportStore
+
+
+@pytest.fixture(name="store")
+def fixture_store(tmp_path):
+    """Function to build a report store with three days of history"""
+    report_store = ReportStore(str(tmp_path / "reports"), str(tmp_path / "journal"))
+    report_store.write_summary("26-01-05", {"work": 2, "admin": 0})
+    report_store.log_many("26-01-06", {"work": 1, "meetings": 3})
+    report_store.write_summary("26-01-07", {"admin": 4})
+    return report_store
+
+
+def test_csv_rows_oldest_first(store):
+    output = io.StringIO()
+
+    assert export_reports(store, output) == 4
+
+    assert output.getvalue().splitlines() == [
+        "date,bin,amount",
+        "2026-01-05,work,2",
+        "2026-01-06,work,1",
+        "2026-01-06,meetings,3",
+        "2026-01-07,admin,4",
+    ]
+
+
+def test_jsonl_with_range_and_bins(store):
+    output = io.StringIO()
+
+    count = export_reports(
+        store, output, "jsonl", start_day="26-01-06", end_day="26-01-07", bins=["work"]
+    )
+
+    assert count == 1
+    assert [json.loads(line) for line in output.getvalue().splitlines()] == [
+        {"date": "2026-01-06", "bin": "work", "amount": 1}
+    ]
+
+
+def test_compressed_file_output(store, tmp_path):
+    path = str(tmp_path / "history.csv.gz")
+
+    output = open_output(path, compress=True)
+    export_reports(store, output, end_day="26-01-05")
+    close_output(output)
+
+    with gzip.open(path, "rt", encoding="utf-8") as exported:
+        assert exported.read() == "date,bin,amount\n2026-01-05,work,2\n"
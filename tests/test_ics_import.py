@@ -0,0 +1,124 @@
+""" Tests for importing .ics calendars into reports """
+import json
+
+import pytest
+
+from whatubinup2.ics_import import import_ics
+from whatubinup2.report_store import ReportStore
+
+CONFIG = {
+    "calendar_rules": [{"bin": "meetings", "title": "standup|review"}],
+    "calendar_default_bin": "",
+    "calendar_minutes_per_unit": 60,
+    "time_bins": [{"name": "meetings", "nice_name": "Meetings", "description": ""}],
+}
+
+
+def write_calendar(path, events):
+    """Function to write (uid, title, start, end) events as an .ics file"""
+    lines = ["BEGIN:VCALENDAR"]
+    for uid, title, start, end in events:
+        lines += [
+            "BEGIN:VEVENT",
+            "UID:" + uid,
+            "SUMMARY:" + title,
+            "DTSTART:" + start,
+            "DTEND:" + end,
+            "END:VEVENT",
+        ]
+    lines.append("END:VCALENDAR")
+    path.write_text("\r\n".join(lines) + "\r\n", encoding="utf-8")
+
+
+def run_import(tmp_path, events, **options):
+    """Function to import events into the store under tmp_path"""
+    ics_path = tmp_path / "calendar.ics"
+    write_calendar(ics_path, events)
+    store = ReportStore(str(tmp_path / "reports"), str(tmp_path / "journal"))
+    written, counts = import_ics(
+        str(ics_path), CONFIG, store, str(tmp_path / "cache" / "index.json"), **options
+    )
+    return store, written, counts
+
+
+def standup(number):
+    """Function to get a 20 minute standup on 5 Jan 2026, number hours after 9"""
+    hour = str(9 + number).zfill(2)
+    return (
+        "standup-" + str(number),
+        "Standup",
+        "20260105T" + hour + "0000",
+        "20260105T" + hour + "2000",
+    )
+
+
+def test_leftover_minutes_carry_to_next_import(tmp_path):
+    _, written, counts = run_import(tmp_path, [standup(0)])
+    assert written == {}
+    assert counts["imported"] == 1
+
+    store, written, counts = run_import(tmp_path, [standup(0), standup(1)])
+    assert counts["already_imported"] == 1
+    assert written == {"26-01-05": {"meetings": 1}}
+
+    store, written, counts = run_import(tmp_path, [standup(0), standup(1), standup(2)])
+    assert counts["imported"] == 1
+    assert written == {}
+    assert store.read_day("26-01-05") == {"meetings": 1}
+
+
+def test_rounding_follows_running_total(tmp_path):
+    review = ("review", "Review", "20260105T130000", "20260105T144000")
+    store, written, _ = run_import(tmp_path, [review])
+    assert written == {"26-01-05": {"meetings": 2}}
+
+    run_import(tmp_path, [review, standup(0)])
+    run_import(tmp_path, [review, standup(0), standup(1)])
+
+    # 100 + 20 + 20 minutes is 2.33 hours
+    assert store.read_day("26-01-05") == {"meetings": 2}
+
+
+def test_old_index_of_keys_still_skips_events(tmp_path):
+    index_path = tmp_path / "cache" / "index.json"
+    index_path.parent.mkdir()
+    index_path.write_text(json.dumps(["standup-0||20260105T090000"]), encoding="utf-8")
+
+    _, written, counts = run_import(tmp_path, [standup(0)])
+
+    assert counts["already_imported"] == 1
+    assert written == {}
+
+
+def test_wider_range_adds_only_days_left_out(tmp_path):
+    # 22:00 on 5 Jan to 02:00 on 6 Jan, two hours each side of midnight
+    overnight = ("release", "Release review", "20260105T220000", "20260106T020000")
+    _, written, _ = run_import(tmp_path, [overnight], until_day="26-01-05")
+    assert written == {"26-01-05": {"meetings": 2}}
+
+    store, written, counts = run_import(tmp_path, [overnight])
+
+    assert counts["imported"] == 1
+    assert written == {"26-01-06": {"meetings": 2}}
+    assert store.read_day("26-01-05") == {"meetings": 2}
+
+    _, written, counts = run_import(tmp_path, [overnight])
+    assert counts["already_imported"] == 1
+    assert written == {}
+
+
+def test_index_saved_before_reports_are_written(tmp_path, monkeypatch):
+    review = ("review", "Review", "20260105T130000", "20260105T144000")
+
+    def crash(self, day, amounts, timestamp=None):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(ReportStore, "log_many", crash)
+    with pytest.raises(OSError):
+        run_import(tmp_path, [review])
+    monkeypatch.undo()
+
+    store, written, counts = run_import(tmp_path, [review])
+    assert counts["already_imported"] == 1
+    assert written == {}
+    assert store.read_day("26-01-05") is None
@@ -0,0 +1,84 @@
+""" Tests for the local IPC endpoint and the CLI's use of it """
+import argparse
+
+import pytest
+
+from whatubinup2 import cli
+from whatubinup2.bin_registry import BinRegistry
+from whatubinup2.ipc import IpcServer, send_requests
+
+TIME_BINS = [{"name": "work", "nice_name": "Work", "description": ""}]
+
+
+@pytest.fixture(name="serve")
+def fixture_serve(tmp_path):
+    """Function to start an IpcServer with a given handler"""
+    servers = []
+
+    def serve(handle):
+        server = IpcServer(str(tmp_path / "wubu2.sock"), handle)
+        assert server.listen()
+        server.start()
+        servers.append(server)
+        return server.address
+
+    yield serve
+    for server in servers:
+        server.stop()
+        server.join(2)
+
+
+def test_round_trip(serve):
+    address = serve(
+        lambda requests: [{"status": "ok", "op": request["op"]} for request in requests]
+    )
+
+    responses = send_requests(address, [{"op": "log"}, {"op": "totals"}])
+
+    assert responses == [
+        {"status": "ok", "op": "log"},
+        {"status": "ok", "op": "totals"},
+    ]
+    # The same connection code answers a second client
+    assert send_requests(address, [{"op": "totals"}])[0]["op"] == "totals"
+
+
+def test_handler_error_is_answered(serve):
+    def handle(requests):
+        raise PermissionError("journal is read-only")
+
+    address = serve(handle)
+
+    responses = send_requests(address, [{"op": "log", "bin": "work"}])
+
+    assert responses[0]["status"] == "fail"
+    assert "journal is read-only" in responses[0]["details"]
+
+
+def test_bad_message_is_answered(serve):
+    address = serve(lambda requests: [])
+
+    responses = send_requests(address, {"op": "log"})
+
+    assert responses[0]["status"] == "fail"
+
+
+def test_missing_endpoint_raises(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        send_requests(str(tmp_path / "missing.sock"), [{"op": "totals"}])
+
+
+def test_cli_log_does_not_write_after_dropped_connection(monkeypatch, capsys):
+    def dropped(address, requests):
+        raise EOFError()
+
+    def no_direct_write():
+        raise AssertionError("must not log directly, the app may have applied it")
+
+    monkeypatch.setattr(cli, "get_config", lambda: {"time_bins": TIME_BINS})
+    monkeypatch.setattr(cli, "get_bin_registry", lambda: BinRegistry(TIME_BINS))
+    monkeypatch.setattr(cli, "send_requests", dropped)
+    monkeypatch.setattr(cli, "get_report_store", no_direct_write)
+
+    assert cli.log_time(argparse.Namespace(bin="work", amount=1)) == 1
+    assert "closed the connection" in capsys.readouterr().err
@@ -0,0 +1,47 @@
+""" Tests for the offline license check """
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+from whatubinup2 import __main__ as app
+
+LICENSED_CONFIG = {
+    "email_address": "user@example.com",
+    "license_code": "CODE",
+    "license_level": "paid",
+    "license_error": "",
+}
+
+
+def check(monkeypatch, validated, grace_hours):
+    """Function to run check_licensing for a validation time and grace period"""
+    config_data = dict(
+        LICENSED_CONFIG,
+        license_validated=validated.strftime("%Y-%m-%d %H:%M:%S"),
+        license_grace_hours=grace_hours,
+    )
+    monkeypatch.setattr(app, "get_config", lambda: config_data)
+    return json.loads(app.check_licensing())
+
+
+def test_recent_validation_passes(monkeypatch):
+    response = check(monkeypatch, datetime.now() - timedelta(hours=1), 72)
+    assert response["status"] == "ok"
+
+
+def test_old_validation_fails(monkeypatch):
+    response = check(monkeypatch, datetime.now() - timedelta(hours=5), 4)
+    assert response["status"] == "fail"
+
+
+def test_future_validation_fails(monkeypatch):
+    response = check(monkeypatch, datetime.now() + timedelta(days=30), 72)
+    assert response["status"] == "fail"
+    assert "in the future" in response["details"]
+
+
+@pytest.mark.parametrize("grace_hours", [1000, 1e9])
+def test_grace_hours_are_capped(monkeypatch, grace_hours):
+    validated = datetime.now() - timedelta(hours=app.MAX_GRACE_HOURS + 1)
+    assert check(monkeypatch, validated, grace_hours)["status"] == "fail"
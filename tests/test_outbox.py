@@ -0,0 +1,105 @@
+""" Tests for the coalescing config upload outbox """
+import json
+import threading
+import time
+
+import pytest
+
+from whatubinup2.outbox import ConfigOutbox
+
+
+def wait_for(condition, timeout=5):
+    """Function to poll until condition() is true or the timeout passes"""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out waiting"
+        time.sleep(0.005)
+
+
+@pytest.fixture(name="make_outbox")
+def fixture_make_outbox(tmp_path):
+    """Function to build outboxes spooling under tmp_path, stopped afterwards"""
+    outboxes = []
+
+    def make_outbox(send, coalesce_seconds=0.05):
+        outbox = ConfigOutbox(
+            str(tmp_path / "outbox" / "config.json"),
+            send,
+            coalesce_seconds=coalesce_seconds,
+            retry_seconds=0.01,
+            max_retry_seconds=0.02,
+        )
+        outboxes.append(outbox)
+        return outbox
+
+    yield make_outbox
+    for outbox in outboxes:
+        outbox.stop()
+        if outbox.is_alive():
+            outbox.join(2)
+
+
+def test_burst_is_coalesced(make_outbox):
+    sent = []
+    outbox = make_outbox(sent.append, coalesce_seconds=0.2)
+    outbox.start()
+
+    for value in range(3):
+        outbox.enqueue({"total_hours": value})
+    wait_for(lambda: not outbox.pending())
+
+    assert sent == [{"total_hours": 2}]
+
+
+def test_failed_upload_is_retried(make_outbox):
+    sent = []
+
+    def flaky_send(config_data):
+        sent.append(config_data)
+        if len(sent) < 3:
+            raise ConnectionError("api_server unreachable")
+
+    outbox = make_outbox(flaky_send)
+    outbox.enqueue({"total_hours": 8})
+    outbox.start()
+    wait_for(lambda: not outbox.pending())
+
+    assert sent == [{"total_hours": 8}] * 3
+
+
+def test_newer_config_during_upload_is_kept(make_outbox):
+    sent = []
+    uploading = threading.Event()
+    release = threading.Event()
+
+    def slow_send(config_data):
+        sent.append(config_data)
+        uploading.set()
+        release.wait(5)
+
+    outbox = make_outbox(slow_send)
+    outbox.enqueue({"total_hours": 8})
+    outbox.start()
+    assert uploading.wait(5)
+    outbox.enqueue({"total_hours": 6})
+    release.set()
+    wait_for(lambda: len(sent) == 2 and not outbox.pending())
+
+    assert sent == [{"total_hours": 8}, {"total_hours": 6}]
+
+
+def test_spool_survives_stop(make_outbox, tmp_path):
+    def failing_send(config_data):
+        raise ConnectionError("api_server unreachable")
+
+    outbox = make_outbox(failing_send)
+    outbox.enqueue({"total_hours": 8})
+    outbox.stop()
+
+    with open(tmp_path / "outbox" / "config.json", encoding="utf-8") as spool:
+        assert json.load(spool) == {"total_hours": 8}
+    sent = []
+    relaunched = make_outbox(sent.append)
+    relaunched.start()
+    wait_for(lambda: not relaunched.pending())
+    assert sent == [{"total_hours": 8}]
@@ -0,0 +1,111 @@
+""" Tests for the daily report journal and its compaction """
+import json
+import os
+
+from whatubinup2.report_store import ReportStore
+
+DAY = "26-01-05"
+
+
+def make_store(tmp_path):
+    """Function to build a report store under tmp_path"""
+    return ReportStore(str(tmp_path / "reports"), str(tmp_path / "journal"))
+
+
+def journal_lines(store, day=DAY):
+    """Function to read a day's journal as lines"""
+    with open(store.journal_path(day), encoding="utf-8") as journal:
+        return journal.read().splitlines()
+
+
+def test_journal_starts_from_summary(tmp_path):
+    store = make_store(tmp_path)
+    store.write_summary(DAY, {"work": 3, "admin": 1})
+
+    store.log(DAY, "work", 2, timestamp="2026-01-05T10:00:00")
+
+    assert store.read_day(DAY) == {"work": 5, "admin": 1}
+    assert journal_lines(store) == [
+        "base\twork\t3",
+        "base\tadmin\t1",
+        "2026-01-05T10:00:00\twork\t2",
+    ]
+
+
+def test_torn_last_line_is_ignored_then_dropped(tmp_path):
+    store = make_store(tmp_path)
+    store.log(DAY, "work", 2)
+    with open(store.journal_path(DAY), "ab") as journal:
+        journal.write(b"2026-01-05T11:00:00\twork\t5")
+
+    assert store.read_day(DAY) == {"work": 2}
+
+    store.log(DAY, "work", 1, timestamp="2026-01-05T12:00:00")
+
+    assert store.read_day(DAY) == {"work": 3}
+    assert journal_lines(store)[-1] == "2026-01-05T12:00:00\twork\t1"
+    assert len(journal_lines(store)) == 2
+
+
+def test_bad_lines_are_skipped(tmp_path):
+    store = make_store(tmp_path)
+    store.log(DAY, "work", 2)
+    with open(store.journal_path(DAY), "a", encoding="utf-8") as journal:
+        journal.write("garbage\n2026-01-05T11:00:00\twork\tmany\n")
+    store.log(DAY, "admin", 1)
+
+    assert store.read_day(DAY) == {"work": 2, "admin": 1}
+
+
+def test_compact_writes_summary_and_archives(tmp_path):
+    store = make_store(tmp_path)
+    store.log(DAY, "work", 2)
+    store.log(DAY, "work", -1)
+
+    store.compact(DAY)
+
+    assert not os.path.exists(store.journal_path(DAY))
+    with open(store.summary_path(DAY), encoding="utf-8") as summary:
+        assert json.load(summary) == {"work": 1}
+    assert os.path.exists(store.archive_path(DAY))
+    assert store.read_day(DAY) == {"work": 1}
+
+
+def test_compact_again_after_more_logging(tmp_path):
+    store = make_store(tmp_path)
+    store.log(DAY, "work", 2, timestamp="2026-01-05T10:00:00")
+    store.compact(DAY)
+    store.log(DAY, "work", 3, timestamp="2026-01-05T18:00:00")
+
+    store.compact(DAY)
+
+    assert store.read_day(DAY) == {"work": 5}
+    with open(store.archive_path(DAY), encoding="utf-8") as archive:
+        assert archive.read().splitlines() == [
+            "2026-01-05T10:00:00\twork\t2",
+            "2026-01-05T18:00:00\twork\t3",
+        ]
+
+
+def test_compact_keeping_journal_can_be_repeated(tmp_path):
+    store = make_store(tmp_path)
+    store.log(DAY, "work", 2)
+
+    store.compact(DAY, keep_journal=True)
+    store.compact(DAY, keep_journal=True)
+    store.log(DAY, "work", 1)
+
+    assert store.read_day(DAY) == {"work": 3}
+    assert store.read_summary(DAY) == {"work": 2}
+
+
+def test_compact_before_leaves_today(tmp_path):
+    store = make_store(tmp_path)
+    store.log("26-01-04", "work", 1)
+    store.log(DAY, "work", 1)
+
+    store.compact_before(DAY)
+
+    assert not os.path.exists(store.journal_path("26-01-04"))
+    assert os.path.exists(store.journal_path(DAY))
+    assert store.list_days() == ["26-01-04", DAY]
@@ -0,0 +1,114 @@
+""" Tests for per-device report counters and their sync """
+import copy
+
+from whatubinup2.report_store import ReportStore
+from whatubinup2.report_sync import (
+    MergedReportStore,
+    RemoteCounters,
+    ReportSync,
+    merge_counters,
+)
+
+DAY = "26-01-05"
+
+
+class FakeServer:
+    """Class merging uploads by max like the api_server"""
+
+    def __init__(self):
+        self.counters = {}
+        self.cursor = 0
+        self.requests = []
+
+    def send(self, payload):
+        """Function to answer a report sync request"""
+        self.requests.append(copy.deepcopy(payload))
+        if merge_counters(self.counters, payload["counters"]):
+            self.cursor += 1
+        return {"status": "ok", "cursor": self.cursor, "counters": self.counters}
+
+
+def make_device(tmp_path, name, server):
+    """Function to build one device's store, merged view and sync"""
+    store = ReportStore(str(tmp_path / name / "reports"), str(tmp_path / name / "j"))
+    remote = RemoteCounters(str(tmp_path / name / "remote.json"))
+    sync = ReportSync(
+        str(tmp_path / name / "state.json"), name, store, remote, server.send
+    )
+    return store, MergedReportStore(store, remote), sync
+
+
+def test_merge_counters_takes_max_per_device_and_half():
+    counters = {}
+    assert merge_counters(counters, {DAY: {"a": {"d1": {"p": 3, "n": 0}}}}) == {DAY}
+    assert merge_counters(counters, {DAY: {"a": {"d1": {"p": 2, "n": 1}}}}) == {DAY}
+    assert counters[DAY]["a"]["d1"] == {"p": 3, "n": 1}
+    # Repeats and older values change nothing
+    assert not merge_counters(counters, {DAY: {"a": {"d1": {"p": 3, "n": 1}}}})
+    assert not merge_counters(counters, {DAY: {"a": {"d1": 2}}})
+
+
+def test_merge_counters_skips_own_device():
+    counters = {}
+    assert not merge_counters(counters, {DAY: {"a": {"me": 4}}}, exclude_device="me")
+    assert counters == {}
+
+
+def test_devices_converge_after_rename(tmp_path):
+    server = FakeServer()
+    store_a, view_a, sync_a = make_device(tmp_path, "a", server)
+    store_b, view_b, sync_b = make_device(tmp_path, "b", server)
+
+    store_a.log(DAY, "old", 3)
+    sync_a.sync_once()
+    sync_b.sync_once()
+    assert view_b.read_day(DAY) == {"old": 3}
+
+    # Rename as reload_bins does it, one balancing batch
+    store_a.log_many(DAY, {"old": -3, "new": 3})
+    store_b.log(DAY, "new", 1)
+    sync_a.sync_once()
+    sync_b.sync_once()
+    sync_a.sync_once()
+
+    assert view_a.read_day(DAY) == {"old": 0, "new": 4}
+    assert view_b.read_day(DAY) == {"old": 0, "new": 4}
+    assert server.counters[DAY]["old"]["a"] == {"p": 3, "n": 3}
+
+
+def test_negative_entry_lowers_remote_total(tmp_path):
+    server = FakeServer()
+    store_a, _, sync_a = make_device(tmp_path, "a", server)
+    _, view_b, sync_b = make_device(tmp_path, "b", server)
+    store_a.log(DAY, "x", 5)
+    sync_a.sync_once()
+    store_a.log(DAY, "x", -2)
+    sync_a.sync_once()
+    sync_b.sync_once()
+    assert view_b.read_day(DAY) == {"x": 3}
+
+
+def test_unchanged_days_are_not_uploaded_again(tmp_path):
+    server = FakeServer()
+    store_a, _, sync_a = make_device(tmp_path, "a", server)
+    store_a.log(DAY, "x", 1)
+    sync_a.sync_once()
+    sync_a.sync_once()
+    assert server.requests[-1]["counters"] == {}
+
+
+def test_lost_state_carries_on_from_server_counters(tmp_path):
+    server = FakeServer()
+    store_a, _, sync_a = make_device(tmp_path, "a", server)
+    store_a.log(DAY, "x", 5)
+    sync_a.sync_once()
+    store_a.log(DAY, "x", -1)
+    sync_a.sync_once()
+
+    (tmp_path / "a" / "state.json").unlink()
+    store_a.log(DAY, "x", 2)
+    _, _, fresh_sync = make_device(tmp_path, "a", server)
+    fresh_sync.sync_once()
+    _, view_b, sync_b = make_device(tmp_path, "b", server)
+    sync_b.sync_once()
+    assert view_b.read_day(DAY) == {"x": 6}
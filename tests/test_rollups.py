@@ -0,0 +1,107 @@
+""" Tests for the weekly, monthly and yearly report rollups """
+import os
+
+from whatubinup2.report_store import ReportStore
+from whatubinup2.rollups import ReportRollups
+
+
+def make_rollups(tmp_path):
+    """Function to build a report store and rollups over it"""
+    store = ReportStore(str(tmp_path / "reports"), str(tmp_path / "journal"))
+    return store, ReportRollups(str(tmp_path / "rollups.json"), store)
+
+
+def test_refresh_totals_periods(tmp_path):
+    store, rollups = make_rollups(tmp_path)
+    store.log("26-01-05", "work", 2)
+    store.log("26-01-06", "work", 1)
+    store.log("26-02-02", "admin", 3)
+
+    rollups.refresh()
+
+    assert rollups.totals("month") == [
+        ("2026-02", {"admin": 3}),
+        ("2026-01", {"work": 3}),
+    ]
+    assert rollups.totals("year") == [("2026", {"work": 3, "admin": 3})]
+    assert rollups.totals("week", 1) == [("2026-W06", {"admin": 3})]
+
+
+def test_update_checks_only_given_days_in_memory(tmp_path, monkeypatch):
+    store, rollups = make_rollups(tmp_path)
+    store.log("26-01-05", "work", 2)
+    rollups.refresh()
+    saved = os.stat(tmp_path / "rollups.json").st_mtime_ns
+
+    def no_scan(*scan_args):
+        raise AssertionError("update must not scan the report directories")
+
+    monkeypatch.setattr(store, "day_signatures", no_scan)
+    monkeypatch.setattr(store, "list_days", no_scan)
+    store.log("26-01-05", "work", 1)
+    store.log("26-01-07", "work", 4)
+    rollups.update(["26-01-05"])
+
+    assert rollups.totals("month") == [("2026-01", {"work": 3})]
+    assert os.stat(tmp_path / "rollups.json").st_mtime_ns == saved
+
+
+def test_update_before_load_does_nothing(tmp_path):
+    store, rollups = make_rollups(tmp_path)
+    store.log("26-01-05", "work", 2)
+
+    rollups.update(["26-01-05"])
+
+    assert not os.path.exists(tmp_path / "rollups.json")
+    rollups.refresh()
+    assert rollups.totals("year") == [("2026", {"work": 2})]
+
+
+def test_refresh_picks_up_new_days(tmp_path):
+    store, rollups = make_rollups(tmp_path)
+    store.log("26-01-05", "work", 2)
+    rollups.refresh()
+    store.log("26-01-07", "work", 4)
+
+    rollups.refresh()
+
+    assert rollups.totals("year") == [("2026", {"work": 6})]
+
+
+def test_totals_does_not_refresh(tmp_path):
+    store, rollups = make_rollups(tmp_path)
+    store.log("26-01-05", "work", 2)
+    rollups.refresh()
+    store.log("26-01-05", "work", 1)
+
+    assert rollups.totals("year") == [("2026", {"work": 2})]
+    rollups.update(["26-01-05"])
+    assert rollups.totals("year") == [("2026", {"work": 3})]
+
+
+def test_flush_writes_updates(tmp_path):
+    store, rollups = make_rollups(tmp_path)
+    store.log("26-01-05", "work", 2)
+    rollups.refresh()
+    store.log("26-01-05", "work", 1)
+    rollups.update(["26-01-05"])
+
+    rollups.flush()
+
+    reloaded = ReportRollups(str(tmp_path / "rollups.json"), store)
+    reloaded.refresh()
+    assert reloaded.totals("year") == [("2026", {"work": 3})]
+
+
+def test_unflushed_update_is_caught_up_by_refresh(tmp_path):
+    store, rollups = make_rollups(tmp_path)
+    store.log("26-01-05", "work", 2)
+    rollups.refresh()
+    store.log("26-01-05", "work", 1)
+    rollups.update(["26-01-05"])
+
+    # As after a crash, the file still has the old totals and signature
+    reloaded = ReportRollups(str(tmp_path / "rollups.json"), store)
+    reloaded.refresh()
+
+    assert reloaded.totals("year") == [("2026", {"work": 3})]
@@ -0,0 +1,96 @@
+""" Tests for the background job scheduler """
+import threading
+import time
+
+import pytest
+
+from whatubinup2.scheduler import Scheduler, seconds_until_midnight
+
+
+@pytest.fixture(name="scheduler")
+def fixture_scheduler():
+    """Function to run a scheduler for one test"""
+    scheduler = Scheduler(name="test_scheduler")
+    scheduler.start()
+    yield scheduler
+    scheduler.stop()
+    scheduler.join(2)
+
+
+def test_job_runs_after_delay(scheduler):
+    ran = threading.Event()
+    started = time.monotonic()
+
+    scheduler.schedule("once", 0.05, ran.set)
+
+    assert ran.wait(2)
+    assert time.monotonic() - started >= 0.05
+
+
+def test_interval_job_repeats(scheduler):
+    runs = []
+    done = threading.Event()
+
+    def run():
+        runs.append(time.monotonic())
+        if len(runs) == 3:
+            done.set()
+
+    scheduler.schedule("repeat", 0, run, interval=0.02)
+
+    assert done.wait(2)
+
+
+def test_cancelled_job_does_not_run(scheduler):
+    cancelled = threading.Event()
+    later = threading.Event()
+
+    job = scheduler.schedule("cancelled", 0.05, cancelled.set)
+    scheduler.schedule("later", 0.1, later.set)
+    scheduler.cancel(job)
+
+    assert later.wait(2)
+    assert not cancelled.is_set()
+
+
+def test_cancel_stops_interval_job(scheduler):
+    runs = []
+    job = scheduler.schedule("repeat", 0, lambda: runs.append(1), interval=0.01)
+    time.sleep(0.05)
+
+    scheduler.cancel(job)
+    count = len(runs)
+    time.sleep(0.05)
+
+    assert count > 0
+    # At most one run already under way when cancelled
+    assert len(runs) <= count + 1
+
+
+def test_failing_job_does_not_stop_others(scheduler):
+    ran = threading.Event()
+
+    scheduler.schedule("broken", 0, lambda: 1 / 0)
+    scheduler.schedule("fine", 0.01, ran.set)
+
+    assert ran.wait(2)
+
+
+def test_stop_wakes_sleeping_thread():
+    scheduler = Scheduler(name="test_scheduler")
+    scheduler.start()
+    ran = threading.Event()
+    scheduler.schedule("far", 3600, ran.set)
+
+    started = time.monotonic()
+    scheduler.stop()
+    scheduler.join(2)
+
+    assert not scheduler.is_alive()
+    assert time.monotonic() - started < 1
+    assert not ran.is_set()
+
+
+def test_seconds_until_midnight_limit():
+    assert 0 < seconds_until_midnight() <= 24 * 60 * 60
+    assert seconds_until_midnight(1) <= 1
@@ -0,0 +1,123 @@
+""" Tests for the SQLite report store and its json compatibility """
+import os
+
+import pytest
+
+from whatubinup2.report_store import ReportStore
+from whatubinup2.sqlite_store import SqliteReportStore, open_sqlite_store
+
+DAY = "26-01-05"
+
+
+def make_json_store(tmp_path):
+    """Function to build a json report store under tmp_path"""
+    return ReportStore(str(tmp_path / "reports"), str(tmp_path / "journal"))
+
+
+@pytest.fixture(name="open_store")
+def fixture_open_store(tmp_path):
+    """Function to open SQLite stores under tmp_path, closing them afterwards"""
+    stores = []
+
+    def open_store(json_store=None, json_compat=True):
+        store = SqliteReportStore(str(tmp_path / "reports.db"), json_store, json_compat)
+        stores.append(store)
+        return store
+
+    yield open_store
+    for store in stores:
+        store.close()
+
+
+def test_import_keeps_entries_and_archives_journals(tmp_path, open_store):
+    json_store = make_json_store(tmp_path)
+    json_store.write_summary("26-01-02", {"admin": 2})
+    json_store.log(DAY, "work", 2, timestamp="2026-01-05T10:00:00")
+    json_store.log(DAY, "admin", 1, timestamp="2026-01-05T11:00:00")
+    store = open_store(json_store)
+
+    assert store.import_json_reports(json_store) == 2
+
+    assert store.list_days() == ["26-01-02", DAY]
+    assert store.read_day("26-01-02") == {"admin": 2}
+    assert list(store.entries(DAY)) == [
+        ("2026-01-05T10:00:00", "work", 2),
+        ("2026-01-05T11:00:00", "admin", 1),
+    ]
+    assert not os.path.exists(json_store.journal_path(DAY))
+    assert os.path.exists(json_store.archive_path(DAY))
+    assert json_store.read_summary(DAY) == {"work": 2, "admin": 1}
+
+
+def test_import_skips_days_already_in_database(tmp_path, open_store):
+    json_store = make_json_store(tmp_path)
+    json_store.write_summary(DAY, {"work": 2})
+    store = open_store(json_store)
+    store.import_json_reports(json_store)
+
+    assert store.import_json_reports(json_store) == 0
+    assert store.read_day(DAY) == {"work": 2}
+
+
+def test_open_imports_only_into_empty_database(tmp_path):
+    json_store = make_json_store(tmp_path)
+    json_store.write_summary(DAY, {"work": 2})
+    arguments = (
+        str(tmp_path / "reports.db"),
+        str(tmp_path / "reports"),
+        str(tmp_path / "journal"),
+    )
+    store = open_sqlite_store(*arguments)
+    store.close()
+    json_store.write_summary("26-01-06", {"work": 1})
+
+    store = open_sqlite_store(*arguments)
+    try:
+        assert store.list_days() == [DAY]
+    finally:
+        store.close()
+
+
+def test_json_compat_mirrors_writes(tmp_path, open_store):
+    json_store = make_json_store(tmp_path)
+    store = open_store(json_store)
+
+    store.log(DAY, "work", 2)
+    store.log_many(DAY, {"work": 1, "admin": 3})
+    assert json_store.read_summary(DAY) == {"work": 3, "admin": 3}
+
+    store.write_summary(DAY, {"admin": 1})
+    assert json_store.read_summary(DAY) == {"admin": 1}
+
+
+def test_json_compat_off_writes_no_json(tmp_path, open_store):
+    json_store = make_json_store(tmp_path)
+    store = open_store(json_store, json_compat=False)
+
+    store.log(DAY, "work", 2)
+
+    assert json_store.read_summary(DAY) is None
+    assert store.read_day(DAY) == {"work": 2}
+
+
+def test_reads_match_json_store(tmp_path, open_store):
+    json_store = make_json_store(tmp_path)
+    store = open_store()
+    for report_store in (json_store, store):
+        report_store.write_summary("26-01-02", {"admin": 2, "work": 1})
+        report_store.log(DAY, "work", 2)
+        report_store.log(DAY, "admin", 1)
+        report_store.log_many("26-01-09", {"work": 4, "meetings": 1})
+        report_store.log(DAY, "work", 3)
+
+    for day in ("26-01-02", DAY, "26-01-09", "26-01-10"):
+        assert store.read_day(day) == json_store.read_day(day)
+    assert store.list_days() == json_store.list_days()
+    assert store.recent_days(2) == json_store.recent_days(2)
+    for start_day, end_day in (
+        ("26-01-01", "26-01-31"),
+        (DAY, DAY),
+        ("26-01-03", "26-01-09"),
+        ("26-02-01", "26-02-28"),
+    ):
+        assert store.totals(start_day, end_day) == json_store.totals(start_day, end_day)
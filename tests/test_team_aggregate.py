@@ -0,0 +1,64 @@
+""" Tests for aggregating team totals from copied report directories """
+import logging
+import os
+
+from whatubinup2.report_store import ReportStore
+from whatubinup2.team_aggregate import aggregate, read_chunk
+
+
+def write_user(root, user, reports, nested=True):
+    """Function to copy a user's {day: counts} reports under root"""
+    user_dir = os.path.join(str(root), user)
+    reports_dir = os.path.join(user_dir, "reports") if nested else user_dir
+    store = ReportStore(reports_dir, os.path.join(user_dir, "journal"))
+    for day, counts in reports.items():
+        store.write_summary(day, counts)
+    return store
+
+
+def test_totals_per_user_bin_and_day(tmp_path):
+    write_user(tmp_path, "alice", {"26-01-05": {"work": 2}, "26-01-06": {"work": 1}})
+    write_user(tmp_path, "bob", {"26-01-05": {"work": 3, "admin": 1}}, nested=False)
+
+    summary = aggregate(str(tmp_path), workers=1)
+
+    assert summary["bins"] == {"work": 6, "admin": 1}
+    assert summary["days"]["26-01-05"] == {"work": 5, "admin": 1}
+    assert summary["users"]["alice"] == {"days": 2, "bins": {"work": 3}}
+    assert summary["users"]["bob"] == {"days": 1, "bins": {"work": 3, "admin": 1}}
+
+
+def test_cache_only_rereads_changed_days(tmp_path, monkeypatch):
+    root = tmp_path / "team"
+    cache_path = str(tmp_path / "cache.json")
+    store = write_user(
+        root, "alice", {"26-01-05": {"work": 2}, "26-01-06": {"work": 1}}
+    )
+    aggregate(str(root), cache_path, workers=1)
+    store.log("26-01-06", "work", 4)
+
+    read_days = []
+
+    def counting_read_day(self, day):
+        read_days.append(day)
+        return original_read_day(self, day)
+
+    original_read_day = ReportStore.read_day
+    monkeypatch.setattr(ReportStore, "read_day", counting_read_day)
+    summary = aggregate(str(root), cache_path, workers=1, start_day="26-01-06")
+
+    assert read_days == ["26-01-06"]
+    assert summary["bins"] == {"work": 5}
+
+
+def test_unreadable_report_is_skipped(tmp_path, caplog):
+    store = write_user(tmp_path, "alice", {"26-01-05": {"work": 2}})
+    os.makedirs(store.summary_path("26-01-06"))
+
+    with caplog.at_level(logging.WARNING):
+        user, counts = read_chunk(
+            ("alice", str(tmp_path / "alice"), ["26-01-05", "26-01-06"])
+        )
+
+    assert (user, counts) == ("alice", {"26-01-05": {"work": 2}})
+    assert store.summary_path("26-01-06") in caplog.text